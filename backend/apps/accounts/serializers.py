@@ -16,6 +16,16 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'created_at', 'updated_at', 'full_name')
 
 
+class UserBriefSerializer(serializers.ModelSerializer):
+    """用户简要序列化器（用于列表中的用户引用）"""
+    full_name = serializers.CharField(read_only=True)
+    
+    class Meta:
+        model = User
+        fields = ('id', 'username', 'full_name', 'role')
+        read_only_fields = fields
+
+
 class UserCreateSerializer(serializers.ModelSerializer):
     """创建用户序列化器"""
     password = serializers.CharField(write_only=True, validators=[validate_password])
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Task, Comment, TaskAttachment
+from .search import TaskSearchService
 
 
 @admin.register(Task)
@@ -22,6 +23,13 @@ class TaskAdmin(admin.ModelAdmin):
         fields = ('file', 'original_filename', 'file_size', 'uploaded_by', 'created_at')
     
     inlines = [TaskAttachmentInline]
+    
+    def get_search_results(self, request, queryset, search_term):
+        """使用全文搜索代替对描述字段的模糊匹配"""
+        ranked = TaskSearchService.search(search_term, queryset=queryset)
+        if ranked is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(id__in=[task_id for task_id, _ in ranked]), False
 
 
 @admin.register(Comment)
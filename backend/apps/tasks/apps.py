@@ -6,3 +6,9 @@ class TasksConfig(AppConfig):
     name = 'apps.tasks'
     verbose_name = '任务管理'
 
+
+    def ready(self):
+        from .search import connect_signals
+        from .blob_store import connect_signals as connect_blob_signals
+        connect_signals()
+        connect_blob_signals()
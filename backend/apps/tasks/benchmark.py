@@ -0,0 +1,508 @@
+"""
+接口基准测试
+
+在独立的测试数据库中生成合成数据集（用户、任务、评论、附件、工作流日志、通知、短信记录），
+以四种角色依次调用任务、通知、工作流日志、用户接口，记录每个接口的SQL查询次数、
+p50/p95 响应时间和响应大小，并与 JSON 基线比较，发现性能回退。
+由 benchmark_api 管理命令调用。
+"""
+import gc
+import math
+import os
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from apps.accounts.models import User
+from apps.accounts.views import UserViewSet
+from apps.workflow.models import WorkflowLog, Notification, SmsRecord, SmsTemplate
+from apps.workflow.views import WorkflowLogViewSet, NotificationViewSet
+from .models import Task, Comment, TaskAttachment
+from .query_budget import QueryCounter
+from .search import TaskSearchService
+from .upload_service import AttachmentUploadService
+from .storage import DateBasedFileStorage
+from .views import TaskViewSet
+
+ROLES = ('user', 'admin', 'manager', 'employee')
+
+# 接口场景：name 为 视图集.操作，prepare(i) 在每次请求前调用（不计时），返回 (路径, 请求数据)
+Scenario = namedtuple('Scenario', ['name', 'role', 'method', 'prepare', 'format', 'budget', 'iterations'])
+
+
+def percentile(values: List[float], p: float) -> float:
+    """最近秩法计算百分位数"""
+    ordered = sorted(values)
+    index = max(0, math.ceil(p / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+@contextmanager
+def temporary_attachment_storage(location: str):
+    """基准测试期间附件写入临时目录，不影响正式的附件目录"""
+    field = TaskAttachment._meta.get_field('file')
+    original = field.storage
+    field.storage = DateBasedFileStorage(location=location)
+    try:
+        yield field.storage
+    finally:
+        field.storage = original
+
+
+class BenchmarkDataset:
+    """合成数据集"""
+
+    def __init__(self, users_per_role=5, tasks=300, comments_per_task=3, attachments_per_task=1,
+                 notifications_per_user=100, sms_records=500):
+        self.users_per_role = max(users_per_role, 2)
+        self.tasks = tasks
+        self.comments_per_task = comments_per_task
+        self.attachments_per_task = attachments_per_task
+        self.notifications_per_user = notifications_per_user
+        self.sms_records = sms_records
+        self.users: Dict[str, List[User]] = {}
+        # 每种角色执行操作的用户（各角色的第一个用户）
+        self.actors: Dict[str, User] = {}
+        # 每种角色可以看到的、带评论和附件的任务
+        self.visible_tasks: Dict[str, Task] = {}
+        self.attachments: Dict[str, TaskAttachment] = {}
+        self._sequence = 0
+
+    def describe(self) -> Dict[str, int]:
+        return {
+            'users_per_role': self.users_per_role,
+            'tasks': self.tasks,
+            'comments_per_task': self.comments_per_task,
+            'attachments_per_task': self.attachments_per_task,
+            'notifications_per_user': self.notifications_per_user,
+            'sms_records': self.sms_records,
+        }
+
+    def next_number(self) -> int:
+        self._sequence += 1
+        return self._sequence
+
+    def seed(self):
+        """批量写入合成数据"""
+        users = []
+        for role in ROLES:
+            for n in range(self.users_per_role):
+                # 用户管理接口使用 IsAdminUser 权限，管理方用户设为职员
+                user = User(username=f'bench_{role}_{n}', role=role, first_name=f'{role}{n}',
+                            phone=f'139{ROLES.index(role)}{n:07d}', is_staff=role == 'admin')
+                user.set_unusable_password()
+                users.append(user)
+        User.objects.bulk_create(users)
+        for role in ROLES:
+            self.users[role] = list(User.objects.filter(role=role, username__startswith='bench_').order_by('id'))
+            self.actors[role] = self.users[role][0]
+
+        creators = self.users['user']
+        employees = self.users['employee']
+        statuses = [value for value, _ in Task.STATUS_CHOICES]
+        priorities = [value for value, _ in Task.PRIORITY_CHOICES]
+        task_rows = []
+        for i in range(self.tasks):
+            status = statuses[i % len(statuses)]
+            assigned = status in ('assigned', 'in_progress', 'completed', 'confirmed', 'closed')
+            task_rows.append(Task(
+                title=f'基准测试任务{i} 服务器故障处理',
+                description=f'第{i}个任务：数据库连接超时，需要排查网络和配置。' * 3,
+                task_type='problem' if i % 2 else 'requirement',
+                status=status,
+                priority=priorities[i % len(priorities)],
+                creator=creators[i % len(creators)],
+                reviewer=self.actors['admin'] if status not in ('draft', 'pending_review') else None,
+                assignee=self.actors['manager'] if assigned else None,
+                handler=employees[i % len(employees)] if assigned else None,
+            ))
+        Task.objects.bulk_create(task_rows)
+        tasks = list(Task.objects.order_by('id'))
+
+        comments, attachments, logs = [], [], []
+        for i, task in enumerate(tasks):
+            for n in range(self.comments_per_task):
+                comments.append(Comment(task=task, user=self.users[ROLES[n % len(ROLES)]][0],
+                                        content=f'评论{n}：请尽快处理，影响业务使用'))
+            for n in range(self.attachments_per_task):
+                attachments.append(TaskAttachment(task=task, file=f'benchmark/{task.id}_{n}.txt',
+                                                  original_filename=f'附件{n}.txt', file_size=1024,
+                                                  uploaded_by=task.creator))
+            logs.append(WorkflowLog(task=task, user=task.creator, action='创建任务',
+                                    from_status=None, to_status='pending_review'))
+            if task.status not in ('draft', 'pending_review'):
+                logs.append(WorkflowLog(task=task, user=self.actors['admin'], action='审核通过',
+                                        from_status='pending_review', to_status='reviewed',
+                                        comment='审核通过，请安排处理'))
+        Comment.objects.bulk_create(comments)
+        TaskAttachment.objects.bulk_create(attachments)
+        WorkflowLog.objects.bulk_create(logs)
+
+        notifications = []
+        for role in ROLES:
+            for user in self.users[role]:
+                for n in range(self.notifications_per_user):
+                    task = tasks[n % len(tasks)]
+                    notifications.append(Notification(
+                        user=user, task=task, notification_type='task_created',
+                        title='新任务创建', content=f'任务"{task.title}"已创建', is_read=n % 3 == 0
+                    ))
+        Notification.objects.bulk_create(notifications)
+
+        SmsRecord.objects.bulk_create([
+            SmsRecord(phone=creators[i % len(creators)].phone, content='您的任务已处理',
+                      template_type='task_completed', task=tasks[i % len(tasks)],
+                      recipient=creators[i % len(creators)], status='success' if i % 4 else 'failed')
+            for i in range(self.sms_records)
+        ])
+        # 启用全部短信模板，工作流操作会写入短信发件箱（没有短信配置，不会实际发送）
+        SmsTemplate.objects.bulk_create([
+            SmsTemplate(template_type=value, content='【运维】任务"{任务标题}"状态已更新')
+            for value, _ in SmsTemplate.TEMPLATE_TYPE_CHOICES
+        ])
+
+        self.visible_tasks = {
+            'user': self.create_task('in_progress', creator=self.actors['user']),
+            'admin': self.create_task('pending_review'),
+            'manager': self.create_task('assigned'),
+            'employee': self.create_task('in_progress'),
+        }
+        for role, task in self.visible_tasks.items():
+            Comment.objects.bulk_create([
+                Comment(task=task, user=self.actors[ROLES[n % len(ROLES)]], content=f'评论{n}')
+                for n in range(max(self.comments_per_task, 1))
+            ])
+            self.attachments[role] = self.create_attachment(task)
+
+        # 预先构建进程内搜索索引，使各接口的查询次数与运行的场景和顺序无关
+        TaskSearchService.search('基准测试')
+
+    def create_task(self, status, creator=None, handler=None) -> Task:
+        """创建处于指定状态的任务（供需要修改任务状态的场景每次请求前使用）"""
+        assigned = status in ('assigned', 'in_progress', 'completed', 'confirmed', 'closed')
+        return Task.objects.create(
+            title=f'基准测试工作流任务{self.next_number()}',
+            description='打印机无法连接，需要上门处理',
+            task_type='problem' if status != 'draft' else None,
+            status=status,
+            creator=creator or self.actors['user'],
+            reviewer=self.actors['admin'] if status not in ('draft', 'pending_review') else None,
+            assignee=self.actors['manager'] if assigned else None,
+            handler=(handler or self.actors['employee']) if assigned else None,
+        )
+
+    def create_attachment(self, task: Task) -> TaskAttachment:
+        """创建带实际文件的附件"""
+        return TaskAttachment.objects.create(
+            task=task,
+            file=SimpleUploadedFile(f'benchmark_{self.next_number()}.txt', b'x' * 4096),
+            original_filename='基准测试附件.txt',
+            file_size=4096,
+            uploaded_by=task.creator,
+        )
+
+
+class BenchmarkRunner:
+    """按场景调用接口并统计查询次数、响应时间和响应大小"""
+
+    def __init__(self, dataset: BenchmarkDataset, iterations=20, warmup=2,
+                 name_filter: Optional[str] = None, progress: Optional[Callable[[str], None]] = None):
+        self.dataset = dataset
+        self.iterations = iterations
+        self.warmup = warmup
+        self.name_filter = name_filter
+        self.progress = progress
+        self.clients: Dict[str, APIClient] = {}
+
+    def get_client(self, role: str) -> APIClient:
+        """使用JWT认证的客户端（与前端请求一致，包含身份认证的查询）"""
+        if role not in self.clients:
+            client = APIClient()
+            token = RefreshToken.for_user(self.dataset.actors[role]).access_token
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+            self.clients[role] = client
+        return self.clients[role]
+
+    def build_scenarios(self) -> List[Scenario]:
+        data = self.dataset
+        actors = data.actors
+        scenarios = []
+
+        def add(name, role, method, prepare, viewset=None, action=None, format='json', iterations=None):
+            budget = viewset.query_budgets.get(action) if viewset and hasattr(viewset, 'query_budgets') else None
+            if not callable(prepare):
+                path = prepare
+                prepare = lambda i, path=path: (path, None)
+            scenarios.append(Scenario(name, role, method, prepare, format, budget, iterations))
+
+        def fresh(status, path_suffix, payload=None, creator=None):
+            def prepare(i):
+                task = data.create_task(status, creator=creator)
+                return f'/api/tasks/tasks/{task.id}/{path_suffix}', payload
+            return prepare
+
+        # 任务接口：读取
+        for role in ROLES:
+            task = data.visible_tasks[role]
+            attachment = data.attachments[role]
+            add('tasks.list', role, 'get', '/api/tasks/tasks/', TaskViewSet, 'list')
+            add('tasks.retrieve', role, 'get', f'/api/tasks/tasks/{task.id}/', TaskViewSet, 'retrieve')
+            add('tasks.stats', role, 'get', '/api/tasks/tasks/stats/', TaskViewSet, 'stats')
+            add('tasks.download_attachment', role, 'get',
+                f'/api/tasks/tasks/{task.id}/attachments/{attachment.id}/download/',
+                TaskViewSet, 'download_attachment')
+        add('tasks.list.search', 'admin', 'get', '/api/tasks/tasks/?search=服务器 超时', TaskViewSet, 'list')
+        add('tasks.list.filter', 'manager', 'get', '/api/tasks/tasks/?status=assigned&priority=high',
+            TaskViewSet, 'list')
+
+        # 任务接口：创建、编辑、删除
+        add('tasks.create', 'user', 'post', lambda i: (
+            '/api/tasks/tasks/', {'title': f'新任务{i}', 'description': '无法登录系统', 'priority': 'high'}
+        ), TaskViewSet, 'create')
+        add('tasks.update', 'user', 'put', fresh('draft', '', {
+            'title': '修改后的草稿', 'description': '补充描述', 'priority': 'low'
+        }), TaskViewSet, 'update')
+        add('tasks.partial_update', 'user', 'patch', fresh('draft', '', {'priority': 'urgent'}),
+            TaskViewSet, 'partial_update')
+        add('tasks.destroy', 'admin', 'delete', fresh('closed', ''), TaskViewSet, 'destroy')
+
+        # 任务接口：工作流操作
+        other_employees = [user.id for user in data.users['employee'][1:3]]
+        add('tasks.review', 'admin', 'post', fresh('pending_review', 'review/', {'approved': True}),
+            TaskViewSet, 'review')
+        add('tasks.review.full', 'admin', 'post', fresh('pending_review', 'review/?full=1', {'approved': True}))
+        add('tasks.assign', 'manager', 'post', fresh('reviewed', 'assign/', {
+            'handler_id': actors['employee'].id, 'task_type': 'problem'
+        }), TaskViewSet, 'assign')
+        add('tasks.set_assistants', 'employee', 'post', fresh('assigned', 'set_assistants/', {
+            'assistant_employee_ids': other_employees
+        }), TaskViewSet, 'set_assistants')
+        add('tasks.handle', 'employee', 'post', fresh('assigned', 'handle/', {'handle_comment': '开始处理'}),
+            TaskViewSet, 'handle')
+        add('tasks.complete', 'employee', 'post', fresh('in_progress', 'complete/', {'handle_comment': '已修复'}),
+            TaskViewSet, 'complete')
+        add('tasks.confirm', 'user', 'post', fresh('completed', 'confirm/', {'confirmed': True}),
+            TaskViewSet, 'confirm')
+        add('tasks.submit_draft', 'user', 'post', fresh('draft', 'submit_draft/'), TaskViewSet, 'submit_draft')
+        for role in ROLES:
+            task = data.visible_tasks[role]
+            add('tasks.add_comment', role, 'post', lambda i, task=task: (
+                f'/api/tasks/tasks/{task.id}/add_comment/', {'content': f'基准测试评论{i}'}
+            ), TaskViewSet, 'add_comment')
+
+        # 任务接口：附件
+        def upload(i):
+            task = data.create_task('pending_review')
+            return f'/api/tasks/tasks/{task.id}/upload_attachment/', {
+                'file': SimpleUploadedFile(f'upload_{i}.txt', b'y' * 4096)
+            }
+        add('tasks.upload_attachment', 'user', 'post', upload, TaskViewSet, 'upload_attachment',
+            format='multipart')
+
+        def create_upload(i):
+            task = data.create_task('pending_review')
+            return f'/api/tasks/tasks/{task.id}/attachment_uploads/', {'filename': f'upload_{i}.txt', 'file_size': 4096}
+        add('tasks.create_attachment_upload', 'user', 'post', create_upload, TaskViewSet, 'create_attachment_upload')
+
+        def upload_chunk(i):
+            task = data.create_task('pending_review')
+            upload = AttachmentUploadService.create(task, actors['user'], f'upload_{i}.txt', 4096)
+            return f'/api/tasks/tasks/{task.id}/attachment_uploads/{upload.id}/?offset=0', b'y' * 4096
+        add('tasks.attachment_upload', 'user', 'put', upload_chunk, TaskViewSet, 'attachment_upload',
+            format='application/octet-stream')
+
+        def delete_attachment(i):
+            attachment = data.create_attachment(data.create_task('pending_review'))
+            return f'/api/tasks/tasks/{attachment.task_id}/attachments/{attachment.id}/', None
+        add('tasks.delete_attachment', 'user', 'delete', delete_attachment, TaskViewSet, 'delete_attachment')
+
+        # 通知接口
+        for role in ROLES:
+            user = actors[role]
+            notification_ids = list(
+                Notification.objects.filter(user=user).order_by('-id').values_list('id', flat=True)[:50]
+            )
+            add('notifications.list', role, 'get', '/api/workflow/notifications/',
+                NotificationViewSet, 'list')
+            add('notifications.list.unread', role, 'get', '/api/workflow/notifications/?is_read=false',
+                NotificationViewSet, 'list')
+            add('notifications.retrieve', role, 'get', f'/api/workflow/notifications/{notification_ids[0]}/',
+                NotificationViewSet, 'retrieve')
+            add('notifications.unread_count', role, 'get', '/api/workflow/notifications/unread_count/',
+                NotificationViewSet, 'unread_count')
+            add('notifications.mark_read', role, 'post', lambda i, ids=notification_ids: (
+                f'/api/workflow/notifications/{ids[i % len(ids)]}/mark_read/', None
+            ), NotificationViewSet, 'mark_read')
+
+            def mark_all_read(i, user=user):
+                Notification.objects.filter(user=user, id__in=Notification.objects.filter(
+                    user=user).order_by('-id').values_list('id', flat=True)[:20]).update(is_read=False)
+                return '/api/workflow/notifications/mark_all_read/', None
+            add('notifications.mark_all_read', role, 'post', mark_all_read, NotificationViewSet, 'mark_all_read')
+
+        def fresh_notification(i):
+            notification = Notification.objects.create(
+                user=actors['user'], task=data.visible_tasks['user'], notification_type='task_created',
+                title='新任务创建', content='基准测试通知'
+            )
+            return f'/api/workflow/notifications/{notification.id}/', None
+        add('notifications.partial_update', 'user', 'patch', lambda i: (
+            fresh_notification(i)[0], {'is_read': True}
+        ), NotificationViewSet, 'partial_update')
+        add('notifications.destroy', 'user', 'delete', fresh_notification, NotificationViewSet, 'destroy')
+
+        # 工作流日志接口
+        for role in ROLES:
+            task = data.visible_tasks[role]
+            log = WorkflowLog.objects.filter(task__status='in_progress').order_by('id').first()
+            add('logs.list', role, 'get', f'/api/workflow/logs/?task_id={task.id}', WorkflowLogViewSet, 'list')
+            add('logs.list.large_task', role, 'get', f'/api/workflow/logs/?task_id={log.task_id}',
+                WorkflowLogViewSet, 'list')
+
+        # 用户接口
+        for role in ROLES:
+            add('users.list', role, 'get', '/api/accounts/users/', UserViewSet, 'list')
+            add('users.retrieve', role, 'get', f'/api/accounts/users/{actors["employee"].id}/',
+                UserViewSet, 'retrieve')
+            add('users.me', role, 'get', '/api/accounts/users/me/', UserViewSet, 'me')
+            add('users.employees', role, 'get', '/api/accounts/users/employees/', UserViewSet, 'employees')
+        # 创建用户和修改密码的耗时主要是密码哈希，减少请求次数
+        add('users.create', 'admin', 'post', lambda i: ('/api/accounts/users/', {
+            'username': f'bench_created_{data.next_number()}', 'password': 'Bench@123456',
+            'password_confirm': 'Bench@123456', 'role': 'employee', 'phone': '13700000000'
+        }), UserViewSet, 'create', iterations=3)
+        add('users.partial_update', 'admin', 'patch', (
+            f'/api/accounts/users/{data.users["employee"][-1].id}/'
+        ), UserViewSet, 'partial_update')
+
+        def fresh_user(i):
+            user = User.objects.create(username=f'bench_delete_{data.next_number()}', role='employee')
+            return f'/api/accounts/users/{user.id}/', None
+        add('users.destroy', 'admin', 'delete', fresh_user, UserViewSet, 'destroy')
+
+        def change_password(i):
+            user = actors['user']
+            if not user.has_usable_password() or not user.check_password('Bench@123456'):
+                user.set_password('Bench@123456')
+                user.save(update_fields=['password'])
+            return '/api/accounts/users/change_password/', {
+                'old_password': 'Bench@123456', 'new_password': 'Bench@123456',
+                'new_password_confirm': 'Bench@123456'
+            }
+        add('users.change_password', 'user', 'post', change_password, UserViewSet, 'change_password',
+            iterations=3)
+
+        if self.name_filter:
+            scenarios = [scenario for scenario in scenarios if self.name_filter in scenario.name]
+        return scenarios
+
+    def request(self, scenario: Scenario, iteration: int):
+        """执行一次请求，返回 (状态码, 查询次数, 耗时毫秒, 响应字节数)"""
+        path, payload = scenario.prepare(iteration)
+        return self.send(scenario, path, payload)
+
+    def send(self, scenario: Scenario, path: str, payload):
+        """发送 prepare 返回的请求并计时（不包括 prepare 中的查询）"""
+        client = self.get_client(scenario.role)
+        method = getattr(client, scenario.method)
+        kwargs = {}
+        if payload is not None:
+            # format 为 MIME 类型时 payload 作为原始请求体发送
+            kwargs = {'content_type': scenario.format} if '/' in scenario.format else {'format': scenario.format}
+
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            start = time.perf_counter()
+            response = method(path, payload, **kwargs) if payload is not None else method(path)
+            if getattr(response, 'streaming', False):
+                size = sum(len(chunk) for chunk in response.streaming_content)
+            else:
+                size = len(response.content)
+            elapsed = (time.perf_counter() - start) * 1000
+        response.close()
+        return response.status_code, counter.count, elapsed, size
+
+    def run(self, only: Optional[set] = None) -> Dict[str, Dict[str, Any]]:
+        """运行全部场景（only 不为空时只运行其中的场景），返回 {场景: 统计结果}"""
+        results = {}
+        for scenario in self.build_scenarios():
+            key = f'{scenario.name}[{scenario.role}]'
+            if only is not None and key not in only:
+                continue
+            iterations = scenario.iterations or self.iterations
+            warmup = min(self.warmup, iterations)
+            for i in range(warmup):
+                self.request(scenario, i)
+
+            statuses, queries, latencies, sizes = set(), [], [], []
+            # 与 timeit 一样，计时期间关闭垃圾回收，避免回收停顿造成的偶发尖峰
+            gc.collect()
+            gc.disable()
+            try:
+                for i in range(warmup, warmup + iterations):
+                    status_code, query_count, elapsed, size = self.request(scenario, i)
+                    statuses.add(status_code)
+                    queries.append(query_count)
+                    latencies.append(elapsed)
+                    sizes.append(size)
+            finally:
+                gc.enable()
+
+            results[key] = {
+                'status': max(statuses),
+                'queries': max(queries),
+                'query_budget': scenario.budget,
+                'p50_ms': round(percentile(latencies, 50), 2),
+                'p95_ms': round(percentile(latencies, 95), 2),
+                'bytes': max(sizes),
+                'iterations': iterations,
+            }
+            if self.progress:
+                self.progress(key)
+        return results
+
+
+def compare_results(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+                    latency_tolerance=0.5, latency_floor_ms=10.0, size_tolerance=0.10,
+                    enforce_budgets=False) -> Dict[str, List[str]]:
+    """与基线比较，返回 {场景: [回退说明]}
+
+    查询次数增加、状态码变化视为回退；响应时间超过基线的 (1 + latency_tolerance) 倍
+    且差值超过 latency_floor_ms 毫秒，响应大小超过基线的 (1 + size_tolerance) 倍视为回退。
+    enforce_budgets 为True时，超出视图声明的查询预算也视为回退。
+    """
+    regressions: Dict[str, List[str]] = {}
+    for key, current in results.items():
+        problems = []
+        if enforce_budgets and exceeds_budget(current):
+            problems.append(f'查询 {current["queries"]} 次，超出预算 {current["query_budget"]} 次')
+
+        previous = baseline.get(key)
+        if previous:
+            if current['status'] != previous['status']:
+                problems.append(f'状态码 {previous["status"]} -> {current["status"]}')
+            if current['queries'] > previous['queries']:
+                problems.append(f'查询次数 {previous["queries"]} -> {current["queries"]}')
+            for metric in ('p50_ms', 'p95_ms'):
+                limit = previous[metric] * (1 + latency_tolerance)
+                if current[metric] > limit and current[metric] - previous[metric] > latency_floor_ms:
+                    problems.append(f'{metric} {previous[metric]} -> {current[metric]}')
+            if current['bytes'] > previous['bytes'] * (1 + size_tolerance):
+                problems.append(f'响应大小 {previous["bytes"]} -> {current["bytes"]} 字节')
+        if problems:
+            regressions[key] = problems
+    return regressions
+
+
+def exceeds_budget(result: Dict[str, Any]) -> bool:
+    """查询次数是否超出视图声明的预算"""
+    budget = result.get('query_budget')
+    return budget is not None and result['queries'] > budget
+
+
+def default_baseline_path(base_dir) -> str:
+    return os.path.join(base_dir, 'benchmarks', 'api_baseline.json')
@@ -0,0 +1,108 @@
+"""
+按内容寻址的附件存储
+
+附件文件以 SHA-256 命名（docs/年/月/日/<sha256><扩展名>），相同内容只保存一份。
+AttachmentBlob 记录文件位置和引用它的附件数，原始文件名仍保存在 TaskAttachment 中。
+文件名由内容决定，不需要像按原文件名保存时那样逐个检查同名文件是否存在。
+
+引用数的增减都在锁定 AttachmentBlob 行的事务中进行：
+- 新增附件：已有相同内容的文件时删除刚上传的临时文件，否则把临时文件移动到按内容命名的位置
+- 删除附件（包括删除任务时级联删除）：post_delete 信号减少引用数，事务提交后引用数为0时删除文件和缩略图
+
+迁移前上传的附件（blob 为空）仍按原路径读取，可使用 migrate_attachment_blobs 命令转换。
+"""
+import os
+import re
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete
+from .models import AttachmentBlob, TaskAttachment
+
+_EXTENSION_PATTERN = re.compile(r'^\.[0-9a-z]{1,16}$')
+
+
+def attachment_storage():
+    return TaskAttachment._meta.get_field('file').storage
+
+
+class AttachmentBlobStore:
+    """按内容寻址的附件文件和引用计数"""
+
+    @staticmethod
+    def blob_name(sha256, filename):
+        """文件在存储中的名称：日期目录/<sha256><扩展名>（保留扩展名便于识别文件类型）"""
+        extension = os.path.splitext(filename)[1].lower()
+        if not _EXTENSION_PATTERN.match(extension):
+            extension = ''
+        return attachment_storage().generate_filename(f'{sha256}{extension}')
+
+    @staticmethod
+    def add_reference(temp_path, sha256, size, filename):
+        """为临时文件中的内容增加一个引用，返回 AttachmentBlob（临时文件被移动或删除）"""
+        storage = attachment_storage()
+        with transaction.atomic(savepoint=False):
+            blob = AttachmentBlob.objects.select_for_update().filter(pk=sha256).first()
+            if blob is not None and os.path.exists(storage.path(blob.name)):
+                # 已有相同内容的文件
+                os.remove(temp_path)
+            else:
+                # 新内容（或文件已丢失）：同一文件系统内移动，不复制文件内容
+                name = blob.name if blob is not None else AttachmentBlobStore.blob_name(sha256, filename)
+                path = storage.path(name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temp_path, path)
+                if storage.file_permissions_mode is not None:
+                    os.chmod(path, storage.file_permissions_mode)
+                if blob is None:
+                    try:
+                        with transaction.atomic():
+                            blob = AttachmentBlob.objects.create(sha256=sha256, name=name, size=size)
+                    except IntegrityError:
+                        # 相同内容同时上传，使用先创建的记录
+                        blob = AttachmentBlob.objects.select_for_update().get(pk=sha256)
+                        if blob.name != name:
+                            os.remove(path)
+            AttachmentBlob.objects.filter(pk=sha256).update(ref_count=F('ref_count') + 1)
+        return blob
+
+    @staticmethod
+    def create_attachment(task, user, temp_path, sha256, size, filename):
+        """用临时文件中的内容创建附件"""
+        with transaction.atomic(savepoint=False):
+            blob = AttachmentBlobStore.add_reference(temp_path, sha256, size, filename)
+            return TaskAttachment.objects.create(
+                task=task,
+                file=blob.name,
+                original_filename=filename,
+                file_size=size,
+                sha256=sha256,
+                blob=blob,
+                uploaded_by=user
+            )
+
+    @staticmethod
+    def release(sha256):
+        """引用数为0时删除文件和 AttachmentBlob 记录"""
+        storage = attachment_storage()
+        with transaction.atomic():
+            blob = AttachmentBlob.objects.select_for_update().filter(pk=sha256, ref_count__lte=0).first()
+            if blob is None:
+                return
+            # 在持有行锁时删除文件，避免删除同时上传的相同内容
+            from .previews import AttachmentPreviewService
+            storage.delete(blob.name)
+            AttachmentPreviewService.delete(blob.name, blob.sha256)
+            blob.delete()
+
+
+def _on_attachment_deleted(sender, instance, **kwargs):
+    if instance.blob_id is None:
+        return
+    sha256 = instance.blob_id
+    AttachmentBlob.objects.filter(pk=sha256).update(ref_count=F('ref_count') - 1)
+    transaction.on_commit(lambda: AttachmentBlobStore.release(sha256))
+
+
+def connect_signals():
+    """注册附件删除信号（在 TasksConfig.ready 中调用）"""
+    post_delete.connect(_on_attachment_deleted, sender=TaskAttachment, dispatch_uid='attachment_blob_deleted')
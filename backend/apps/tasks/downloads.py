@@ -0,0 +1,209 @@
+"""
+附件下载
+
+权限检查在 Django 中完成，文件内容按 ATTACHMENT_DOWNLOAD_MODE 发送：
+- python：返回 FileResponse。Gunicorn 通过 wsgi.file_wrapper 使用 os.sendfile 发送文件（零拷贝），
+  不支持 file_wrapper 的服务器（如开发服务器）按块读取发送
+- nginx：返回 X-Accel-Redirect 响应头，由 Nginx 从内部 location 发送文件，不占用 Gunicorn worker
+- sendfile：返回 X-Sendfile 响应头（Apache mod_xsendfile、lighttpd 等）
+
+所有方式都返回 ETag 和 Last-Modified，文件未变化时返回 304（不发送文件内容）。
+ETag 由文件的修改时间和大小生成，与 Nginx 发送静态文件时的 ETag 格式一致，切换下载方式后客户端缓存仍然有效。
+python 方式支持 Range 请求（单个范围和多个范围），用于断点续传；nginx、sendfile 方式由服务器处理 Range。
+图片附件的缩略图（见 previews.py）也按 ATTACHMENT_DOWNLOAD_MODE 发送，带有较长的缓存时间。
+"""
+import mimetypes
+import os
+import secrets
+from urllib.parse import quote
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+DOWNLOAD_MODES = ('python', 'nginx', 'sendfile')
+
+# 读取文件的块大小
+CHUNK_SIZE = 64 * 1024
+# 一个请求最多的范围数，超过时忽略 Range 返回完整文件
+MAX_RANGES = 16
+
+
+def _download_mode():
+    mode = getattr(settings, 'ATTACHMENT_DOWNLOAD_MODE', 'python')
+    if mode not in DOWNLOAD_MODES:
+        raise ImproperlyConfigured(f'ATTACHMENT_DOWNLOAD_MODE 应为 {"、".join(DOWNLOAD_MODES)} 之一')
+    return mode
+
+
+def _set_offload_header(response, mode, name, file_path):
+    """由 Nginx 或其他服务器发送存储中名为 name 的文件"""
+    if mode == 'nginx':
+        # Nginx 对 X-Accel-Redirect 的路径做URL解码
+        prefix = settings.ATTACHMENT_ACCEL_REDIRECT_PREFIX.rstrip('/')
+        response['X-Accel-Redirect'] = f'{prefix}/{quote(name.replace(chr(92), "/"))}'
+    else:
+        # WSGI 响应头按 latin-1 编码，以此传递UTF-8编码的路径字节
+        response['X-Sendfile'] = file_path.encode('utf-8').decode('latin-1')
+
+
+def attachment_response(request, attachment, file_path):
+    """返回附件下载响应（调用方已检查权限和文件是否存在）"""
+    mode = _download_mode()
+    stat = os.stat(file_path)
+    etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+    last_modified = int(stat.st_mtime)
+
+    # If-None-Match / If-Modified-Since 命中时返回 304，If-Match / If-Unmodified-Since 不满足时返回 412
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        content_type = mimetypes.guess_type(attachment.original_filename)[0] or 'application/octet-stream'
+        if mode == 'python':
+            response = _file_response(request, attachment, file_path, stat.st_size, content_type, etag, last_modified)
+        else:
+            response = HttpResponse(content_type=content_type)
+            response['Content-Disposition'] = content_disposition_header(True, attachment.original_filename)
+            _set_offload_header(response, mode, attachment.file.name, file_path)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # 附件需要登录才能下载：只允许浏览器缓存，每次使用前向服务器确认（未变化时只返回 304）
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def preview_response(request, name, file_path, max_age):
+    """返回缩略图响应：内容由地址中的 SHA-256 决定，在地址到期（max_age 秒）前不需要向服务器确认"""
+    mode = _download_mode()
+    stat = os.stat(file_path)
+    etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        if mode == 'python':
+            response = FileResponse(open(file_path, 'rb'), content_type='image/jpeg')
+        else:
+            response = HttpResponse(content_type='image/jpeg')
+            _set_offload_header(response, mode, name, file_path)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = f'private, max-age={max_age}, immutable'
+    return response
+
+
+def parse_range_header(header, size):
+    """解析 Range 请求头，返回按起始位置排序并合并重叠部分的 [(起始, 结束)]（包含结束位置）
+
+    格式无效或范围过多时返回None（忽略 Range），所有范围都超出文件大小时返回空列表。
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec.strip():
+        return None
+    parts = spec.split(',')
+    if len(parts) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for part in parts:
+        start, sep, end = part.strip().partition('-')
+        if not sep or not (start + end).isdigit():
+            return None
+        if start:
+            first = int(start)
+            if end and int(end) < first:
+                return None
+            last = int(end) if end else size - 1
+        else:
+            # 后缀范围：最后 N 个字节
+            if int(end) == 0:
+                continue
+            first, last = max(size - int(end), 0), size - 1
+        if first < size:
+            ranges.append((first, min(last, size - 1)))
+
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def _requested_ranges(request, size, etag, last_modified):
+    """请求的范围，不是 Range 请求（或 If-Range 与当前文件不一致）时返回None"""
+    header = request.META.get('HTTP_RANGE')
+    if not header or request.method not in ('GET', 'HEAD'):
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range:
+        # If-Range 为 ETag 或日期，文件已变化时返回完整文件
+        if if_range.startswith(('"', 'W/')):
+            if if_range != etag:
+                return None
+        elif parse_http_date_safe(if_range) != last_modified:
+            return None
+    return parse_range_header(header, size)
+
+
+def _read_range(file, first, last):
+    file.seek(first)
+    remaining = last - first + 1
+    while remaining > 0:
+        data = file.read(min(CHUNK_SIZE, remaining))
+        if not data:
+            break
+        remaining -= len(data)
+        yield data
+
+
+def _file_response(request, attachment, file_path, size, content_type, etag, last_modified):
+    ranges = _requested_ranges(request, size, etag, last_modified)
+    if ranges is None:
+        response = FileResponse(
+            open(file_path, 'rb'),
+            as_attachment=True,
+            filename=attachment.original_filename
+        )
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    if not ranges:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    file = open(file_path, 'rb')
+    if len(ranges) == 1:
+        first, last = ranges[0]
+        response = StreamingHttpResponse(_read_range(file, first, last), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {first}-{last}/{size}'
+        response['Content-Length'] = str(last - first + 1)
+    else:
+        boundary = secrets.token_hex(16)
+        parts = [
+            (f'--{boundary}\r\nContent-Type: {content_type}\r\n'
+             f'Content-Range: bytes {first}-{last}/{size}\r\n\r\n').encode('latin-1')
+            for first, last in ranges
+        ]
+        closing = f'--{boundary}--\r\n'.encode('latin-1')
+
+        def multipart():
+            for header, (first, last) in zip(parts, ranges):
+                yield header
+                yield from _read_range(file, first, last)
+                yield b'\r\n'
+            yield closing
+
+        length = sum(len(header) + last - first + 1 + 2 for header, (first, last) in zip(parts, ranges)) + len(closing)
+        response = StreamingHttpResponse(
+            multipart(), status=206, content_type=f'multipart/byteranges; boundary={boundary}'
+        )
+        response['Content-Length'] = str(length)
+    response._resource_closers.append(file.close)
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = content_disposition_header(True, attachment.original_filename)
+    return response
@@ -0,0 +1,214 @@
+"""
+Django管理命令：清理附件目录中的孤立文件，并统计附件占用的空间
+
+按目录逐个扫描附件目录下的日期目录（年/月/日，其他文件和目录不处理），每积累一批文件名
+就到数据库中查找引用它们的附件或按内容保存的文件记录，没有引用的文件为孤立文件。
+图片的缩略图（<sha256>_thumbnail.jpg 等）在对应的内容文件记录存在时保留。
+扫描过程中只保存当前一批文件名和按日期的统计，文件数量很大时内存占用也不会增长。
+
+最近修改的文件可能属于正在进行的上传（文件已写入、记录尚未提交），默认不处理24小时内修改的文件。
+
+使用方法：
+    python manage.py attachment_gc                   # 只报告孤立文件和空间占用
+    python manage.py attachment_gc --delete          # 删除孤立文件和过期的上传临时文件
+    python manage.py attachment_gc --check-rows      # 同时检查文件已丢失的附件记录
+    python manage.py attachment_gc --top 50 --min-age-hours 72
+"""
+import os
+import re
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+from apps.tasks.blob_store import attachment_storage
+from apps.tasks.models import AttachmentBlob, TaskAttachment
+from apps.tasks.previews import DERIVED_NAME_PATTERN, PREVIEW_KINDS, derived_name
+from apps.tasks.upload_service import AttachmentUploadService
+
+_DATE_PARTS = (re.compile(r'^\d{4}$'), re.compile(r'^\d{2}$'), re.compile(r'^\d{2}$'))
+
+
+def _format_size(size):
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024:
+            return f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{size:.1f} TB'
+
+
+def iter_dated_files(root):
+    """逐个返回日期目录中的文件 (日期, 存储中的名称, DirEntry)"""
+
+    def subdirectories(path, pattern):
+        try:
+            with os.scandir(path) as entries:
+                names = [entry.name for entry in entries
+                         if entry.is_dir(follow_symlinks=False) and pattern.match(entry.name)]
+        except FileNotFoundError:
+            return []
+        return sorted(names)
+
+    for year in subdirectories(root, _DATE_PARTS[0]):
+        for month in subdirectories(os.path.join(root, year), _DATE_PARTS[1]):
+            for day in subdirectories(os.path.join(root, year, month), _DATE_PARTS[2]):
+                date = f'{year}/{month}/{day}'
+                with os.scandir(os.path.join(root, year, month, day)) as entries:
+                    for entry in entries:
+                        if entry.is_file(follow_symlinks=False):
+                            yield date, f'{date}/{entry.name}', entry
+
+
+class Command(BaseCommand):
+    help = '清理附件目录中没有附件引用的文件，并按日期和任务统计附件占用的空间'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete', action='store_true', help='删除孤立文件和过期的上传临时文件（默认只报告）')
+        parser.add_argument('--min-age-hours', type=float, default=24,
+                            help='只处理修改时间早于该小时数的文件（默认24）')
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批到数据库查找的文件数（默认1000）')
+        parser.add_argument('--check-rows', action='store_true', help='检查文件已丢失的附件记录')
+        parser.add_argument('--top', type=int, default=20, help='输出附件占用空间最多的任务数（默认20）')
+
+    def handle(self, *args, **options):
+        storage = attachment_storage()
+        root = storage.location
+        self.delete = options['delete']
+        self.verbosity = options['verbosity']
+        self.cutoff = time.time() - options['min_age_hours'] * 3600
+        batch_size = options['batch_size']
+
+        # 日期 -> [文件数, 字节数, 孤立文件数, 孤立文件字节数]
+        self.days = defaultdict(lambda: [0, 0, 0, 0])
+        self.removed = 0
+        batch = []
+        for date, name, entry in iter_dated_files(root):
+            stat = entry.stat(follow_symlinks=False)
+            usage = self.days[date]
+            usage[0] += 1
+            usage[1] += stat.st_size
+            batch.append((date, name, entry.path, stat))
+            if len(batch) >= batch_size:
+                self.process_batch(batch)
+                batch = []
+        if batch:
+            self.process_batch(batch)
+        if self.delete:
+            self.remove_empty_directories(root)
+
+        self.report_days()
+        self.report_uploads(os.path.join(root, AttachmentUploadService.UPLOAD_DIR))
+        self.report_tasks(options['top'])
+        if options['check_rows']:
+            self.check_rows(storage, batch_size)
+
+    def process_batch(self, batch):
+        """查找一批文件的引用，处理其中的孤立文件"""
+        names = [name for _, name, _, _ in batch]
+        referenced = set(TaskAttachment.objects.filter(file__in=names).values_list('file', flat=True))
+        referenced.update(AttachmentBlob.objects.filter(name__in=names).values_list('name', flat=True))
+        # 缩略图：对应的内容文件仍有记录时保留
+        hashes = set()
+        for name in names:
+            match = DERIVED_NAME_PATTERN.match(os.path.basename(name))
+            if match:
+                hashes.add(match.group('sha256'))
+        if hashes:
+            for sha256, blob_name in AttachmentBlob.objects.filter(pk__in=hashes).values_list('sha256', 'name'):
+                referenced.update(derived_name(blob_name, sha256, kind) for kind in PREVIEW_KINDS)
+
+        for date, name, path, stat in batch:
+            if name in referenced or stat.st_mtime > self.cutoff:
+                continue
+            usage = self.days[date]
+            usage[2] += 1
+            usage[3] += stat.st_size
+            if self.delete:
+                try:
+                    os.remove(path)
+                    self.removed += 1
+                except FileNotFoundError:
+                    pass
+            elif self.verbosity > 1:
+                self.stdout.write(f'  孤立文件: {name} ({_format_size(stat.st_size)})')
+
+    def remove_empty_directories(self, root):
+        for date in self.days:
+            path = os.path.join(root, *date.split('/'))
+            # 依次尝试删除日、月、年目录，目录不为空时停止
+            for _ in range(3):
+                try:
+                    os.rmdir(path)
+                except OSError:
+                    break
+                path = os.path.dirname(path)
+
+    def report_days(self):
+        self.stdout.write(f'{"日期":<12}{"文件数":>10}{"大小":>12}{"孤立文件":>10}{"孤立大小":>12}')
+        totals = [0, 0, 0, 0]
+        for date in sorted(self.days):
+            usage = self.days[date]
+            totals = [a + b for a, b in zip(totals, usage)]
+            self.stdout.write(f'{date:<12}{usage[0]:>10}{_format_size(usage[1]):>12}'
+                              f'{usage[2]:>10}{_format_size(usage[3]):>12}')
+        self.stdout.write(f'{"合计":<12}{totals[0]:>10}{_format_size(totals[1]):>12}'
+                          f'{totals[2]:>10}{_format_size(totals[3]):>12}')
+        if self.delete:
+            self.stdout.write(self.style.SUCCESS(f'已删除 {self.removed} 个孤立文件，释放 {_format_size(totals[3])}'))
+        elif totals[2]:
+            self.stdout.write(self.style.WARNING(f'发现 {totals[2]} 个孤立文件，使用 --delete 删除'))
+
+    def report_uploads(self, directory):
+        """未完成上传的临时文件：超过保留时间的视为过期"""
+        if self.delete:
+            AttachmentUploadService.delete_expired()
+        expire_before = time.time() - settings.ATTACHMENT_UPLOAD_EXPIRE_HOURS * 3600
+        count = size = stale = stale_size = 0
+        try:
+            entries = os.scandir(directory)
+        except FileNotFoundError:
+            return
+        with entries:
+            for entry in entries:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+                count += 1
+                size += stat.st_size
+                if stat.st_mtime < expire_before:
+                    stale += 1
+                    stale_size += stat.st_size
+                    if self.delete:
+                        try:
+                            os.remove(entry.path)
+                        except FileNotFoundError:
+                            pass
+        action = '已删除' if self.delete else '其中过期'
+        self.stdout.write(f'上传临时文件: {count} 个，{_format_size(size)}；{action} {stale} 个，{_format_size(stale_size)}')
+
+    def report_tasks(self, top):
+        """按任务统计附件大小（内容相同的附件按引用次数重复计算）"""
+        if top <= 0:
+            return
+        rows = (TaskAttachment.objects.values('task_id', 'task__title')
+                .annotate(total=Sum('file_size'), count=Count('id')).order_by('-total')[:top])
+        self.stdout.write(f'附件占用空间最多的 {top} 个任务:')
+        for row in rows:
+            self.stdout.write(f'  任务 {row["task_id"]:<8}{row["count"]:>6} 个{_format_size(row["total"]):>12}  '
+                              f'{row["task__title"][:40]}')
+
+    def check_rows(self, storage, batch_size):
+        """文件已丢失的附件记录（只报告，不删除）"""
+        dangling = 0
+        last_id = 0
+        while True:
+            batch = list(TaskAttachment.objects.filter(id__gt=last_id).order_by('id')
+                         .values_list('id', 'task_id', 'file')[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            for attachment_id, task_id, name in batch:
+                if not name or not os.path.exists(storage.path(name)):
+                    dangling += 1
+                    self.stdout.write(self.style.WARNING(f'  文件已丢失: 附件 {attachment_id}（任务 {task_id}）{name}'))
+        self.stdout.write(f'文件已丢失的附件记录: {dangling} 个')
@@ -0,0 +1,187 @@
+"""
+Django管理命令：接口基准测试，统计每个接口的SQL查询次数、p50/p95 响应时间和响应大小，
+与 JSON 基线比较，出现回退时以非零退出码结束（可用于上线前检查或CI）
+
+数据在独立的测试数据库中生成（SQLite 使用内存数据库，MySQL 使用 test_ 前缀的数据库），
+附件写入临时目录，不会修改正式数据。
+
+使用方法：
+    python manage.py benchmark_api --update-baseline    # 首次运行，记录基线
+    python manage.py benchmark_api                      # 与基线比较
+    python manage.py benchmark_api --filter tasks.review
+    python manage.py benchmark_api --tasks 2000 --notifications-per-user 500 --iterations 50
+
+视图的查询预算（query_budgets）是与数据量无关的固定上限（apps/tasks/tests.py 逐个操作检查），
+默认将超出预算视为回退，使用 --no-enforce-budgets 只标出超出预算的接口。
+"""
+import json
+import os
+import tempfile
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from apps.tasks.benchmark import (
+    BenchmarkDataset, BenchmarkRunner, compare_results, default_baseline_path, exceeds_budget,
+    temporary_attachment_storage
+)
+
+
+class Command(BaseCommand):
+    help = '接口基准测试：统计查询次数、响应时间和响应大小，并与基线比较'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--baseline', default=default_baseline_path(settings.BASE_DIR),
+                            help='基线文件路径（默认 benchmarks/api_baseline.json）')
+        parser.add_argument('--update-baseline', action='store_true', help='将本次结果写入基线文件')
+        parser.add_argument('--output', help='将本次结果另存为JSON文件')
+        parser.add_argument('--filter', help='只运行名称包含该字符串的接口，例如 tasks.list')
+        parser.add_argument('--iterations', type=int, default=20, help='每个接口统计的请求次数（默认20）')
+        parser.add_argument('--warmup', type=int, default=2, help='每个接口统计前的预热请求次数（默认2）')
+        parser.add_argument('--users-per-role', type=int, default=5, help='每种角色的用户数（默认5）')
+        parser.add_argument('--tasks', type=int, default=300, help='任务数（默认300）')
+        parser.add_argument('--comments-per-task', type=int, default=3, help='每个任务的评论数（默认3）')
+        parser.add_argument('--attachments-per-task', type=int, default=1, help='每个任务的附件数（默认1）')
+        parser.add_argument('--notifications-per-user', type=int, default=100, help='每个用户的通知数（默认100）')
+        parser.add_argument('--sms-records', type=int, default=500, help='短信记录数（默认500）')
+        parser.add_argument('--latency-tolerance', type=float, default=0.5,
+                            help='响应时间允许超出基线的比例（默认0.5）')
+        parser.add_argument('--latency-floor-ms', type=float, default=10.0,
+                            help='响应时间超出基线的毫秒数不超过该值时不视为回退（默认10）')
+        parser.add_argument('--size-tolerance', type=float, default=0.10,
+                            help='响应大小允许超出基线的比例（默认0.10）')
+        parser.add_argument('--no-enforce-budgets', action='store_false', dest='enforce_budgets',
+                            help='查询次数超出视图声明的预算时不视为回退（只标出）')
+        parser.add_argument('--noinput', action='store_false', dest='interactive',
+                            help='测试数据库已存在时直接删除重建，不询问')
+
+    def handle(self, *args, **options):
+        dataset = BenchmarkDataset(
+            users_per_role=options['users_per_role'],
+            tasks=options['tasks'],
+            comments_per_task=options['comments_per_task'],
+            attachments_per_task=options['attachments_per_task'],
+            notifications_per_user=options['notifications_per_user'],
+            sms_records=options['sms_records'],
+        )
+
+        report = {
+            'database': connection.vendor,
+            'dataset': dataset.describe(),
+            'iterations': options['iterations'],
+        }
+        baseline = self.load_baseline(options['baseline'], report)
+
+        def compare(results):
+            return compare_results(
+                results, baseline,
+                latency_tolerance=options['latency_tolerance'],
+                latency_floor_ms=options['latency_floor_ms'],
+                size_tolerance=options['size_tolerance'],
+                enforce_budgets=options['enforce_budgets'],
+            )
+
+        setup_test_environment()
+        # 关闭调试模式的查询记录和查询预算统计；使用本地缓存和进程内通知推送，不影响正式的 Redis 数据
+        with override_settings(
+            DEBUG=False,
+            QUERY_BUDGET_CHECK=False,
+            NOTIFICATION_STREAM_REDIS_URL='',
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                'LOCATION': 'benchmark'}},
+        ):
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=not options['interactive'], keepdb=False
+            )
+            try:
+                with tempfile.TemporaryDirectory(prefix='oms_benchmark_') as storage_dir, \
+                        temporary_attachment_storage(storage_dir):
+                    self.stdout.write(f'生成测试数据（数据库: {connection.vendor}）...')
+                    dataset.seed()
+                    runner = BenchmarkRunner(
+                        dataset,
+                        iterations=options['iterations'],
+                        warmup=options['warmup'],
+                        name_filter=options['filter'],
+                        progress=(lambda key: self.stdout.write(f'  {key}')) if options['verbosity'] > 1 else None,
+                    )
+                    results = runner.run()
+
+                    # 响应时间受机器负载影响，超出基线的接口重新测量一次，取较好的结果
+                    retry = {key for key, problems in compare(results).items()
+                             if any(problem.startswith(('p50_ms', 'p95_ms')) for problem in problems)}
+                    if retry:
+                        self.stdout.write(f'重新测量 {len(retry)} 个响应时间超出基线的接口...')
+                        for key, result in runner.run(only=retry).items():
+                            for metric in ('p50_ms', 'p95_ms'):
+                                results[key][metric] = min(results[key][metric], result[metric])
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+
+        if not results:
+            raise CommandError('没有匹配的接口')
+
+        report['created_at'] = timezone.now().isoformat()
+        report['results'] = results
+        if options['output']:
+            self.write_json(options['output'], report)
+
+        regressions = compare(results)
+        self.print_results(results, baseline, regressions)
+
+        if options['update_baseline']:
+            if options['filter'] and baseline:
+                # 只运行了部分接口时保留基线中其他接口的结果
+                report['results'] = {**baseline, **results}
+            self.write_json(options['baseline'], report)
+            self.stdout.write(self.style.SUCCESS(f'基线已更新: {options["baseline"]}'))
+            return
+
+        if regressions:
+            raise CommandError(f'{len(regressions)} 个接口出现性能回退')
+        if baseline:
+            self.stdout.write(self.style.SUCCESS('所有接口均未超出基线'))
+
+    def load_baseline(self, path, report):
+        """读取基线结果，基线的数据库或数据集与本次不同时给出提示"""
+        if not os.path.exists(path):
+            self.stdout.write(self.style.WARNING(f'基线文件不存在: {path}，使用 --update-baseline 记录基线'))
+            return {}
+        with open(path, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('database') != report['database'] or baseline.get('dataset') != report['dataset']:
+            self.stdout.write(self.style.WARNING(
+                f'基线的数据库（{baseline.get("database")}）或数据集与本次不同，比较结果仅供参考'
+            ))
+        return baseline.get('results', {})
+
+    @staticmethod
+    def write_json(path, data):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write('\n')
+
+    def print_results(self, results, baseline, regressions):
+        self.stdout.write('')
+        self.stdout.write(f'{"接口":<48}{"状态":>6}{"查询":>8}{"预算":>6}{"p50(ms)":>10}{"p95(ms)":>10}{"大小(B)":>10}')
+        for key, result in results.items():
+            previous = baseline.get(key)
+            queries = str(result['queries'])
+            if previous and previous['queries'] != result['queries']:
+                queries = f'{previous["queries"]}→{result["queries"]}'
+            line = (f'{key:<48}{result["status"]:>6}{queries:>8}{result["query_budget"] or "-":>6}'
+                    f'{result["p50_ms"]:>10.2f}{result["p95_ms"]:>10.2f}{result["bytes"]:>10}')
+            if key in regressions:
+                self.stdout.write(self.style.ERROR(line))
+                for problem in regressions[key]:
+                    self.stdout.write(self.style.ERROR(f'    ✗ {problem}'))
+            elif result['status'] >= 400 or exceeds_budget(result):
+                self.stdout.write(self.style.WARNING(line))
+            else:
+                self.stdout.write(line)
+        self.stdout.write('')
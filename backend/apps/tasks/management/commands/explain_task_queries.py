@@ -0,0 +1,119 @@
+"""
+Django管理命令：对任务、通知、短信记录的主要查询执行EXPLAIN，确认是否使用了索引
+
+有查询 EXPLAIN 执行失败或未使用预期索引时以非零退出码结束（可用于CI或上线后检查）。
+
+使用方法：
+    python manage.py explain_task_queries
+    python manage.py explain_task_queries --verbose
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from apps.tasks.models import Task
+from apps.accounts.models import User
+from apps.workflow.models import WorkflowLog, Notification, SmsRecord
+
+
+class Command(BaseCommand):
+    help = '对主要查询执行EXPLAIN，检查是否使用了预期的索引'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose',
+            action='store_true',
+            help='输出完整的执行计划'
+        )
+
+    def get_queries(self):
+        """返回 (名称, 查询集, 预期索引列表)"""
+        user = User.objects.order_by('id').first()
+        task = Task.objects.order_by('id').first()
+        user_id = user.id if user else 0
+        task_id = task.id if task else 0
+        now = timezone.now()
+
+        return [
+            ('管理方任务列表（按创建时间倒序）',
+             Task.objects.order_by('-created_at')[:10],
+             ['tasks_created_idx']),
+            ('使用方任务列表（按创建人）',
+             Task.objects.filter(creator_id=user_id).order_by('-created_at')[:10],
+             ['tasks_creator_created_idx']),
+            ('项目经理任务列表（按状态）',
+             Task.objects.filter(
+                 status__in=['reviewed', 'assigned', 'in_progress', 'completed', 'confirmed', 'closed']
+             ).order_by('-created_at')[:10],
+             ['tasks_status_created_idx', 'tasks_created_idx']),
+            ('员工任务列表（按处理人）',
+             Task.objects.filter(handler_id=user_id).order_by('-created_at')[:10],
+             ['tasks_handler_created_idx']),
+            ('按状态过滤',
+             Task.objects.filter(status='pending_review').order_by('-created_at')[:10],
+             ['tasks_status_created_idx']),
+            ('按类型过滤',
+             Task.objects.filter(task_type='problem').order_by('-created_at')[:10],
+             ['tasks_type_created_idx']),
+            ('按优先级过滤',
+             Task.objects.filter(priority='high').order_by('-created_at')[:10],
+             ['tasks_priority_created_idx']),
+            ('按创建日期过滤',
+             Task.objects.filter(created_at__gte=now - timedelta(days=1), created_at__lt=now).order_by('-created_at')[:10],
+             ['tasks_created_idx']),
+            ('未读通知',
+             Notification.objects.filter(user_id=user_id, is_read=False).order_by('-created_at')[:20],
+             ['notif_user_read_created_idx', 'notif_user_created_idx']),
+            ('通知列表',
+             Notification.objects.filter(user_id=user_id).order_by('-created_at')[:20],
+             ['notif_user_created_idx', 'notif_user_read_created_idx']),
+            ('任务工作流日志',
+             WorkflowLog.objects.filter(task_id=task_id).order_by('-created_at'),
+             ['wflog_task_created_idx']),
+            ('短信发送服务领取待发送记录',
+             SmsRecord.objects.filter(status='pending').order_by('created_at')[:20],
+             ['sms_status_created_idx']),
+        ]
+
+    def handle(self, *args, **options):
+        verbose = options.get('verbose')
+
+        self.stdout.write(self.style.SUCCESS('=' * 60))
+        self.stdout.write(self.style.SUCCESS(f'查询执行计划检查（数据库: {connection.vendor}）'))
+        self.stdout.write(self.style.SUCCESS('=' * 60))
+
+        failed = missing = 0
+        for name, queryset, expected_indexes in self.get_queries():
+            try:
+                plan = queryset.explain()
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'✗ {name}: EXPLAIN 执行失败: {e}'))
+                failed += 1
+                continue
+
+            used = [index for index in expected_indexes if index in plan]
+            if used:
+                self.stdout.write(self.style.SUCCESS(f'✓ {name}: 使用索引 {", ".join(used)}'))
+            else:
+                missing += 1
+                self.stdout.write(self.style.WARNING(
+                    f'✗ {name}: 未使用预期索引（{", ".join(expected_indexes)}）'
+                ))
+
+            if verbose or not used:
+                self.stdout.write(f'  SQL: {queryset.query}')
+                for line in plan.splitlines():
+                    self.stdout.write(f'  {line}')
+
+        self.stdout.write('')
+        if failed or missing:
+            problems = []
+            if failed:
+                problems.append(f'{failed} 个查询 EXPLAIN 执行失败')
+            if missing:
+                problems.append(f'{missing} 个查询未使用预期索引')
+            raise CommandError(
+                f'{"，".join(problems)}。数据量较小时优化器可能选择全表扫描，'
+                f'请在生产数据量下执行 ANALYZE TABLE 后重新检查。'
+            )
+        self.stdout.write(self.style.SUCCESS('所有查询均使用了预期索引'))
@@ -0,0 +1,45 @@
+"""
+Django管理命令：为已有的图片附件生成缩略图和预览图
+
+新上传的图片附件在上传后自动生成缩略图，本命令用于升级后补充生成，
+或修改 ATTACHMENT_THUMBNAIL_SIZE、ATTACHMENT_PREVIEW_SIZE 后重新生成。
+只处理按内容保存的附件，旧附件需要先执行 migrate_attachment_blobs。
+
+使用方法：
+    python manage.py generate_attachment_previews           # 只生成缺少的缩略图
+    python manage.py generate_attachment_previews --force   # 重新生成全部缩略图
+"""
+from django.core.management.base import BaseCommand
+from apps.tasks.models import AttachmentBlob
+from apps.tasks.previews import AttachmentPreviewService, is_image
+
+
+class Command(BaseCommand):
+    help = '为已有的图片附件生成缩略图和预览图'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='重新生成已有的缩略图')
+        parser.add_argument('--batch-size', type=int, default=500, help='每批读取的文件记录数（默认500）')
+
+    def handle(self, *args, **options):
+        generated = failed = 0
+        last_sha256 = ''
+        while True:
+            batch = list(
+                AttachmentBlob.objects.filter(sha256__gt=last_sha256).order_by('sha256')
+                .values_list('sha256', 'name')[:options['batch_size']]
+            )
+            if not batch:
+                break
+            last_sha256 = batch[-1][0]
+
+            for sha256, name in batch:
+                if not is_image(name):
+                    continue
+                if AttachmentPreviewService.generate(name, sha256, force=options['force']):
+                    generated += 1
+                else:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f'无法生成缩略图: {name}'))
+
+        self.stdout.write(self.style.SUCCESS(f'处理 {generated} 个图片文件，失败 {failed} 个'))
@@ -0,0 +1,95 @@
+"""
+Django管理命令：把按原文件名保存的旧附件转换为按内容寻址的文件，内容相同的附件只保留一份
+
+逐个计算旧附件文件的 SHA-256（按块读取），已有相同内容的文件时删除旧文件并引用已有文件，
+否则把旧文件移动到按内容命名的位置。可重复执行，已转换的附件会跳过。
+
+使用方法：
+    python manage.py migrate_attachment_blobs --dry-run   # 只统计可节省的空间
+    python manage.py migrate_attachment_blobs
+"""
+import hashlib
+import os
+import shutil
+import uuid
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from apps.tasks.blob_store import AttachmentBlobStore, attachment_storage
+from apps.tasks.models import AttachmentBlob, TaskAttachment
+from apps.tasks.upload_service import CHUNK_SIZE, staging_path
+
+
+def _file_sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for data in iter(lambda: f.read(CHUNK_SIZE), b''):
+            sha256.update(data)
+    return sha256.hexdigest()
+
+
+class Command(BaseCommand):
+    help = '把旧附件转换为按内容寻址的文件（内容相同的附件只保留一份）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='只统计，不修改文件和数据库')
+        parser.add_argument('--batch-size', type=int, default=500, help='每批读取的附件数（默认500）')
+
+    def handle(self, *args, **options):
+        storage = attachment_storage()
+        dry_run = options['dry_run']
+        converted = deduplicated = missing = saved = 0
+        # dry-run 时记录已统计的内容，用于估算重复的文件
+        seen = set()
+
+        last_id = 0
+        while True:
+            batch = list(
+                TaskAttachment.objects.filter(blob__isnull=True, id__gt=last_id)
+                .order_by('id').only('id', 'file', 'original_filename')[:options['batch_size']]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            for attachment in batch:
+                if not attachment.file:
+                    missing += 1
+                    continue
+                path = storage.path(attachment.file.name)
+                if not os.path.exists(path):
+                    missing += 1
+                    self.stdout.write(self.style.WARNING(f'文件已丢失: 附件 {attachment.id} {attachment.file.name}'))
+                    continue
+                size = os.path.getsize(path)
+                sha256 = _file_sha256(path)
+                duplicate = sha256 in seen or AttachmentBlob.objects.filter(pk=sha256).exists()
+                seen.add(sha256)
+                converted += 1
+                if duplicate:
+                    deduplicated += 1
+                    saved += size
+                if dry_run:
+                    continue
+                self.convert(attachment, path, sha256, size)
+
+        prefix = '[dry-run] ' if dry_run else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}转换 {converted} 个附件，其中 {deduplicated} 个与已有文件内容相同，'
+            f'节省 {saved / 1024 / 1024:.1f} MB；文件丢失 {missing} 个'
+        ))
+
+    @staticmethod
+    def convert(attachment, path, sha256, size):
+        """用硬链接把旧文件交给 AttachmentBlobStore，数据库提交后再删除旧文件"""
+        temp_path = staging_path(f'{uuid.uuid4().hex}.part')
+        try:
+            os.link(path, temp_path)
+        except OSError:
+            shutil.copyfile(path, temp_path)
+        with transaction.atomic():
+            blob = AttachmentBlobStore.add_reference(temp_path, sha256, size, attachment.original_filename)
+            TaskAttachment.objects.filter(pk=attachment.pk).update(
+                file=blob.name, blob=blob, sha256=sha256, file_size=size
+            )
+        if os.path.abspath(path) != os.path.abspath(attachment_storage().path(blob.name)):
+            os.remove(path)
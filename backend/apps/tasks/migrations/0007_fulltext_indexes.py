@@ -0,0 +1,40 @@
+# Generated manually for task full-text search (MySQL FULLTEXT with ngram parser)
+
+from django.db import migrations
+
+
+FULLTEXT_INDEXES = [
+    ('tasks', 'tasks_title_desc_ft', ['title', 'description']),
+    ('comments', 'comments_content_ft', ['content']),
+]
+
+
+def create_fulltext_indexes(apps, schema_editor):
+    # 只有MySQL支持FULLTEXT ngram索引，其他数据库使用进程内倒排索引
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    qn = schema_editor.quote_name
+    for table, name, columns in FULLTEXT_INDEXES:
+        schema_editor.execute(
+            f'CREATE FULLTEXT INDEX {qn(name)} ON {qn(table)} '
+            f'({", ".join(qn(column) for column in columns)}) WITH PARSER ngram'
+        )
+
+
+def drop_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    qn = schema_editor.quote_name
+    for table, name, columns in FULLTEXT_INDEXES:
+        schema_editor.execute(f'DROP INDEX {qn(name)} ON {qn(table)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0006_task_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_indexes, drop_fulltext_indexes),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.11 on 2026-10-17 05:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tasks', '0007_fulltext_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskattachment',
+            name='sha256',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='SHA-256'),
+        ),
+        migrations.CreateModel(
+            name='TaskAttachmentUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('original_filename', models.CharField(max_length=255, verbose_name='原始文件名')),
+                ('file_size', models.BigIntegerField(verbose_name='文件大小（字节）')),
+                ('sha256', models.CharField(blank=True, default='', max_length=64, verbose_name='客户端提供的SHA-256')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='创建时间')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attachment_uploads', to='tasks.task', verbose_name='任务')),
+                ('uploaded_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='上传人')),
+            ],
+            options={
+                'verbose_name': '附件上传会话',
+                'verbose_name_plural': '附件上传会话',
+                'db_table': 'task_attachment_uploads',
+            },
+        ),
+    ]
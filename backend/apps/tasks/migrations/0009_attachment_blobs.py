@@ -0,0 +1,34 @@
+# Generated by Django 4.2.11 on 2026-10-17 05:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0008_attachment_uploads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttachmentBlob',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='SHA-256')),
+                ('name', models.CharField(max_length=255, verbose_name='存储路径')),
+                ('size', models.BigIntegerField(verbose_name='文件大小（字节）')),
+                ('ref_count', models.IntegerField(default=0, verbose_name='引用数')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+            ],
+            options={
+                'verbose_name': '附件文件',
+                'verbose_name_plural': '附件文件',
+                'db_table': 'task_attachment_blobs',
+            },
+        ),
+        migrations.AddField(
+            model_name='taskattachment',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='attachments', to='tasks.attachmentblob', verbose_name='文件内容'),
+        ),
+    ]
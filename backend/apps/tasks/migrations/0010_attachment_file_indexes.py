@@ -0,0 +1,21 @@
+# Generated by Django 4.2.11 on 2026-10-17 05:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0009_attachment_blobs'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attachmentblob',
+            index=models.Index(fields=['name'], name='task_blobs_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskattachment',
+            index=models.Index(fields=['file'], name='task_attachments_file_idx'),
+        ),
+    ]
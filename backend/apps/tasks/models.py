@@ -1,3 +1,4 @@
+import uuid
 from django.db import models
 from django.conf import settings
 from .storage import DateBasedFileStorage
@@ -64,6 +65,17 @@ class Task(models.Model):
         verbose_name = '任务'
         verbose_name_plural = '任务'
         ordering = ['-created_at']
+        indexes = [
+            # 列表默认按创建时间倒序，管理方无过滤条件、按创建日期范围过滤时使用
+            models.Index(fields=['created_at'], name='tasks_created_idx'),
+            # 按角色过滤（项目经理按状态、使用方按创建人、员工按处理人）后按创建时间排序
+            models.Index(fields=['status', 'created_at'], name='tasks_status_created_idx'),
+            models.Index(fields=['creator', 'created_at'], name='tasks_creator_created_idx'),
+            models.Index(fields=['handler', 'created_at'], name='tasks_handler_created_idx'),
+            # 按类型、优先级过滤后按创建时间排序
+            models.Index(fields=['task_type', 'created_at'], name='tasks_type_created_idx'),
+            models.Index(fields=['priority', 'created_at'], name='tasks_priority_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} ({self.get_status_display()})"
@@ -86,6 +98,27 @@ class Comment(models.Model):
         return f"{self.user.username} 评论: {self.content[:50]}"
 
 
+class AttachmentBlob(models.Model):
+    """附件文件内容（按 SHA-256 寻址，内容相同的附件共用一个文件）"""
+    sha256 = models.CharField(max_length=64, primary_key=True, verbose_name='SHA-256')
+    name = models.CharField(max_length=255, verbose_name='存储路径')
+    size = models.BigIntegerField(verbose_name='文件大小（字节）')
+    ref_count = models.IntegerField(default=0, verbose_name='引用数')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+
+    class Meta:
+        db_table = 'task_attachment_blobs'
+        verbose_name = '附件文件'
+        verbose_name_plural = '附件文件'
+        indexes = [
+            # 清理孤立文件时按存储路径批量查找
+            models.Index(fields=['name'], name='task_blobs_name_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count})"
+
+
 class TaskAttachment(models.Model):
     """任务附件模型"""
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='attachments', verbose_name='任务')
@@ -96,6 +129,16 @@ class TaskAttachment(models.Model):
     )
     original_filename = models.CharField(max_length=255, verbose_name='原始文件名')
     file_size = models.BigIntegerField(verbose_name='文件大小（字节）')
+    sha256 = models.CharField(max_length=64, blank=True, default='', verbose_name='SHA-256')
+    # 按内容寻址的文件，为空表示按原文件名保存的旧附件
+    blob = models.ForeignKey(
+        AttachmentBlob,
+        null=True,
+        blank=True,
+        on_delete=models.PROTECT,
+        related_name='attachments',
+        verbose_name='文件内容'
+    )
     uploaded_by = models.ForeignKey(
         settings.AUTH_USER_MODEL, 
         on_delete=models.CASCADE, 
@@ -108,6 +151,10 @@ class TaskAttachment(models.Model):
         verbose_name = '任务附件'
         verbose_name_plural = '任务附件'
         ordering = ['-created_at']
+        indexes = [
+            # 清理孤立文件时按存储路径批量查找
+            models.Index(fields=['file'], name='task_attachments_file_idx'),
+        ]
     
     def __str__(self):
         return f"{self.original_filename} ({self.task.title})"
@@ -125,3 +172,26 @@ class TaskAttachment(models.Model):
         return f"{size:.2f} TB"
 
 
+
+
+class TaskAttachmentUpload(models.Model):
+    """附件断点续传会话（已接收的内容保存在附件目录的 .uploads/ 下，全部接收后生成附件）"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='attachment_uploads', verbose_name='任务')
+    original_filename = models.CharField(max_length=255, verbose_name='原始文件名')
+    file_size = models.BigIntegerField(verbose_name='文件大小（字节）')
+    sha256 = models.CharField(max_length=64, blank=True, default='', verbose_name='客户端提供的SHA-256')
+    uploaded_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        verbose_name='上传人'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='创建时间')
+
+    class Meta:
+        db_table = 'task_attachment_uploads'
+        verbose_name = '附件上传会话'
+        verbose_name_plural = '附件上传会话'
+
+    def __str__(self):
+        return f"{self.original_filename} ({self.id})"
@@ -0,0 +1,125 @@
+"""分页类（页码分页 + 可选的游标/键集分页）"""
+import base64
+from collections import OrderedDict
+from datetime import datetime
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPageNumberPagination(PageNumberPagination):
+    """默认按页码分页，可选切换为按 (created_at, id) 的键集分页
+
+    请求携带 ?pagination=cursor 或 ?cursor=... 时使用键集分页：
+    - 按 created_at、id 倒序，使用 WHERE 条件定位下一页，不使用 OFFSET
+    - 不执行 COUNT(*) 查询，响应中只有 next、previous 和 results
+    因此无论翻到多深，每次请求的开销都相同。
+    """
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    keyset_mode = 'cursor'
+    invalid_cursor_message = '无效的游标'
+
+    def use_keyset(self, request):
+        """是否使用键集分页"""
+        return (
+            request.query_params.get(self.mode_query_param) == self.keyset_mode
+            or self.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.use_keyset(request)
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+        return self.paginate_queryset_keyset(queryset, request)
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def paginate_queryset_keyset(self, queryset, request):
+        """键集分页"""
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        created_at, pk, reverse = self.decode_cursor(request)
+
+        if created_at is None:
+            # 第一页
+            queryset = queryset.order_by('-created_at', '-id')
+        elif not reverse:
+            # 下一页：(created_at, id) 严格小于游标位置
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            ).order_by('-created_at', '-id')
+        else:
+            # 上一页：(created_at, id) 严格大于游标位置，正序取后再反转
+            queryset = queryset.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+            ).order_by('created_at', 'id')
+
+        # 多取一条用于判断是否还有更多数据，避免COUNT查询
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = created_at is not None
+
+        self.page = results
+        return results
+
+    def encode_cursor(self, obj, reverse):
+        """将 (created_at, id, 方向) 编码为游标URL"""
+        position = f"{obj.created_at.isoformat()}|{obj.pk}|{'r' if reverse else 'f'}"
+        encoded = base64.urlsafe_b64encode(position.encode('utf-8')).decode('ascii')
+        url = remove_query_param(self.base_url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        """解析游标，返回 (created_at, id, 是否向前翻页)"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, None, False
+        try:
+            position = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8')
+            created_at, pk, direction = position.split('|')
+            return datetime.fromisoformat(created_at), int(pk), direction == 'r'
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class TaskPagination(KeysetPageNumberPagination):
+    """任务分页类"""
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
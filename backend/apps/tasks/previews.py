@@ -0,0 +1,182 @@
+"""
+图片附件的缩略图和预览图
+
+按内容保存的图片附件上传后，在后台线程中用 Pillow 生成两种缩小的 JPEG，与原文件放在同一目录：
+- <sha256>_thumbnail.jpg：附件列表中显示的缩略图（ATTACHMENT_THUMBNAIL_SIZE）
+- <sha256>_preview.jpg：点击缩略图后查看的预览图（ATTACHMENT_PREVIEW_SIZE）
+浏览任务时只下载几十KB的缩略图，不再下载原图。
+
+文件名由内容决定，相同内容的附件共用同一组缩略图，内容文件的引用数为0时一起删除。
+请求缩略图时文件还未生成（后台线程尚未完成或进程重启）则当场生成。
+
+<img> 和小程序 <image> 不能携带 JWT 请求头，缩略图地址带有签名和到期时间（不需要登录），
+在同一个 ATTACHMENT_PREVIEW_URL_TTL 周期内地址不变，浏览器按到期时间缓存。
+"""
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.urls import reverse
+from PIL import Image, ImageOps
+from .blob_store import attachment_storage
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_KINDS = ('thumbnail', 'preview')
+# 可以生成缩略图的图片格式（按文件扩展名判断）
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp')
+
+# 缩略图文件名：<sha256>_<种类>.jpg
+DERIVED_NAME_PATTERN = re.compile(r'^(?P<sha256>[0-9a-f]{64})_(?P<kind>thumbnail|preview)\.jpg$')
+
+_signer = signing.Signer(salt='apps.tasks.previews')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def is_image(name):
+    return os.path.splitext(name or '')[1].lower() in IMAGE_EXTENSIONS
+
+
+def derived_name(blob_name, sha256, kind):
+    """缩略图在存储中的名称（与内容文件在同一目录）"""
+    directory = os.path.dirname(blob_name.replace('\\', '/'))
+    return f'{directory}/{sha256}_{kind}.jpg' if directory else f'{sha256}_{kind}.jpg'
+
+
+def _target_size(kind):
+    size = settings.ATTACHMENT_THUMBNAIL_SIZE if kind == 'thumbnail' else settings.ATTACHMENT_PREVIEW_SIZE
+    return size, size
+
+
+class AttachmentPreviewService:
+    """生成、删除和签名缩略图"""
+
+    @staticmethod
+    def can_preview(attachment):
+        """按内容保存的图片附件才有缩略图（旧附件可用 migrate_attachment_blobs 转换）"""
+        return attachment.blob_id is not None and bool(attachment.sha256) and is_image(attachment.file.name)
+
+    @staticmethod
+    def generate(blob_name, sha256, force=False):
+        """生成缺少的缩略图，返回是否成功（原图无法解码时返回False）"""
+        storage = attachment_storage()
+        paths = {kind: storage.path(derived_name(blob_name, sha256, kind)) for kind in PREVIEW_KINDS}
+        if not force and all(os.path.exists(path) for path in paths.values()):
+            return True
+
+        try:
+            with Image.open(storage.path(blob_name)) as source:
+                # JPEG 在解码时直接按 1/2、1/4、1/8 缩小，大图只解码需要的像素
+                source.draft('RGB', _target_size('preview'))
+                image = ImageOps.exif_transpose(source)
+                image.thumbnail(_target_size('preview'), Image.Resampling.LANCZOS, reducing_gap=3.0)
+                image = _to_rgb(image)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            # 文件不是有效图片、像素数超出 Image.MAX_IMAGE_PIXELS 等
+            logger.warning(f'生成缩略图失败（{blob_name}）: {e}')
+            return False
+
+        # 缩略图由预览图缩小，不再解码原图
+        thumbnail = image.copy()
+        thumbnail.thumbnail(_target_size('thumbnail'), Image.Resampling.LANCZOS)
+        for kind, result in (('preview', image), ('thumbnail', thumbnail)):
+            _save_jpeg(result, paths[kind], storage)
+        return True
+
+    @staticmethod
+    def delete(blob_name, sha256):
+        """删除内容文件的缩略图（AttachmentBlobStore.release 中调用）"""
+        storage = attachment_storage()
+        for kind in PREVIEW_KINDS:
+            storage.delete(derived_name(blob_name, sha256, kind))
+
+    @staticmethod
+    def schedule(attachment):
+        """事务提交后在后台线程中生成附件的缩略图"""
+        if not AttachmentPreviewService.can_preview(attachment):
+            return
+        blob_name, sha256 = attachment.file.name, attachment.sha256
+        transaction.on_commit(lambda: _get_executor().submit(_generate_in_background, blob_name, sha256))
+
+    @staticmethod
+    def url(request, attachment, kind):
+        """带签名的缩略图地址，不能生成缩略图的附件返回None"""
+        if not AttachmentPreviewService.can_preview(attachment):
+            return None
+        ttl = settings.ATTACHMENT_PREVIEW_URL_TTL
+        # 到期时间按周期取整：同一周期内地址不变，浏览器缓存可以重复使用，地址至少在一个周期内有效
+        expires = (int(time.time()) // ttl + 2) * ttl
+        value = f'{attachment.task_id}:{attachment.pk}:{attachment.sha256}:{kind}:{expires}'
+        path = reverse('task-attachment-preview', kwargs={
+            'pk': attachment.task_id, 'attachment_id': attachment.pk, 'kind': kind
+        })
+        return request.build_absolute_uri(f'{path}?expires={expires}&signature={_signer.signature(value)}')
+
+    @staticmethod
+    def check_signature(attachment, kind, expires, signature):
+        """校验缩略图地址，有效时返回剩余的秒数，否则返回None"""
+        try:
+            expires = int(expires)
+        except (TypeError, ValueError):
+            return None
+        remaining = expires - int(time.time())
+        if remaining <= 0:
+            return None
+        value = f'{attachment.task_id}:{attachment.pk}:{attachment.sha256}:{kind}:{expires}'
+        if not signing.constant_time_compare(str(signature or ''), _signer.signature(value)):
+            return None
+        return remaining
+
+
+def _to_rgb(image):
+    """转换为 JPEG 可以保存的 RGB，透明部分填充白色"""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    if image.mode != 'RGB':
+        return image.convert('RGB')
+    return image
+
+
+def _save_jpeg(image, path, storage):
+    """先写入临时文件再替换，请求方不会读到写了一半的文件"""
+    temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    try:
+        image.save(temp_path, 'JPEG', quality=settings.ATTACHMENT_PREVIEW_QUALITY, optimize=True, progressive=True)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    if storage.file_permissions_mode is not None:
+        os.chmod(path, storage.file_permissions_mode)
+
+
+def _generate_in_background(blob_name, sha256):
+    try:
+        AttachmentPreviewService.generate(blob_name, sha256)
+    except Exception:
+        logger.exception(f'生成缩略图失败（{blob_name}）')
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.ATTACHMENT_PREVIEW_WORKERS, thread_name_prefix='attachment-preview'
+                )
+    return _executor
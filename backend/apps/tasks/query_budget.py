@@ -0,0 +1,65 @@
+"""
+接口查询次数预算
+
+视图集通过 query_budgets 声明每个操作允许执行的SQL查询次数。
+开启 QUERY_BUDGET_CHECK 后（默认跟随 DEBUG），每个请求统计实际执行的查询次数，
+通过 X-Query-Count 响应头返回，超出预算时记录警告日志，便于发现 N+1 查询等回退。
+benchmark_api 管理命令按同样的预算检查每个操作，超出预算时以非零退出码结束（可用于CI），
+apps/tasks/tests.py 中的测试逐个操作检查预算。
+
+事务控制语句（BEGIN、SAVEPOINT 等）不计入查询次数：它们的数量取决于数据库类型
+和请求是否在外层事务中执行（如测试用例），不反映接口本身的查询。
+"""
+import logging
+from typing import Optional
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+TRANSACTION_STATEMENTS = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE SAVEPOINT')
+
+
+def is_transaction_statement(sql: str) -> bool:
+    """是否为事务控制语句"""
+    return sql.lstrip().upper().startswith(TRANSACTION_STATEMENTS)
+
+
+class QueryCounter:
+    """统计执行的SQL查询次数（用作 connection.execute_wrapper）"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if not is_transaction_statement(sql):
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+class QueryBudgetMixin:
+    """按操作检查查询次数预算的视图集 Mixin"""
+
+    # 操作名 -> 允许的最大查询次数
+    query_budgets = {}
+
+    def get_query_budget(self) -> Optional[int]:
+        """当前请求的查询次数预算，没有预算时返回None"""
+        return self.query_budgets.get(getattr(self, 'action', None))
+
+    def dispatch(self, request, *args, **kwargs):
+        if not getattr(settings, 'QUERY_BUDGET_CHECK', False):
+            return super().dispatch(request, *args, **kwargs)
+
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = super().dispatch(request, *args, **kwargs)
+
+        response['X-Query-Count'] = str(counter.count)
+        budget = self.get_query_budget()
+        if budget is not None and counter.count > budget:
+            logger.warning(
+                f'[查询预算] {self.__class__.__name__}.{self.action} 执行了 {counter.count} 次查询，'
+                f'超出预算 {budget} 次（{request.method} {request.path}）'
+            )
+        return response
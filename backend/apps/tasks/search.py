@@ -0,0 +1,392 @@
+"""
+任务全文搜索（任务标题、描述、评论、工作流日志备注）
+
+后端：
+- MySQLFullTextBackend: 使用带 ngram 解析器的 FULLTEXT 索引（支持中文），按相关度排序
+- InvertedIndexBackend: 进程内倒排索引，用于 SQLite 等不支持 FULLTEXT 的数据库（开发、测试环境）
+
+通过 settings.TASK_SEARCH_BACKEND 选择后端：'auto'（默认，按数据库类型选择）、
+'mysql'、'inverted_index' 或自定义后端类的完整路径。
+"""
+import logging
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, When, Value, IntegerField
+from django.db.models.signals import post_save, post_delete
+from django.utils.module_loading import import_string
+from .models import Task, Comment
+
+logger = logging.getLogger(__name__)
+
+# 与 MySQL ngram_token_size 默认值保持一致
+NGRAM_SIZE = 2
+
+# 按非文字字符切分（标点、空白），每一段再切分为 ngram
+_SPLIT_RE = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def split_terms(text: str) -> List[str]:
+    """将文本切分为小写的连续文字片段"""
+    if not text:
+        return []
+    return [term for term in _SPLIT_RE.split(text.lower()) if term]
+
+
+def ngrams(term: str, size: int = NGRAM_SIZE) -> List[str]:
+    """将片段切分为 ngram（片段长度不足时返回片段本身）"""
+    if len(term) <= size:
+        return [term]
+    return [term[i:i + size] for i in range(len(term) - size + 1)]
+
+
+def searchable_terms(query: str) -> Optional[List[str]]:
+    """切分搜索关键字；包含短于 ngram 长度的片段时返回 None（无法通过 ngram 索引匹配）"""
+    terms = split_terms(query)
+    if not terms or any(len(term) < NGRAM_SIZE for term in terms):
+        return None
+    return terms
+
+
+class BaseSearchBackend:
+    """搜索后端基类"""
+
+    def search(self, query: str, limit: Optional[int], queryset=None) -> Optional[List[Tuple[int, float]]]:
+        """搜索任务
+
+        Args:
+            limit: 最多返回的任务数，None 表示不限制
+            queryset: 只在该任务查询集（如按角色过滤后的任务）中搜索，先限定范围再取前 limit 个
+
+        Returns:
+            按相关度从高到低排列的 (任务ID, 相关度) 列表；
+            返回 None 表示该后端无法处理此查询，调用方应退回到普通的模糊匹配
+        """
+        raise NotImplementedError
+
+    def index_task(self, task_id: int):
+        """任务或其评论、日志变化后更新索引"""
+
+    def remove_task(self, task_id: int):
+        """任务删除后移除索引"""
+
+
+class MySQLFullTextBackend(BaseSearchBackend):
+    """MySQL FULLTEXT（ngram）搜索后端，索引由数据库维护"""
+
+    # 各字段的相关度权重
+    TASK_WEIGHT = 3
+    COMMENT_WEIGHT = 1
+    LOG_WEIGHT = 1
+
+    @staticmethod
+    def build_boolean_query(query: str) -> Optional[str]:
+        """构建 BOOLEAN MODE 查询：每个片段必须出现，按短语匹配"""
+        terms = searchable_terms(query)
+        if not terms:
+            return None
+        return ' '.join(f'+"{term}"' for term in terms)
+
+    def search(self, query, limit, queryset=None):
+        boolean_query = self.build_boolean_query(query)
+        if not boolean_query:
+            return None
+
+        from apps.workflow.models import WorkflowLog
+        qn = connection.ops.quote_name
+        task_table = qn(Task._meta.db_table)
+        comment_table = qn(Comment._meta.db_table)
+        log_table = qn(WorkflowLog._meta.db_table)
+
+        # 查询集（按角色、状态等过滤）作为子查询放在分组之前，LIMIT 只作用于范围内的任务
+        scope_sql, scope_params = '', []
+        if queryset is not None:
+            subquery, scope_params = queryset.order_by().values('id').query.sql_with_params()
+            scope_sql = f'WHERE task_id IN ({subquery})'
+        limit_sql = 'LIMIT %s' if limit is not None else ''
+
+        sql = f"""
+            SELECT task_id, SUM(score) AS relevance FROM (
+                SELECT id AS task_id,
+                       MATCH(title, description) AGAINST (%s IN BOOLEAN MODE) * {self.TASK_WEIGHT} AS score
+                FROM {task_table}
+                WHERE MATCH(title, description) AGAINST (%s IN BOOLEAN MODE)
+                UNION ALL
+                SELECT task_id,
+                       MATCH(content) AGAINST (%s IN BOOLEAN MODE) * {self.COMMENT_WEIGHT} AS score
+                FROM {comment_table}
+                WHERE MATCH(content) AGAINST (%s IN BOOLEAN MODE)
+                UNION ALL
+                SELECT task_id,
+                       MATCH(`comment`) AGAINST (%s IN BOOLEAN MODE) * {self.LOG_WEIGHT} AS score
+                FROM {log_table}
+                WHERE MATCH(`comment`) AGAINST (%s IN BOOLEAN MODE)
+            ) AS matches
+            {scope_sql}
+            GROUP BY task_id
+            ORDER BY relevance DESC, task_id DESC
+            {limit_sql}
+        """
+        params = [boolean_query] * 6 + list(scope_params) + ([limit] if limit is not None else [])
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [(task_id, float(relevance)) for task_id, relevance in cursor.fetchall()]
+
+
+class InvertedIndexBackend(BaseSearchBackend):
+    """进程内倒排索引搜索后端
+
+    首次搜索时从数据库构建索引，之后通过模型信号增量更新。
+    索引只存在于当前进程中，适用于 SQLite 开发和测试环境。
+    """
+
+    TITLE_WEIGHT = 3
+    DESCRIPTION_WEIGHT = 1
+    COMMENT_WEIGHT = 1
+    LOG_WEIGHT = 1
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        # ngram -> {任务ID: 加权词频}
+        self._postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        # 任务ID -> {ngram: 加权词频}，用于增量更新时移除旧索引
+        self._documents: Dict[int, Dict[str, float]] = {}
+
+    @classmethod
+    def _add_text(cls, weights: Dict[str, float], text: Optional[str], weight: float):
+        for term in split_terms(text):
+            for gram in ngrams(term):
+                weights[gram] = weights.get(gram, 0) + weight
+
+    def _store(self, task_id: int, weights: Dict[str, float]):
+        self._drop(task_id)
+        if not weights:
+            return
+        self._documents[task_id] = weights
+        for gram, weight in weights.items():
+            self._postings[gram][task_id] = weight
+
+    def _drop(self, task_id: int):
+        weights = self._documents.pop(task_id, None)
+        if not weights:
+            return
+        for gram in weights:
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.pop(task_id, None)
+                if not postings:
+                    del self._postings[gram]
+
+    def _build(self):
+        """从数据库全量构建索引"""
+        from apps.workflow.models import WorkflowLog
+        documents: Dict[int, Dict[str, float]] = defaultdict(dict)
+        for task_id, title, description in Task.objects.values_list('id', 'title', 'description').iterator():
+            self._add_text(documents[task_id], title, self.TITLE_WEIGHT)
+            self._add_text(documents[task_id], description, self.DESCRIPTION_WEIGHT)
+        for task_id, content in Comment.objects.values_list('task_id', 'content').iterator():
+            self._add_text(documents[task_id], content, self.COMMENT_WEIGHT)
+        for task_id, comment in WorkflowLog.objects.exclude(comment__isnull=True).exclude(comment='') \
+                .values_list('task_id', 'comment').iterator():
+            self._add_text(documents[task_id], comment, self.LOG_WEIGHT)
+
+        self._postings = defaultdict(dict)
+        self._documents = {}
+        for task_id, weights in documents.items():
+            self._store(task_id, weights)
+        self._built = True
+
+    def _ensure_built(self):
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self._build()
+
+    def reset(self):
+        """清空索引，下次搜索时重新构建"""
+        with self._lock:
+            self._postings = defaultdict(dict)
+            self._documents = {}
+            self._built = False
+
+    def index_task(self, task_id):
+        if not self._built:
+            return
+        from apps.workflow.models import WorkflowLog
+        with self._lock:
+            task = Task.objects.filter(id=task_id).values_list('title', 'description').first()
+            if task is None:
+                self._drop(task_id)
+                return
+            weights: Dict[str, float] = {}
+            self._add_text(weights, task[0], self.TITLE_WEIGHT)
+            self._add_text(weights, task[1], self.DESCRIPTION_WEIGHT)
+            for content in Comment.objects.filter(task_id=task_id).values_list('content', flat=True):
+                self._add_text(weights, content, self.COMMENT_WEIGHT)
+            for comment in WorkflowLog.objects.filter(task_id=task_id).values_list('comment', flat=True):
+                self._add_text(weights, comment, self.LOG_WEIGHT)
+            self._store(task_id, weights)
+
+    def remove_task(self, task_id):
+        if not self._built:
+            return
+        with self._lock:
+            self._drop(task_id)
+
+    def _match_term(self, term: str) -> Dict[int, float]:
+        """匹配单个片段：片段的所有 ngram 都需出现"""
+        scores = None
+        for gram in ngrams(term):
+            postings = self._postings.get(gram)
+            if not postings:
+                return {}
+            if scores is None:
+                scores = dict(postings)
+            else:
+                scores = {task_id: score + postings[task_id]
+                          for task_id, score in scores.items() if task_id in postings}
+                if not scores:
+                    return {}
+        return scores or {}
+
+    def search(self, query, limit, queryset=None):
+        terms = searchable_terms(query)
+        if not terms:
+            return None
+        self._ensure_built()
+
+        with self._lock:
+            scores = None
+            for term in terms:
+                matched = self._match_term(term)
+                if scores is None:
+                    scores = dict(matched)
+                else:
+                    scores = {task_id: score + matched[task_id]
+                              for task_id, score in scores.items() if task_id in matched}
+                if not scores:
+                    return []
+
+        if queryset is not None:
+            # 先限定到查询集范围内，再按相关度取前 limit 个
+            allowed = set(queryset.filter(id__in=list(scores)).values_list('id', flat=True))
+            scores = {task_id: score for task_id, score in scores.items() if task_id in allowed}
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+        return ranked[:limit] if limit is not None else ranked
+
+
+BACKEND_ALIASES = {
+    'mysql': MySQLFullTextBackend,
+    'inverted_index': InvertedIndexBackend,
+}
+
+
+class TaskSearchService:
+    """任务搜索服务类"""
+
+    _backend = None
+    _backend_lock = threading.Lock()
+
+    @classmethod
+    def get_backend(cls) -> BaseSearchBackend:
+        """获取当前配置的搜索后端（进程内单例）"""
+        if cls._backend is None:
+            with cls._backend_lock:
+                if cls._backend is None:
+                    cls._backend = cls._create_backend()
+        return cls._backend
+
+    @staticmethod
+    def _create_backend() -> BaseSearchBackend:
+        name = getattr(settings, 'TASK_SEARCH_BACKEND', 'auto') or 'auto'
+        if name == 'auto':
+            name = 'mysql' if connection.vendor == 'mysql' else 'inverted_index'
+        backend_class = BACKEND_ALIASES.get(name) or import_string(name)
+        return backend_class()
+
+    @staticmethod
+    def get_max_results() -> int:
+        """单次搜索返回的最大任务数"""
+        return getattr(settings, 'TASK_SEARCH_MAX_RESULTS', 1000)
+
+    @classmethod
+    def search(cls, query: str, queryset=None, limited: bool = True) -> Optional[List[Tuple[int, float]]]:
+        """搜索任务，返回按相关度排序的 (任务ID, 相关度) 列表，无法处理时返回 None
+
+        queryset 不为空时只在其中搜索；limited 为 False 时返回全部匹配的任务（用于统计）。
+        """
+        query = (query or '').strip()
+        if not query:
+            return None
+        try:
+            limit = cls.get_max_results() if limited else None
+            return cls.get_backend().search(query, limit, queryset=queryset)
+        except Exception as e:
+            logger.error(f'全文搜索失败，退回到模糊匹配（关键字: {query}）: {e}', exc_info=True)
+            return None
+
+    @classmethod
+    def filter_queryset(cls, queryset, query: str, limited: bool = True):
+        """按关键字过滤任务查询集
+
+        在查询集（已按角色过滤）的范围内搜索，范围外相关度更高的任务不会挤掉范围内的匹配结果。
+        limited 为 True 时只保留相关度最高的 TASK_SEARCH_MAX_RESULTS 个任务（列表），
+        为 False 时保留全部匹配的任务（统计）。
+
+        Returns:
+            (过滤后的查询集, 按相关度排序的任务ID列表)；未使用全文搜索时ID列表为 None
+        """
+        query = (query or '').strip()
+        if not query:
+            return queryset, None
+        ranked = cls.search(query, queryset=queryset, limited=limited)
+        if ranked is None:
+            # 全文搜索不可用时退回到标题、描述的模糊匹配
+            from django.db.models import Q
+            return queryset.filter(Q(title__icontains=query) | Q(description__icontains=query)), None
+        ranked_ids = [task_id for task_id, _ in ranked]
+        return queryset.filter(id__in=ranked_ids), ranked_ids
+
+    @staticmethod
+    def order_by_relevance(queryset, ranked_ids: List[int]):
+        """按搜索相关度排序（相关度相同的按创建时间倒序）"""
+        if not ranked_ids:
+            return queryset
+        rank = Case(
+            *[When(id=task_id, then=Value(position)) for position, task_id in enumerate(ranked_ids)],
+            output_field=IntegerField(),
+        )
+        return queryset.annotate(search_rank=rank).order_by('search_rank', '-created_at')
+
+
+def _reindex_task(task_id):
+    if task_id is not None:
+        TaskSearchService.get_backend().index_task(task_id)
+
+
+def _on_task_saved(sender, instance, **kwargs):
+    _reindex_task(instance.id)
+
+
+def _on_task_deleted(sender, instance, **kwargs):
+    TaskSearchService.get_backend().remove_task(instance.id)
+
+
+def _on_related_changed(sender, instance, **kwargs):
+    _reindex_task(instance.task_id)
+
+
+def connect_signals():
+    """注册索引更新信号（在 TasksConfig.ready 中调用）"""
+    from apps.workflow.models import WorkflowLog
+    post_save.connect(_on_task_saved, sender=Task, dispatch_uid='task_search_task_saved')
+    post_delete.connect(_on_task_deleted, sender=Task, dispatch_uid='task_search_task_deleted')
+    for model in (Comment, WorkflowLog):
+        post_save.connect(_on_related_changed, sender=model,
+                          dispatch_uid=f'task_search_{model.__name__}_saved')
+        post_delete.connect(_on_related_changed, sender=model,
+                            dispatch_uid=f'task_search_{model.__name__}_deleted')
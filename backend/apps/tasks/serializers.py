@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from .models import Task, Comment, TaskAttachment
-from apps.accounts.serializers import UserSerializer
+from .previews import AttachmentPreviewService
+from apps.workflow.models import WorkflowLog
+from apps.accounts.serializers import UserSerializer, UserBriefSerializer
 
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -18,12 +20,16 @@ class TaskAttachmentSerializer(serializers.ModelSerializer):
     uploaded_by = UserSerializer(read_only=True)
     file_size_display = serializers.SerializerMethodField()
     file_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+    preview_url = serializers.SerializerMethodField()
     
     class Meta:
         model = TaskAttachment
         fields = ('id', 'task', 'file', 'original_filename', 'file_size', 
-                  'file_size_display', 'uploaded_by', 'created_at', 'file_url')
-        read_only_fields = ('id', 'uploaded_by', 'created_at', 'file_size_display', 'file_url')
+                  'file_size_display', 'sha256', 'uploaded_by', 'created_at', 'file_url',
+                  'thumbnail_url', 'preview_url')
+        read_only_fields = ('id', 'sha256', 'uploaded_by', 'created_at', 'file_size_display', 'file_url',
+                            'thumbnail_url', 'preview_url')
     
     def get_file_size_display(self, obj):
         """获取格式化的文件大小"""
@@ -35,6 +41,16 @@ class TaskAttachmentSerializer(serializers.ModelSerializer):
         if request and obj.file:
             return request.build_absolute_uri(obj.file.url)
         return None
+    
+    def get_thumbnail_url(self, obj):
+        """获取缩略图URL（带签名，不是图片时为None）"""
+        request = self.context.get('request')
+        return AttachmentPreviewService.url(request, obj, 'thumbnail') if request else None
+    
+    def get_preview_url(self, obj):
+        """获取预览图URL（带签名，不是图片时为None）"""
+        request = self.context.get('request')
+        return AttachmentPreviewService.url(request, obj, 'preview') if request else None
 
 
 class TaskSerializer(serializers.ModelSerializer):
@@ -66,6 +82,51 @@ class TaskSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'created_at', 'updated_at', 'closed_at')
 
 
+class TaskBriefSerializer(serializers.ModelSerializer):
+    """任务简要序列化器（用于通知等只需要引用任务的场景）"""
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    
+    class Meta:
+        model = Task
+        fields = ('id', 'title', 'status', 'status_display')
+        read_only_fields = fields
+
+
+class TaskActionLogSerializer(serializers.ModelSerializer):
+    """工作流操作返回的日志序列化器（不嵌套任务，用于操作结果中的新日志）"""
+    user = UserBriefSerializer(read_only=True)
+    
+    class Meta:
+        model = WorkflowLog
+        fields = ('id', 'user', 'action', 'from_status', 'to_status', 'comment', 'created_at')
+        read_only_fields = fields
+
+
+class TaskListSerializer(serializers.ModelSerializer):
+    """任务列表序列化器（仅包含列表和首页需要的字段）"""
+    creator = UserBriefSerializer(read_only=True)
+    handler = UserBriefSerializer(read_only=True)
+    task_type_display = serializers.SerializerMethodField()
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    priority_display = serializers.CharField(source='get_priority_display', read_only=True)
+    comment_count = serializers.IntegerField(read_only=True, default=0)
+    attachment_count = serializers.IntegerField(read_only=True, default=0)
+    
+    def get_task_type_display(self, obj):
+        """获取任务类型显示文本，处理None值"""
+        if obj.task_type:
+            return obj.get_task_type_display()
+        return None
+    
+    class Meta:
+        model = Task
+        fields = ('id', 'title', 'task_type', 'task_type_display',
+                  'status', 'status_display', 'priority', 'priority_display',
+                  'creator', 'handler', 'created_at', 'updated_at', 'closed_at',
+                  'comment_count', 'attachment_count')
+        read_only_fields = fields
+
+
 class TaskCreateSerializer(serializers.ModelSerializer):
     """创建任务序列化器"""
     save_as_draft = serializers.BooleanField(write_only=True, required=False, default=False, help_text='是否保存为草稿')
@@ -0,0 +1,179 @@
+"""
+任务统计服务
+"""
+import hashlib
+import logging
+from datetime import timedelta
+from typing import Dict, Any, Optional
+from django.core.cache import cache
+from django.conf import settings
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+
+class TaskStatsService:
+    """任务统计服务类（数据库分组统计 + Redis缓存）"""
+
+    # 缓存版本号的键，工作流操作后递增版本号使所有统计缓存失效
+    VERSION_KEY = 'task_stats:version'
+
+    # 已完成和待处理所包含的状态（与首页统计卡片一致）
+    COMPLETED_STATUSES = ['confirmed', 'closed']
+    PENDING_STATUSES = ['pending_review', 'reviewed', 'assigned', 'in_progress']
+
+    # 按日期统计的默认天数和最大天数
+    DEFAULT_DAYS = 30
+    MAX_DAYS = 365
+
+    @staticmethod
+    def get_cache_timeout() -> int:
+        """获取统计缓存的过期时间（秒）"""
+        return getattr(settings, 'TASK_STATS_CACHE_TIMEOUT', 300)
+
+    @classmethod
+    def get_version(cls) -> int:
+        """获取当前统计缓存版本号"""
+        try:
+            version = cache.get(cls.VERSION_KEY)
+            if version is None:
+                cache.add(cls.VERSION_KEY, 1, timeout=None)
+                version = cache.get(cls.VERSION_KEY, 1)
+            return version
+        except Exception as e:
+            logger.warning(f'获取任务统计缓存版本失败: {e}')
+            return 0
+
+    @classmethod
+    def invalidate(cls):
+        """使所有任务统计缓存失效（工作流操作后调用）"""
+        try:
+            cache.incr(cls.VERSION_KEY)
+        except ValueError:
+            # 版本号不存在时直接初始化，旧缓存的版本号自然不再匹配
+            cache.set(cls.VERSION_KEY, 2, timeout=None)
+        except Exception as e:
+            logger.warning(f'清除任务统计缓存失败: {e}')
+
+    @classmethod
+    def build_cache_key(cls, user, params: Dict[str, Any]) -> str:
+        """构建统计缓存键
+
+        管理方和项目经理看到的任务范围与具体用户无关，按角色共享缓存；
+        使用方和员工按用户区分缓存。
+        """
+        if user.is_admin or user.is_manager:
+            scope = f'role:{user.role}'
+        else:
+            scope = f'user:{user.id}'
+        raw_params = '&'.join(f'{key}={params[key]}' for key in sorted(params) if params[key])
+        params_hash = hashlib.md5(raw_params.encode('utf-8')).hexdigest()
+        return f'task_stats:{cls.get_version()}:{scope}:{params_hash}'
+
+    @classmethod
+    def get_stats(cls, queryset, user, params: Dict[str, Any], days: Optional[int] = None) -> Dict[str, Any]:
+        """获取任务统计（优先从缓存读取）
+
+        Args:
+            queryset: 已按用户角色和查询参数过滤的任务查询集
+            user: 当前用户
+            params: 影响统计结果的查询参数（用于构建缓存键）
+            days: 按日期统计的天数
+
+        Returns:
+            统计结果字典
+        """
+        days = cls.normalize_days(days)
+        cache_key = cls.build_cache_key(user, dict(params, days=days))
+
+        try:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+        except Exception as e:
+            logger.warning(f'读取任务统计缓存失败: {e}')
+
+        stats = cls.compute_stats(queryset, days)
+
+        try:
+            cache.set(cache_key, stats, timeout=cls.get_cache_timeout())
+        except Exception as e:
+            logger.warning(f'写入任务统计缓存失败: {e}')
+
+        return stats
+
+    @classmethod
+    def normalize_days(cls, days) -> int:
+        """校验按日期统计的天数"""
+        try:
+            days = int(days)
+        except (TypeError, ValueError):
+            return cls.DEFAULT_DAYS
+        return max(1, min(days, cls.MAX_DAYS))
+
+    @classmethod
+    def compute_stats(cls, queryset, days: int) -> Dict[str, Any]:
+        """使用数据库分组查询计算统计数据"""
+        # 清除默认排序，避免排序字段进入GROUP BY
+        # 员工的查询集包含协助员工的关联查询，使用distinct计数避免重复
+        queryset = queryset.order_by()
+
+        status_labels = dict(Task.STATUS_CHOICES)
+        type_labels = dict(Task.TASK_TYPE_CHOICES)
+        priority_labels = dict(Task.PRIORITY_CHOICES)
+
+        by_status = [
+            {'status': row['status'], 'label': status_labels.get(row['status'], row['status']), 'count': row['count']}
+            for row in queryset.values('status').annotate(count=Count('id', distinct=True)).order_by('status')
+        ]
+        by_task_type = [
+            {'task_type': row['task_type'], 'label': type_labels.get(row['task_type'], row['task_type']), 'count': row['count']}
+            for row in queryset.values('task_type').annotate(count=Count('id', distinct=True)).order_by('task_type')
+        ]
+        by_priority = [
+            {'priority': row['priority'], 'label': priority_labels.get(row['priority'], row['priority']), 'count': row['count']}
+            for row in queryset.values('priority').annotate(count=Count('id', distinct=True)).order_by('priority')
+        ]
+
+        # 按创建日期统计（本地时区），只统计最近days天
+        start_datetime = timezone.now() - timedelta(days=days)
+        by_date = [
+            {'date': row['date'].isoformat() if row['date'] else None, 'count': row['count']}
+            for row in queryset.filter(created_at__gte=start_datetime)
+            .annotate(date=TruncDate('created_at', tzinfo=timezone.get_current_timezone()))
+            .values('date')
+            .annotate(count=Count('id', distinct=True))
+            .order_by('date')
+        ]
+
+        by_handler = []
+        for row in (queryset.filter(handler__isnull=False)
+                    .values('handler', 'handler__username', 'handler__first_name', 'handler__last_name')
+                    .annotate(count=Count('id', distinct=True))
+                    .order_by('-count')):
+            full_name = f"{row['handler__last_name'] or ''}{row['handler__first_name'] or ''}".strip()
+            by_handler.append({
+                'handler_id': row['handler'],
+                'handler_name': full_name or row['handler__username'],
+                'count': row['count'],
+            })
+
+        total = sum(item['count'] for item in by_status)
+        completed = sum(item['count'] for item in by_status if item['status'] in cls.COMPLETED_STATUSES)
+        pending = sum(item['count'] for item in by_status if item['status'] in cls.PENDING_STATUSES)
+
+        return {
+            'total': total,
+            'completed': completed,
+            'pending': pending,
+            'by_status': by_status,
+            'by_task_type': by_task_type,
+            'by_priority': by_priority,
+            'by_date': by_date,
+            'by_handler': by_handler,
+            'days': days,
+            'generated_at': timezone.now().isoformat(),
+        }
@@ -0,0 +1,183 @@
+"""
+任务接口的查询次数预算测试
+
+按 benchmark_api 的接口场景逐个调用 TaskViewSet 的操作，检查查询次数不超过视图声明的预算（query_budgets），
+并检查审核、提交等会通知整个角色的操作，查询次数与接收人数无关。
+
+运行方法：
+    python manage.py test apps.tasks
+"""
+import shutil
+import tempfile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from apps.accounts.models import User
+from .benchmark import BenchmarkDataset, BenchmarkRunner, temporary_attachment_storage
+from .query_budget import is_transaction_statement
+from .search import TaskSearchService
+from .views import TaskViewSet
+
+
+@override_settings(
+    QUERY_BUDGET_CHECK=False,
+    NOTIFICATION_STREAM_REDIS_URL='',
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'}},
+)
+class TaskQueryBudgetTests(TestCase):
+    """TaskViewSet 各操作的查询次数预算"""
+
+    # 每种角色的用户数：审核、提交等操作会给全部管理方、项目经理写入短信和通知
+    USERS_PER_ROLE = 6
+
+    def setUp(self):
+        storage_dir = tempfile.mkdtemp(prefix='oms_tests_')
+        self.addCleanup(shutil.rmtree, storage_dir, ignore_errors=True)
+        storage = temporary_attachment_storage(storage_dir)
+        storage.__enter__()
+        self.addCleanup(storage.__exit__, None, None, None)
+
+        # 进程内搜索索引可能包含其他测试中已回滚的任务
+        backend = TaskSearchService.get_backend()
+        if hasattr(backend, 'reset'):
+            backend.reset()
+
+        self.dataset = BenchmarkDataset(
+            users_per_role=self.USERS_PER_ROLE, tasks=20, comments_per_task=2,
+            notifications_per_user=5, sms_records=10
+        )
+        self.dataset.seed()
+        self.runner = BenchmarkRunner(self.dataset)
+        self.scenarios = {
+            scenario.name: scenario for scenario in self.runner.build_scenarios()
+            if scenario.name.startswith('tasks.')
+        }
+        self.iteration = 0
+
+    def measure(self, name):
+        """执行一次场景请求（事务提交后的处理也计入），返回 (状态码, 查询列表)
+
+        与 QueryCounter 一样不计入事务控制语句（测试用例中事务变为保存点）。
+        """
+        scenario = self.scenarios[name]
+        self.iteration += 1
+        # 准备数据（创建任务等）的查询不计入
+        with self.captureOnCommitCallbacks(execute=True):
+            path, payload = scenario.prepare(self.iteration)
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                status_code = self.runner.send(scenario, path, payload)[0]
+        return status_code, [
+            query for query in queries.captured_queries if not is_transaction_statement(query['sql'])
+        ]
+
+    def assertWithinBudget(self, action, name=None):
+        name = name or f'tasks.{action}'
+        budget = TaskViewSet.query_budgets[action]
+        # 第一次请求会读取短信模板等缓存，不计入预算
+        self.measure(name)
+        status_code, queries = self.measure(name)
+        self.assertLess(status_code, 400, f'{name} 返回 {status_code}')
+        self.assertLessEqual(
+            len(queries), budget,
+            f'{name} 执行了 {len(queries)} 次查询，超出预算 {budget} 次：\n'
+            + '\n'.join(query['sql'] for query in queries)
+        )
+
+    def add_recipients(self, role, count):
+        """增加某个角色的用户（都有手机号，会收到短信和通知）"""
+        users = []
+        for n in range(count):
+            user = User(username=f'extra_{role}_{n}', role=role, phone=f'137{n:08d}')
+            user.set_unusable_password()
+            users.append(user)
+        User.objects.bulk_create(users)
+
+    def assertConstantFanOut(self, action, role):
+        """查询次数不随接收人数增加"""
+        name = f'tasks.{action}'
+        self.measure(name)
+        _, before = self.measure(name)
+        self.add_recipients(role, 10)
+        _, after = self.measure(name)
+        self.assertEqual(
+            len(after), len(before),
+            f'{name} 在增加10个接收人后查询次数从 {len(before)} 次变为 {len(after)} 次'
+        )
+
+    def test_list(self):
+        self.assertWithinBudget('list')
+        self.assertWithinBudget('list', 'tasks.list.search')
+        self.assertWithinBudget('list', 'tasks.list.filter')
+
+    def test_retrieve(self):
+        self.assertWithinBudget('retrieve')
+
+    def test_stats(self):
+        self.assertWithinBudget('stats')
+
+    def test_create(self):
+        self.assertWithinBudget('create')
+
+    def test_update(self):
+        self.assertWithinBudget('update')
+
+    def test_partial_update(self):
+        self.assertWithinBudget('partial_update')
+
+    def test_destroy(self):
+        self.assertWithinBudget('destroy')
+
+    def test_review(self):
+        self.assertWithinBudget('review')
+
+    def test_assign(self):
+        self.assertWithinBudget('assign')
+
+    def test_set_assistants(self):
+        self.assertWithinBudget('set_assistants')
+
+    def test_handle(self):
+        self.assertWithinBudget('handle')
+
+    def test_complete(self):
+        self.assertWithinBudget('complete')
+
+    def test_confirm(self):
+        self.assertWithinBudget('confirm')
+
+    def test_submit_draft(self):
+        self.assertWithinBudget('submit_draft')
+
+    def test_add_comment(self):
+        self.assertWithinBudget('add_comment')
+
+    def test_upload_attachment(self):
+        self.assertWithinBudget('upload_attachment')
+
+    def test_create_attachment_upload(self):
+        self.assertWithinBudget('create_attachment_upload')
+
+    def test_attachment_upload(self):
+        self.assertWithinBudget('attachment_upload')
+
+    def test_delete_attachment(self):
+        self.assertWithinBudget('delete_attachment')
+
+    def test_download_attachment(self):
+        self.assertWithinBudget('download_attachment')
+
+    def test_budgets_cover_all_scenarios(self):
+        """benchmark_api 中的每个任务操作都有预算"""
+        for scenario in self.scenarios.values():
+            if scenario.name != 'tasks.review.full':
+                self.assertIsNotNone(scenario.budget, f'{scenario.name} 没有查询预算')
+
+    def test_create_fan_out_is_constant(self):
+        self.assertConstantFanOut('create', 'admin')
+
+    def test_submit_draft_fan_out_is_constant(self):
+        self.assertConstantFanOut('submit_draft', 'admin')
+
+    def test_review_fan_out_is_constant(self):
+        self.assertConstantFanOut('review', 'manager')
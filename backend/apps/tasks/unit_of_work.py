@@ -0,0 +1,102 @@
+"""
+工作流操作的副作用收集器
+
+一次工作流操作（审核、指派、完成等）会产生若干条工作流日志和通知。
+操作过程中只收集，在事务提交前用 bulk_create 一次写入，每种记录只需一次数据库往返。
+
+bulk_create 不发送 post_save 信号，因此由 flush() 显式完成原来依赖信号或逐条创建时的后续处理：
+事务提交后使统计缓存失效、更新搜索索引、推送通知。
+"""
+from collections import defaultdict
+from typing import List
+from django.db import connection, transaction
+from apps.workflow.models import WorkflowLog, Notification
+from apps.workflow.notification_stream import publish_notifications
+from oms_backend.metrics import record_workflow_logs
+from .search import TaskSearchService
+from .stats_service import TaskStatsService
+
+
+class WorkflowUnitOfWork:
+    """收集一次工作流操作产生的工作流日志和通知"""
+
+    def __init__(self, user):
+        self.user = user
+        self.logs: List[WorkflowLog] = []
+        self.notifications: List[Notification] = []
+        # 已写入的日志（用于操作结果中返回新日志）
+        self.flushed_logs: List[WorkflowLog] = []
+        # 任务进入原状态的时间（用于统计在各状态停留的时间），未知时为None
+        self.status_entered_at = None
+
+    def add_log(self, task, action, from_status, to_status, comment=''):
+        self.logs.append(WorkflowLog(
+            task=task,
+            user=self.user,
+            action=action,
+            from_status=from_status,
+            to_status=to_status,
+            comment=comment or ''
+        ))
+
+    def add_notification(self, task, notification_type, title, content, notify_user):
+        self.notifications.append(Notification(
+            user=notify_user,
+            task=task,
+            notification_type=notification_type,
+            title=title,
+            content=content
+        ))
+
+    def flush(self):
+        """批量写入收集到的记录（在事务内调用）"""
+        logs, self.logs = self.logs, []
+        notifications, self.notifications = self.notifications, []
+
+        if logs:
+            WorkflowLog.objects.bulk_create(logs)
+            self.flushed_logs.extend(logs)
+            task_ids = {log.task_id for log in logs}
+            # 工作流操作会改变任务状态，事务提交后使统计缓存失效、更新搜索索引
+            transaction.on_commit(TaskStatsService.invalidate)
+            transaction.on_commit(lambda: self._reindex(task_ids))
+            # 事务提交后记录运行指标（只更新内存中的计数）
+            entered_at = self.status_entered_at
+            transaction.on_commit(lambda: record_workflow_logs(logs, entered_at))
+
+        if notifications:
+            Notification.objects.bulk_create(notifications)
+            # 事务提交后推送给在线用户
+            transaction.on_commit(lambda: publish_notifications(self._with_pks(notifications)))
+
+    @staticmethod
+    def _reindex(task_ids):
+        backend = TaskSearchService.get_backend()
+        for task_id in task_ids:
+            backend.index_task(task_id)
+
+    @staticmethod
+    def _with_pks(notifications: List[Notification]) -> List[Notification]:
+        """补全通知主键
+
+        推送的消息以通知ID作为事件ID（断线重连时按ID补发），
+        MySQL 的 bulk_create 不回填主键，需要按写入的内容查回。
+        """
+        if connection.features.can_return_rows_from_bulk_insert:
+            return notifications
+
+        pending = defaultdict(list)
+        for notification in notifications:
+            key = (notification.user_id, notification.task_id, notification.notification_type,
+                   notification.title, notification.created_at)
+            pending[key].append(notification)
+
+        for row in Notification.objects.filter(
+            user_id__in={notification.user_id for notification in notifications},
+            task_id__in={notification.task_id for notification in notifications},
+            created_at__gte=min(notification.created_at for notification in notifications),
+        ).order_by('id').only('id', 'user_id', 'task_id', 'notification_type', 'title', 'created_at'):
+            key = (row.user_id, row.task_id, row.notification_type, row.title, row.created_at)
+            if pending.get(key):
+                pending[key].pop(0).pk = row.pk
+        return [notification for notification in notifications if notification.pk is not None]
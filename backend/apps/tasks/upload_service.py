@@ -0,0 +1,299 @@
+"""
+附件上传
+
+普通上传（multipart/form-data）：StreamingAttachmentUploadHandler 替换 Django 默认的上传处理器，
+按块直接写入附件目录的 .uploads/ 下，边写边计算 SHA-256，超出大小限制时立即中止，不再读取剩余的请求体；
+上传完成后由 AttachmentBlobStore 移动到按内容命名的位置（相同内容已存在时直接引用）。
+Django 默认的处理器会先把文件放在内存或临时文件中，保存附件时存储类再复制一次。
+
+断点续传（小程序在移动网络下上传大文件）：先创建上传会话，再按偏移量逐块 PUT 文件内容，
+中断后查询会话得到已接收的字节数继续上传。已接收的内容保存在附件目录的 .uploads/ 下，
+已接收的字节数以该文件的大小为准，上传分块时不访问数据库（同一会话的分块通过文件锁依次写入，
+移动网络下读取请求体可能持续很久，期间不持有数据库事务和行锁）；全部接收后计算 SHA-256 并交给 AttachmentBlobStore。
+
+两种方式的内存占用都与文件大小无关。
+"""
+import hashlib
+import os
+import re
+import uuid
+try:
+    import fcntl
+except ImportError:  # Windows（开发环境）不加文件锁
+    fcntl = None
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from .blob_store import AttachmentBlobStore, attachment_storage
+from .previews import AttachmentPreviewService
+from .models import TaskAttachment, TaskAttachmentUpload
+
+# 读写文件的块大小
+CHUNK_SIZE = 64 * 1024
+# multipart 请求体中除文件内容外的部分（分隔符、各部分的头、其他字段）的最大长度
+MULTIPART_OVERHEAD = 64 * 1024
+
+_SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+class AttachmentUploadError(Exception):
+    """附件上传失败（message 返回给客户端）"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def _format_size(size):
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024:
+            return f'{size:.0f} {unit}'
+        size /= 1024
+    return f'{size:.0f} TB'
+
+
+def _try_lock(file):
+    """对打开的文件加排他锁，已被其他请求锁定时返回False（文件关闭时自动释放）"""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def staging_path(name):
+    """附件目录中 .uploads/ 下的临时文件路径"""
+    directory = os.path.join(attachment_storage().location, AttachmentUploadService.UPLOAD_DIR)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, name)
+
+
+class StoredUploadedFile(UploadedFile):
+    """已写入附件目录中临时文件的上传文件"""
+
+    def __init__(self, temp_path, name, size, sha256, content_type=None, charset=None):
+        super().__init__(file=None, name=name, content_type=content_type, size=size, charset=charset)
+        self.temp_path = temp_path
+        self.sha256 = sha256
+
+    def open(self, mode=None):
+        raise ValueError('文件已保存到附件目录')
+
+    def close(self):
+        pass
+
+
+class StreamingAttachmentUploadHandler(FileUploadHandler):
+    """把 multipart 请求中的附件直接写入附件目录中的临时文件，只处理名为 field_name 的第一个文件"""
+
+    def __init__(self, max_size, field_name='file'):
+        super().__init__()
+        self.max_size = max_size
+        self.field_name = field_name
+        self.temp_path = None
+        self.file = None
+        self.sha256 = None
+        self.size = 0
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # 请求体长度已超出限制时不读取请求体
+        if content_length > self.max_size + MULTIPART_OVERHEAD:
+            self._too_large()
+        return None
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        if field_name != self.field_name or self.temp_path is not None:
+            raise SkipFile()
+        self.temp_path = staging_path(f'{uuid.uuid4().hex}.part')
+        self.file = open(self.temp_path, 'xb')
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > self.max_size:
+            self.delete_stored_file()
+            self._too_large()
+        self.sha256.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        self.file.close()
+        return StoredUploadedFile(
+            self.temp_path, self.file_name, file_size, self.sha256.hexdigest(),
+            content_type=self.content_type, charset=self.charset
+        )
+
+    def delete_stored_file(self):
+        """删除已写入的临时文件（上传中断或创建附件失败时调用）"""
+        if self.file is not None:
+            self.file.close()
+        if self.temp_path is not None:
+            try:
+                os.remove(self.temp_path)
+            except FileNotFoundError:
+                pass
+            self.temp_path = None
+
+    def _too_large(self):
+        raise AttachmentUploadError(f'文件大小超出限制（最大 {_format_size(self.max_size)}）', 413)
+
+
+class AttachmentUploadService:
+    """附件大小限制和断点续传"""
+
+    UPLOAD_DIR = '.uploads'
+
+    @staticmethod
+    def allowed_size(task, exclude_upload=None):
+        """任务还可以上传的单个文件的最大大小
+
+        任务已有附件和未过期的上传会话（按声明的大小）都计入任务的附件总大小。
+        """
+        used = TaskAttachment.objects.filter(task=task).aggregate(total=Sum('file_size'))['total'] or 0
+        uploads = TaskAttachmentUpload.objects.filter(
+            task=task, created_at__gte=AttachmentUploadService._expire_before()
+        )
+        if exclude_upload is not None:
+            uploads = uploads.exclude(pk=exclude_upload.pk)
+        used += uploads.aggregate(total=Sum('file_size'))['total'] or 0
+
+        remaining = settings.ATTACHMENT_MAX_TASK_SIZE - used
+        if remaining <= 0:
+            raise AttachmentUploadError(
+                f'任务附件总大小已达到上限（{_format_size(settings.ATTACHMENT_MAX_TASK_SIZE)}）', 413
+            )
+        return min(settings.ATTACHMENT_MAX_FILE_SIZE, remaining)
+
+    @staticmethod
+    def _expire_before():
+        return timezone.now() - timedelta(hours=settings.ATTACHMENT_UPLOAD_EXPIRE_HOURS)
+
+    @staticmethod
+    def part_path(upload):
+        return staging_path(f'{upload.pk}.part')
+
+    @staticmethod
+    def received_size(upload):
+        try:
+            return os.path.getsize(AttachmentUploadService.part_path(upload))
+        except FileNotFoundError:
+            return 0
+
+    @staticmethod
+    def is_expired(upload):
+        return upload.created_at < AttachmentUploadService._expire_before()
+
+    @staticmethod
+    def create(task, user, filename, file_size, sha256=''):
+        """创建上传会话"""
+        filename = os.path.basename(str(filename or '').replace('\\', '/')).strip()
+        if not filename:
+            raise AttachmentUploadError('文件名不能为空')
+        try:
+            file_size = int(file_size)
+        except (TypeError, ValueError):
+            raise AttachmentUploadError('文件大小无效')
+        if file_size <= 0:
+            raise AttachmentUploadError('文件大小无效')
+        sha256 = str(sha256 or '').lower()
+        if sha256 and not _SHA256_PATTERN.match(sha256):
+            raise AttachmentUploadError('SHA-256 格式无效')
+
+        AttachmentUploadService.delete_expired()
+        max_size = AttachmentUploadService.allowed_size(task)
+        if file_size > max_size:
+            raise AttachmentUploadError(f'文件大小超出限制（最大 {_format_size(max_size)}）', 413)
+
+        upload = TaskAttachmentUpload.objects.create(
+            task=task,
+            original_filename=filename[:255],
+            file_size=file_size,
+            sha256=sha256,
+            uploaded_by=user
+        )
+        open(AttachmentUploadService.part_path(upload), 'wb').close()
+        return upload
+
+    @staticmethod
+    def write_chunk(upload, offset, stream, length):
+        """从 stream 读取 length 字节追加到已接收的内容
+
+        offset 必须等于已接收的字节数。读取中断（客户端断网）时已写入的部分保留，
+        客户端查询已接收的字节数后继续上传。返回已接收的字节数。
+
+        写入期间对已接收内容的文件加锁，同一会话同时上传的其他分块直接返回409，不等待。
+        """
+        if length <= 0:
+            raise AttachmentUploadError('分块内容不能为空')
+        try:
+            f = open(AttachmentUploadService.part_path(upload), 'r+b')
+        except FileNotFoundError:
+            raise AttachmentUploadError('上传会话已取消或已过期，请重新上传', 404)
+        with f:
+            if not _try_lock(f):
+                raise AttachmentUploadError('正在上传该文件的其他分块，请稍后查询已接收的字节数', 409)
+            received = f.seek(0, os.SEEK_END)
+            if offset != received:
+                raise AttachmentUploadError(f'偏移量应为 {received}', 409)
+            if received + length > upload.file_size:
+                raise AttachmentUploadError('分块超出文件大小', 413)
+
+            remaining = length
+            while remaining > 0:
+                data = stream.read(min(CHUNK_SIZE, remaining))
+                if not data:
+                    break
+                f.write(data)
+                remaining -= len(data)
+            received = f.tell()
+        return received
+
+    @staticmethod
+    def complete(upload):
+        """文件全部接收后校验 SHA-256 并创建附件"""
+        path = AttachmentUploadService.part_path(upload)
+        sha256 = hashlib.sha256()
+        try:
+            with open(path, 'rb') as f:
+                for data in iter(lambda: f.read(CHUNK_SIZE), b''):
+                    sha256.update(data)
+        except FileNotFoundError:
+            # 写入最后一个分块时上传被取消
+            raise AttachmentUploadError('上传会话已取消或已过期，请重新上传', 404)
+        digest = sha256.hexdigest()
+        if upload.sha256 and upload.sha256 != digest:
+            AttachmentUploadService.cancel(upload)
+            raise AttachmentUploadError('文件校验失败（SHA-256 不一致），请重新上传')
+
+        with transaction.atomic():
+            attachment = AttachmentBlobStore.create_attachment(
+                upload.task, upload.uploaded_by, path, digest, upload.file_size, upload.original_filename
+            )
+            upload.delete()
+            AttachmentPreviewService.schedule(attachment)
+        return attachment
+
+    @staticmethod
+    def cancel(upload):
+        """取消上传，删除已接收的内容"""
+        try:
+            os.remove(AttachmentUploadService.part_path(upload))
+        except FileNotFoundError:
+            pass
+        upload.delete()
+
+    @staticmethod
+    def delete_expired():
+        """删除过期的上传会话"""
+        for upload in TaskAttachmentUpload.objects.filter(created_at__lt=AttachmentUploadService._expire_before()):
+            AttachmentUploadService.cancel(upload)
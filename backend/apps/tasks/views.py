@@ -1,68 +1,109 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework.pagination import PageNumberPagination
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import Q, Count
 from django.utils import timezone
-from django.http import FileResponse
+from django.core.exceptions import ValidationError
 from django.conf import settings
 from datetime import datetime, timedelta
 import os
-import threading
-from .models import Task, Comment, TaskAttachment
+import re
+from contextlib import contextmanager
+from .models import Task, Comment, TaskAttachment, TaskAttachmentUpload
+from .stats_service import TaskStatsService
+from .pagination import TaskPagination
+from .search import TaskSearchService
 from .serializers import (
-    TaskSerializer, TaskCreateSerializer, TaskUpdateSerializer, TaskReviewSerializer,
+    TaskSerializer, TaskListSerializer, TaskCreateSerializer, TaskUpdateSerializer, TaskReviewSerializer,
     TaskAssignSerializer, TaskHandleSerializer, TaskCompleteSerializer,
     TaskConfirmSerializer, TaskAssistantSerializer, CommentSerializer,
-    TaskAttachmentSerializer
+    TaskAttachmentSerializer, TaskActionLogSerializer
 )
-from apps.workflow.models import WorkflowLog, Notification
+from .query_budget import QueryBudgetMixin
+from oms_backend.metrics import RequestMetricsMixin
+from apps.accounts.serializers import UserSerializer
+from .unit_of_work import WorkflowUnitOfWork
+from .downloads import attachment_response, preview_response
+from .blob_store import AttachmentBlobStore
+from .previews import AttachmentPreviewService, derived_name
+from .upload_service import AttachmentUploadError, AttachmentUploadService, StreamingAttachmentUploadHandler
 import logging
 logger = logging.getLogger(__name__)
 
 
-def _send_sms_async(template_type, task, recipient=None, extra_context=None):
-    """异步发送短信（不影响业务流转）"""
+def _enqueue_sms(template_type, task, recipient=None, extra_context=None):
+    """将短信写入发件箱（不影响业务流转）
+
+    在业务操作的事务内调用，短信记录与任务状态一起提交或回滚，
+    由 sms_worker 管理命令在后台实际发送。
+    """
     try:
         from apps.workflow.sms_service import SmsService
-        if template_type == 'task_submitted':
-            SmsService.send_task_submitted_sms(task)
-        elif template_type == 'task_reviewed':
-            SmsService.send_task_reviewed_sms(task)
-        elif template_type == 'task_reviewed_rejected':
-            SmsService.send_task_sms('task_reviewed_rejected', task, recipient=recipient, extra_context=extra_context)
-        elif template_type == 'task_assigned':
-            SmsService.send_task_sms('task_assigned', task, recipient=recipient)
-        elif template_type == 'task_completed':
-            SmsService.send_task_sms('task_completed', task, recipient=recipient)
-        elif template_type == 'task_needs_modification':
-            SmsService.send_task_sms('task_needs_modification', task, recipient=recipient, extra_context=extra_context)
+        # 使用保存点，写入失败时只回滚短信记录，不影响外层事务
+        with transaction.atomic():
+            if template_type == 'task_submitted':
+                SmsService.send_task_submitted_sms(task, send_now=False)
+            elif template_type == 'task_reviewed':
+                SmsService.send_task_reviewed_sms(task, send_now=False)
+            else:
+                SmsService.send_task_sms(template_type, task, recipient=recipient,
+                                         extra_context=extra_context, send_now=False)
     except Exception as e:
         # 记录错误但不影响业务流程
-        logger.error(f'发送短信失败（模板类型: {template_type}, 任务ID: {task.id}）: {e}', exc_info=True)
-
-
-class TaskPagination(PageNumberPagination):
-    """任务分页类"""
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
+        logger.error(f'写入待发送短信失败（模板类型: {template_type}, 任务ID: {task.id}）: {e}', exc_info=True)
 
 
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(RequestMetricsMixin, QueryBudgetMixin, viewsets.ModelViewSet):
     """任务视图集"""
     queryset = Task.objects.all()
     permission_classes = [IsAuthenticated]
     pagination_class = TaskPagination
     
+    # 工作流操作：默认只返回变化的部分，请求参数 full=1 时返回完整任务
+    WORKFLOW_ACTIONS = ('review', 'assign', 'set_assistants', 'handle', 'complete', 'confirm', 'submit_draft')
+    # 附件操作：只用到任务本身
+    ATTACHMENT_ACTIONS = (
+        'upload_attachment', 'create_attachment_upload', 'attachment_upload',
+        'delete_attachment', 'download_attachment', 'attachment_preview'
+    )
+    
+    # 各操作的查询次数预算（包含身份认证、短信写入发件箱和事务提交后的搜索索引更新，不含事务控制语句，
+    # 工作流操作按精简返回计算）
+    # 预算是固定的上限，与数据量和接收人数无关（给整个角色发送的短信和通知批量写入），
+    # 由 apps/tasks/tests.py 和 benchmark_api 检查，修改查询后需同步更新
+    query_budgets = {
+        'list': 4,
+        'retrieve': 7,
+        'stats': 1,
+        'create': 17,
+        'update': 13,
+        'partial_update': 13,
+        'destroy': 13,
+        'review': 16,
+        'assign': 16,
+        'set_assistants': 15,
+        'handle': 10,
+        'complete': 15,
+        'confirm': 11,
+        'submit_draft': 15,
+        'add_comment': 12,
+        'upload_attachment': 7,
+        'create_attachment_upload': 6,
+        'attachment_upload': 9,
+        'delete_attachment': 4,
+        'download_attachment': 3,
+    }
+    
     def get_serializer_class(self):
         if self.action == 'create':
             return TaskCreateSerializer
         elif self.action in ['update', 'partial_update']:
             return TaskUpdateSerializer
+        elif self.action == 'list':
+            return TaskListSerializer
         return TaskSerializer
     
     def update(self, request, *args, **kwargs):
@@ -95,22 +136,109 @@ class TaskViewSet(viewsets.ModelViewSet):
             )
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        # 调用perform_create来创建工作流日志和通知
-        self.perform_create(serializer)
-        task = serializer.instance
+        with self.workflow_transaction():
+            # 调用perform_create来创建工作流日志和通知
+            self.perform_create(serializer)
+            task = serializer.instance
+            
+            # 短信写入发件箱，与任务一起提交
+            if task.status != 'draft':
+                _enqueue_sms('task_submitted', task)
         
         # 创建任务后，使用TaskSerializer返回完整数据（包含id）
         task_serializer = TaskSerializer(task, context={'request': request})
         headers = self.get_success_headers(task_serializer.data)
         
-        # 在事务外发送短信，不影响业务流程
-        if task.status != 'draft':
-            _send_sms_async('task_submitted', task)
-        
         return Response(task_serializer.data, status=status.HTTP_201_CREATED, headers=headers)
     
     def get_queryset(self):
         """根据用户角色过滤任务"""
+        queryset = self._get_filtered_queryset()
+        
+        if self.action == 'list':
+            # 全文搜索（标题、描述、评论、工作流日志），结果按相关度排序
+            queryset, ranked_ids = TaskSearchService.filter_queryset(
+                queryset, self.request.query_params.get('search')
+            )
+            # 列表只返回简要字段，评论数和附件数通过聚合计算，不预取评论和附件
+            # 聚合查询不会使用Meta.ordering，需要显式排序
+            queryset = queryset.select_related('creator', 'handler').annotate(
+                comment_count=Count('comments', distinct=True),
+                attachment_count=Count('attachments', distinct=True),
+            ).order_by('-created_at')
+            # 游标分页按 (created_at, id) 定位下一页，无法按相关度排序：
+            # 此时搜索结果按创建时间倒序返回（仍只包含相关度最高的 TASK_SEARCH_MAX_RESULTS 个任务）
+            if ranked_ids is not None and not self.paginator.use_keyset(self.request):
+                queryset = TaskSearchService.order_by_relevance(queryset, ranked_ids)
+            return queryset
+        
+        queryset = queryset.select_related('creator', 'reviewer', 'assignee', 'handler')
+        if self.action in self.WORKFLOW_ACTIONS or self.action in self.ATTACHMENT_ACTIONS:
+            # 工作流操作只返回变化的部分，附件操作不返回任务，不预取协助员工、评论和附件
+            return queryset
+        return self._prefetch_detail(queryset)
+    
+    @staticmethod
+    def _prefetch_detail(queryset):
+        """预取任务详情需要的关联数据"""
+        return queryset.prefetch_related(
+            'assistant_employees', 'comments__user', 'attachments__uploaded_by'
+        )
+    
+    def get_object(self):
+        task = super().get_object()
+        if self.action in self.WORKFLOW_ACTIONS:
+            # 记录操作前的字段值，用于返回变化的字段
+            self._task_snapshot = {field.attname: getattr(task, field.attname)
+                                   for field in Task._meta.concrete_fields}
+        return task
+    
+    def get_query_budget(self):
+        if self.action in self.WORKFLOW_ACTIONS and self._wants_full_task():
+            # 返回完整任务时需要额外加载关联数据，不按精简返回的预算检查
+            return None
+        return super().get_query_budget()
+    
+    def _wants_full_task(self):
+        """请求参数 full=1 时工作流操作返回完整任务"""
+        return self.request.query_params.get('full', '').lower() in ('1', 'true')
+    
+    def _action_response(self, task, extra_changed=None):
+        """工作流操作的返回结果
+        
+        默认只返回新状态、变化的字段和本次操作产生的工作流日志，
+        不重新查询任务的评论、附件等关联数据；请求参数 full=1 时返回完整任务。
+        """
+        context = {'request': self.request}
+        if self._wants_full_task():
+            task = self._prefetch_detail(
+                Task.objects.select_related('creator', 'reviewer', 'assignee', 'handler')
+            ).get(pk=task.pk)
+            return Response(TaskSerializer(task, context=context).data)
+        
+        task_fields = TaskSerializer(context=context).fields
+        snapshot = getattr(self, '_task_snapshot', {})
+        changed = {}
+        for field in Task._meta.concrete_fields:
+            if field.attname in snapshot and snapshot[field.attname] == getattr(task, field.attname):
+                continue
+            if field.name not in task_fields:
+                continue
+            value = getattr(task, field.name)
+            changed[field.name] = None if value is None else task_fields[field.name].to_representation(value)
+        if extra_changed:
+            changed.update(extra_changed)
+        
+        return Response({
+            'id': task.id,
+            'status': task.status,
+            'status_display': task.get_status_display(),
+            'changed': changed,
+            'logs': TaskActionLogSerializer(getattr(self, '_flushed_logs', []), many=True).data,
+        })
+    
+    def _get_filtered_queryset(self):
+        """按用户角色和查询参数过滤任务（不包含关联数据的加载）"""
         user = self.request.user
         queryset = Task.objects.all()
         
@@ -139,7 +267,7 @@ class TaskViewSet(viewsets.ModelViewSet):
         if task_type:
             queryset = queryset.filter(task_type=task_type)
         
-        # 标题关键字过滤
+        # 标题关键字过滤（兼容旧参数，推荐使用search全文搜索）
         title = self.request.query_params.get('title')
         if title:
             queryset = queryset.filter(title__icontains=title)
@@ -176,9 +304,7 @@ class TaskViewSet(viewsets.ModelViewSet):
                 logger.warning(f'日期过滤格式错误: {created_date}, 错误: {e}')
                 pass
         
-        return queryset.select_related('creator', 'reviewer', 'assignee', 'handler').prefetch_related(
-            'assistant_employees', 'comments__user', 'attachments__uploaded_by'
-        )
+        return queryset
     
     def perform_create(self, serializer):
         """创建任务"""
@@ -187,6 +313,34 @@ class TaskViewSet(viewsets.ModelViewSet):
         if task.status != 'draft':
             self._create_workflow_log(task, '创建任务', None, 'pending_review')
             self._create_notification(task, 'task_created', '新任务创建', f'您创建了任务：{task.title}')
+        else:
+            transaction.on_commit(TaskStatsService.invalidate)
+    
+    def perform_update(self, serializer):
+        """更新任务"""
+        super().perform_update(serializer)
+        transaction.on_commit(TaskStatsService.invalidate)
+    
+    def perform_destroy(self, instance):
+        """删除任务"""
+        super().perform_destroy(instance)
+        transaction.on_commit(TaskStatsService.invalidate)
+    
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """任务统计（按状态、类型、优先级、创建日期、处理人分组计数）"""
+        # 统计全部匹配的任务，不限制搜索结果数
+        queryset, _ = TaskSearchService.filter_queryset(
+            self._get_filtered_queryset(), request.query_params.get('search'), limited=False
+        )
+        params = {
+            key: request.query_params.get(key, '')
+            for key in ('status', 'task_type', 'title', 'priority', 'created_date', 'search')
+        }
+        data = TaskStatsService.get_stats(
+            queryset, request.user, params, days=request.query_params.get('days')
+        )
+        return Response(data)
     
     @action(detail=True, methods=['post'])
     def review(self, request, pk=None):
@@ -209,7 +363,7 @@ class TaskViewSet(viewsets.ModelViewSet):
         
         review_comment = serializer.validated_data.get('review_comment', '')
         
-        with transaction.atomic():
+        with self.workflow_transaction():
             task.reviewer = request.user
             task.review_comment = review_comment
             
@@ -233,25 +387,15 @@ class TaskViewSet(viewsets.ModelViewSet):
                                          notification_content, notify_user=task.creator)
             
             task.save()
+            
+            # 短信写入发件箱，与审核结果一起提交
+            if serializer.validated_data['approved']:
+                _enqueue_sms('task_reviewed', task)
+            else:
+                _enqueue_sms('task_reviewed_rejected', task, recipient=task.creator, 
+                             extra_context={'审核不通过的理由': review_comment, '原因为': review_comment})
         
-        # 先序列化数据并返回响应，避免短信发送阻塞
-        response_data = TaskSerializer(task, context={'request': request}).data
-        response = Response(response_data)
-        
-        # 在后台线程中异步发送短信，完全不影响响应返回
-        def send_sms_background():
-            try:
-                if serializer.validated_data['approved']:
-                    _send_sms_async('task_reviewed', task)
-                else:
-                    _send_sms_async('task_reviewed_rejected', task, recipient=task.creator, 
-                                  extra_context={'审核不通过的理由': review_comment, '原因为': review_comment})
-            except Exception as e:
-                logger.error(f'后台发送短信失败（不影响业务）: {e}', exc_info=True)
-        
-        threading.Thread(target=send_sms_background, daemon=True).start()
-        
-        return response
+        return self._action_response(task)
     
     @action(detail=True, methods=['post'])
     def assign(self, request, pk=None):
@@ -288,7 +432,7 @@ class TaskViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        with transaction.atomic():
+        with self.workflow_transaction():
             old_handler = task.handler  # 保存原处理人
             old_status = task.status  # 保存原状态
             
@@ -318,20 +462,11 @@ class TaskViewSet(viewsets.ModelViewSet):
             # 通知新处理人
             self._create_notification(task, 'task_assigned', '任务已指派', 
                                      f'任务"{task.title}"已指派给您', notify_user=new_handler)
+            
+            if old_status != 'assigned':
+                _enqueue_sms('task_assigned', task, recipient=new_handler)
         
-        # 先返回响应，避免短信发送阻塞
-        response_data = TaskSerializer(task, context={'request': request}).data
-        
-        # 在后台线程中异步发送短信，完全不影响响应返回
-        if old_status != 'assigned':
-            def send_sms_background():
-                try:
-                    _send_sms_async('task_assigned', task, recipient=new_handler)
-                except Exception as e:
-                    logger.error(f'后台发送短信失败（不影响业务）: {e}', exc_info=True)
-            threading.Thread(target=send_sms_background, daemon=True).start()
-        
-        return Response(response_data)
+        return self._action_response(task)
     
     @action(detail=True, methods=['post'])
     def set_assistants(self, request, pk=None):
@@ -373,7 +508,7 @@ class TaskViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
         
-        with transaction.atomic():
+        with self.workflow_transaction():
             # 更新协助员工
             task.assistant_employees.set(assistant_employee_ids if assistant_employee_ids else [])
             task.save()
@@ -391,7 +526,8 @@ class TaskViewSet(viewsets.ModelViewSet):
                 # 清空协助员工
                 self._create_workflow_log(task, '清空协助员工', task.status, task.status)
         
-        return Response(TaskSerializer(task, context={'request': request}).data)
+        assistant_data = UserSerializer(assistants, many=True).data if assistant_employee_ids else []
+        return self._action_response(task, extra_changed={'assistant_employees': assistant_data})
     
     @action(detail=True, methods=['post'])
     def handle(self, request, pk=None):
@@ -413,14 +549,14 @@ class TaskViewSet(viewsets.ModelViewSet):
         serializer = TaskHandleSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        with transaction.atomic():
+        with self.workflow_transaction():
             task.handle_comment = serializer.validated_data.get('handle_comment', '')
             task.status = 'in_progress'
             task.save()
             
             self._create_workflow_log(task, '开始处理', 'assigned', 'in_progress')
         
-        return Response(TaskSerializer(task, context={'request': request}).data)
+        return self._action_response(task)
     
     @action(detail=True, methods=['post'])
     def complete(self, request, pk=None):
@@ -442,7 +578,7 @@ class TaskViewSet(viewsets.ModelViewSet):
         serializer = TaskCompleteSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        with transaction.atomic():
+        with self.workflow_transaction():
             # 如果有处理说明，更新它
             if serializer.validated_data.get('handle_comment'):
                 task.handle_comment = serializer.validated_data['handle_comment']
@@ -453,19 +589,9 @@ class TaskViewSet(viewsets.ModelViewSet):
                                      serializer.validated_data.get('handle_comment', ''))
             self._create_notification(task, 'task_completed', '任务已完成', 
                                      f'任务"{task.title}"已完成，请确认', notify_user=task.creator)
+            _enqueue_sms('task_completed', task, recipient=task.creator)
         
-        # 先返回响应，避免短信发送阻塞
-        response_data = TaskSerializer(task, context={'request': request}).data
-        
-        # 在后台线程中异步发送短信，完全不影响响应返回
-        def send_sms_background():
-            try:
-                _send_sms_async('task_completed', task, recipient=task.creator)
-            except Exception as e:
-                logger.error(f'后台发送短信失败（不影响业务）: {e}', exc_info=True)
-        threading.Thread(target=send_sms_background, daemon=True).start()
-        
-        return Response(response_data)
+        return self._action_response(task)
     
     @action(detail=True, methods=['post'])
     def confirm(self, request, pk=None):
@@ -486,7 +612,7 @@ class TaskViewSet(viewsets.ModelViewSet):
         serializer = TaskConfirmSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        with transaction.atomic():
+        with self.workflow_transaction():
             confirm_comment = serializer.validated_data.get('confirm_comment', '')
             task.confirm_comment = confirm_comment
             
@@ -519,24 +645,13 @@ class TaskViewSet(viewsets.ModelViewSet):
                                              f'任务"{task.title}"需要修改。修改意见：{confirm_comment}', notify_user=task.reviewer)
             
             task.save()
-        
-        # 先序列化数据并返回响应，避免短信发送阻塞
-        response_data = TaskSerializer(task, context={'request': request}).data
-        response = Response(response_data)
-        
-        # 在后台线程中异步发送短信，完全不影响响应返回
-        if not serializer.validated_data['confirmed']:
+            
             # 需要修改时，发送短信给处理员工
-            def send_sms_background():
-                try:
-                    if task.handler:
-                        _send_sms_async('task_needs_modification', task, recipient=task.handler,
-                                      extra_context={'修改意见': confirm_comment})
-                except Exception as e:
-                    logger.error(f'后台发送短信失败（不影响业务）: {e}', exc_info=True)
-            threading.Thread(target=send_sms_background, daemon=True).start()
+            if not serializer.validated_data['confirmed'] and task.handler:
+                _enqueue_sms('task_needs_modification', task, recipient=task.handler,
+                             extra_context={'修改意见': confirm_comment})
         
-        return response
+        return self._action_response(task)
     
     @action(detail=True, methods=['post'])
     def add_comment(self, request, pk=None):
@@ -549,56 +664,68 @@ class TaskViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        comment = Comment.objects.create(
-            task=task,
-            user=request.user,
-            content=content
-        )
-        
-        # 通知相关人员
-        notify_users = set([task.creator, task.reviewer, task.assignee, task.handler])
-        notify_users.discard(None)
-        notify_users.discard(request.user)
-        
-        for user in notify_users:
-            Notification.objects.create(
-                user=user,
+        with self.workflow_transaction():
+            comment = Comment.objects.create(
                 task=task,
-                notification_type='comment_added',
-                title='新增评论',
-                content=f'{request.user.username} 在任务"{task.title}"中添加了评论'
+                user=request.user,
+                content=content
             )
+            
+            # 通知相关人员
+            notify_users = set([task.creator, task.reviewer, task.assignee, task.handler])
+            notify_users.discard(None)
+            notify_users.discard(request.user)
+            
+            for user in notify_users:
+                self._create_notification(task, 'comment_added', '新增评论',
+                                         f'{request.user.username} 在任务"{task.title}"中添加了评论', notify_user=user)
         
         return Response(CommentSerializer(comment).data)
     
+    @contextmanager
+    def workflow_transaction(self):
+        """工作流操作的事务
+        
+        事务内通过 _create_workflow_log、_create_notification 产生的记录先收集起来，
+        在事务提交前批量写入。
+        """
+        with transaction.atomic():
+            self._unit_of_work = WorkflowUnitOfWork(self.request.user)
+            # 以操作前的更新时间近似任务进入当前状态的时间
+            self._unit_of_work.status_entered_at = getattr(self, '_task_snapshot', {}).get('updated_at')
+            try:
+                yield self._unit_of_work
+                self._unit_of_work.flush()
+                self._flushed_logs = getattr(self, '_flushed_logs', []) + self._unit_of_work.flushed_logs
+            finally:
+                self._unit_of_work = None
+    
+    def _get_unit_of_work(self):
+        """当前工作流操作的收集器（不在 workflow_transaction 中时返回立即写入的收集器）"""
+        return getattr(self, '_unit_of_work', None)
+    
     def _create_workflow_log(self, task, action, from_status, to_status, comment=''):
         """创建工作流日志"""
-        WorkflowLog.objects.create(
-            task=task,
-            user=self.request.user,
-            action=action,
-            from_status=from_status,
-            to_status=to_status,
-            comment=comment or ''
-        )
+        unit_of_work = self._get_unit_of_work()
+        if unit_of_work is None:
+            with self.workflow_transaction() as unit_of_work:
+                unit_of_work.add_log(task, action, from_status, to_status, comment)
+        else:
+            unit_of_work.add_log(task, action, from_status, to_status, comment)
     
     def _create_notification(self, task, notification_type, title, content, notify_user=None):
         """创建通知"""
-        if notify_user:
-            Notification.objects.create(
-                user=notify_user,
-                task=task,
-                notification_type=notification_type,
-                title=title,
-                content=content
-            )
+        if not notify_user:
+            return
+        unit_of_work = self._get_unit_of_work()
+        if unit_of_work is None:
+            with self.workflow_transaction() as unit_of_work:
+                unit_of_work.add_notification(task, notification_type, title, content, notify_user)
+        else:
+            unit_of_work.add_notification(task, notification_type, title, content, notify_user)
     
-    @action(detail=True, methods=['post'], parser_classes=[MultiPartParser, FormParser])
-    def upload_attachment(self, request, pk=None):
-        """上传附件（只有使用方和管理员在创建时可以上传，提交后只可查看和下载）"""
-        task = self.get_object()
-        user = request.user
-        
+    def _check_upload_permission(self, task, user):
+        """检查上传附件的权限，没有权限时返回错误响应"""
         # 检查权限：使用方和管理员在任务创建时（pending_review）或草稿状态（draft）可以上传
         if task.status in ['pending_review', 'draft'] and (user.is_user or user.is_admin):
             if task.creator != user and not user.is_admin:
@@ -617,39 +744,64 @@ class TaskViewSet(viewsets.ModelViewSet):
                 {'error': '没有权限上传附件'},
                 status=status.HTTP_403_FORBIDDEN
             )
+        return None
+    
+    @action(detail=True, methods=['post'], parser_classes=[MultiPartParser, FormParser])
+    def upload_attachment(self, request, pk=None):
+        """上传附件（只有使用方和管理员在创建时可以上传，提交后只可查看和下载）
+        
+        文件按块直接写入附件目录并计算 SHA-256，超出单个文件或任务附件总大小的限制时立即中止。
+        """
+        task = self.get_object()
+        user = request.user
+        
+        denied = self._check_upload_permission(task, user)
+        if denied is not None:
+            return denied
+        
+        try:
+            max_size = AttachmentUploadService.allowed_size(task)
+        except AttachmentUploadError as e:
+            return Response({'error': e.message}, status=e.status_code)
+        
+        # 必须在读取请求体之前替换上传处理器
+        handler = StreamingAttachmentUploadHandler(max_size)
+        request.upload_handlers = [handler]
+        try:
+            uploaded_file = request.FILES.get('file')
+        except AttachmentUploadError as e:
+            return Response({'error': e.message}, status=e.status_code)
+        except Exception:
+            handler.delete_stored_file()
+            raise
         
         # 检查文件是否存在
-        if 'file' not in request.FILES:
+        if uploaded_file is None:
             return Response(
                 {'error': '请选择要上传的文件'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        uploaded_file = request.FILES['file']
-        
         # 检查文件名
         if not uploaded_file.name:
+            handler.delete_stored_file()
             return Response(
                 {'error': '文件名不能为空'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        original_filename = uploaded_file.name
-        file_size = uploaded_file.size
-        
         try:
-            # 创建附件记录
-            attachment = TaskAttachment.objects.create(
-                task=task,
-                file=uploaded_file,
-                original_filename=original_filename,
-                file_size=file_size,
-                uploaded_by=user
+            # 创建附件（相同内容的文件只保存一份）
+            attachment = AttachmentBlobStore.create_attachment(
+                task, user, uploaded_file.temp_path, uploaded_file.sha256, uploaded_file.size, uploaded_file.name
             )
+            # 图片附件在后台生成缩略图
+            AttachmentPreviewService.schedule(attachment)
             
             serializer = TaskAttachmentSerializer(attachment, context={'request': request})
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         except Exception as e:
+            handler.delete_stored_file()
             import traceback
             print(f"上传附件失败: {str(e)}")
             print(traceback.format_exc())
@@ -658,6 +810,118 @@ class TaskViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @action(detail=True, methods=['post'], url_path='attachment_uploads')
+    def create_attachment_upload(self, request, pk=None):
+        """创建断点续传会话
+        
+        请求参数：filename 文件名、file_size 文件大小（字节）、sha256 文件的SHA-256（可选，用于校验）
+        """
+        task = self.get_object()
+        denied = self._check_upload_permission(task, request.user)
+        if denied is not None:
+            return denied
+        
+        try:
+            upload = AttachmentUploadService.create(
+                task, request.user,
+                request.data.get('filename'),
+                request.data.get('file_size'),
+                request.data.get('sha256', '')
+            )
+        except AttachmentUploadError as e:
+            return Response({'error': e.message}, status=e.status_code)
+        return Response(self._upload_state(upload, 0), status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['get', 'put', 'delete'], url_path='attachment_uploads/(?P<upload_id>[^/.]+)')
+    def attachment_upload(self, request, pk=None, upload_id=None):
+        """断点续传会话
+        
+        GET：查询已接收的字节数（offset），上传中断后从该位置继续
+        PUT：上传一个分块，请求体为文件内容，位置由 Content-Range: bytes 起始-结束/总大小 或 ?offset= 指定，
+             偏移量与已接收的字节数不一致时返回409和正确的 offset；最后一个分块上传完成后返回创建的附件
+        DELETE：取消上传
+        """
+        task = self.get_object()
+        user = request.user
+        
+        try:
+            upload = TaskAttachmentUpload.objects.get(id=upload_id, task=task)
+        except (TaskAttachmentUpload.DoesNotExist, ValidationError):
+            return Response(
+                {'error': '上传会话不存在'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if upload.uploaded_by_id != user.id and not user.is_admin:
+            return Response(
+                {'error': '只能操作自己的上传'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        if request.method == 'DELETE':
+            AttachmentUploadService.cancel(upload)
+            return Response({'message': '上传已取消'}, status=status.HTTP_200_OK)
+        
+        if AttachmentUploadService.is_expired(upload):
+            AttachmentUploadService.cancel(upload)
+            return Response(
+                {'error': '上传会话已过期，请重新上传'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        if request.method == 'GET':
+            return Response(self._upload_state(upload, AttachmentUploadService.received_size(upload)))
+        
+        denied = self._check_upload_permission(task, user)
+        if denied is not None:
+            return denied
+        
+        offset = self._chunk_offset(request)
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if offset is None or length <= 0:
+            return Response(
+                {'error': '请通过 Content-Range 或 offset 指定分块位置，并提供 Content-Length'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            received = AttachmentUploadService.write_chunk(upload, offset, request.stream, length)
+            if received < upload.file_size:
+                return Response(self._upload_state(upload, received))
+            attachment = AttachmentUploadService.complete(upload)
+        except AttachmentUploadError as e:
+            data = {'error': e.message}
+            if e.status_code == status.HTTP_409_CONFLICT:
+                data['offset'] = AttachmentUploadService.received_size(upload)
+            return Response(data, status=e.status_code)
+        
+        serializer = TaskAttachmentSerializer(attachment, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
+    @staticmethod
+    def _upload_state(upload, received):
+        return {
+            'upload_id': str(upload.id),
+            'original_filename': upload.original_filename,
+            'file_size': upload.file_size,
+            'offset': received,
+            'chunk_size': settings.ATTACHMENT_UPLOAD_CHUNK_SIZE,
+        }
+    
+    @staticmethod
+    def _chunk_offset(request):
+        """分块的起始位置：Content-Range: bytes 起始-结束/总大小，或查询参数 offset"""
+        content_range = request.META.get('HTTP_CONTENT_RANGE', '')
+        match = re.match(r'^bytes (\d+)-\d+/(?:\d+|\*)$', content_range.strip())
+        if match:
+            return int(match.group(1))
+        offset = request.query_params.get('offset')
+        if offset is not None and offset.isdigit():
+            return int(offset)
+        return None
+    
     @action(detail=True, methods=['delete'], url_path='attachments/(?P<attachment_id>[^/.]+)')
     def delete_attachment(self, request, pk=None, attachment_id=None):
         """删除附件（只有使用方和管理员在创建时可以删除，提交后不可删除）"""
@@ -685,18 +949,17 @@ class TaskViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # 删除文件
-        if attachment.file:
-            file_path = attachment.file.path
-            if os.path.exists(file_path):
-                os.remove(file_path)
-        
+        # 先删除记录再删除文件，删除失败时不会留下指向不存在文件的附件
+        # （按内容保存的文件在没有其他附件引用时由 AttachmentBlobStore 删除）
+        file_path = attachment.file.path if attachment.blob_id is None and attachment.file else None
         attachment.delete()
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
         return Response({'message': '附件已删除'}, status=status.HTTP_200_OK)
     
     @action(detail=True, methods=['get'], url_path='attachments/(?P<attachment_id>[^/.]+)/download')
     def download_attachment(self, request, pk=None, attachment_id=None):
-        """下载附件（所有角色都可以下载）"""
+        """下载附件（所有角色都可以下载，支持 ETag、Last-Modified 条件请求和 Range 请求）"""
         task = self.get_object()
         
         try:
@@ -720,11 +983,48 @@ class TaskViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        return FileResponse(
-            open(file_path, 'rb'),
-            as_attachment=True,
-            filename=attachment.original_filename
+        # 按配置由应用服务器或 Nginx 发送文件，支持 304 和 Range
+        return attachment_response(request, attachment, file_path)
+    
+    @action(detail=True, methods=['get'], url_path='attachments/(?P<attachment_id>[^/.]+)/(?P<kind>thumbnail|preview)',
+            permission_classes=[AllowAny], authentication_classes=[])
+    def attachment_preview(self, request, pk=None, attachment_id=None, kind=None):
+        """图片附件的缩略图和预览图
+        
+        地址由 TaskAttachmentSerializer 生成，凭地址中的签名访问（<img> 不能携带 JWT 请求头），
+        地址到期前浏览器直接使用缓存。缩略图还未生成时当场生成。
+        """
+        try:
+            attachment = TaskAttachment.objects.get(id=attachment_id, task_id=pk)
+        except (TaskAttachment.DoesNotExist, ValueError):
+            return Response(
+                {'error': '附件不存在'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        if not AttachmentPreviewService.can_preview(attachment):
+            return Response(
+                {'error': '该附件没有预览图'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        max_age = AttachmentPreviewService.check_signature(
+            attachment, kind, request.query_params.get('expires'), request.query_params.get('signature')
         )
+        if max_age is None:
+            return Response(
+                {'error': '预览链接无效或已过期'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        name = derived_name(attachment.file.name, attachment.sha256, kind)
+        file_path = attachment.file.storage.path(name)
+        if not os.path.exists(file_path) and not AttachmentPreviewService.generate(attachment.file.name, attachment.sha256):
+            return Response(
+                {'error': '无法生成预览图'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return preview_response(request, name, file_path, max_age)
     
     @action(detail=True, methods=['post'])
     def submit_draft(self, request, pk=None):
@@ -745,18 +1045,17 @@ class TaskViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # 更新任务状态
-        task.status = 'pending_review'
-        task.save()
-        
-        # 创建工作流日志和通知
-        self._create_workflow_log(task, '提交草稿', 'draft', 'pending_review')
-        self._create_notification(task, 'task_created', '新任务创建', f'您提交了任务：{task.title}')
-        
-        serializer = TaskSerializer(task, context={'request': request})
-        
-        # 在事务外发送短信，不影响业务流程
-        _send_sms_async('task_submitted', task)
+        with self.workflow_transaction():
+            # 更新任务状态
+            task.status = 'pending_review'
+            task.save()
+            
+            # 创建工作流日志和通知
+            self._create_workflow_log(task, '提交草稿', 'draft', 'pending_review')
+            self._create_notification(task, 'task_created', '新任务创建', f'您提交了任务：{task.title}')
+            
+            # 短信写入发件箱，与任务一起提交
+            _enqueue_sms('task_submitted', task)
         
-        return Response(serializer.data)
+        return self._action_response(task)
 
@@ -1,10 +1,65 @@
+import json
+from django import forms
 from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 from django.contrib import messages
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, JsonResponse, Http404
+from django.shortcuts import render
 from .models import WorkflowLog, Notification, SmsConfig, SmsTemplate, SmsRecord
+from .sms_template import API_PARAM_PLACEHOLDERS, TEMPLATE_PLACEHOLDERS, compile_template
+
+
+def _format_placeholders(names):
+    return '、'.join(f'{{{name}}}' for name in names)
+
+
+class SmsConfigAdminForm(forms.ModelForm):
+    """短信配置表单（保存时校验接口参数）"""
+
+    class Meta:
+        model = SmsConfig
+        fields = '__all__'
+
+    def clean_api_params(self):
+        api_params = self.cleaned_data.get('api_params')
+        if not api_params:
+            return api_params
+        try:
+            params = json.loads(api_params)
+        except json.JSONDecodeError as e:
+            raise forms.ValidationError(f'接口参数模板不是有效的JSON：{e}')
+        if not isinstance(params, dict):
+            raise forms.ValidationError('接口参数模板必须是JSON对象')
+        unknown = []
+        for value in params.values():
+            if isinstance(value, str):
+                unknown.extend(compile_template(value).unknown_placeholders(API_PARAM_PLACEHOLDERS))
+        if unknown:
+            raise forms.ValidationError(
+                f'未知的占位符：{_format_placeholders(dict.fromkeys(unknown))}。'
+                f'支持的占位符：{_format_placeholders(API_PARAM_PLACEHOLDERS)}'
+            )
+        return api_params
+
+
+class SmsTemplateAdminForm(forms.ModelForm):
+    """短信模板表单（保存时校验占位符）"""
+
+    class Meta:
+        model = SmsTemplate
+        fields = '__all__'
+
+    def clean_content(self):
+        content = self.cleaned_data.get('content') or ''
+        unknown = compile_template(content).unknown_placeholders(TEMPLATE_PLACEHOLDERS)
+        if unknown:
+            raise forms.ValidationError(
+                f'未知的占位符：{_format_placeholders(unknown)}。'
+                f'支持的占位符：{_format_placeholders(TEMPLATE_PLACEHOLDERS)}'
+            )
+        return content
 
 
 @admin.register(WorkflowLog)
@@ -25,6 +80,7 @@ class NotificationAdmin(admin.ModelAdmin):
 
 @admin.register(SmsConfig)
 class SmsConfigAdmin(admin.ModelAdmin):
+    form = SmsConfigAdminForm
     list_display = ('name', 'api_url', 'is_enabled', 'updated_at')
     list_filter = ('is_enabled', 'created_at', 'updated_at')
     search_fields = ('name', 'api_url')
@@ -46,6 +102,7 @@ class SmsConfigAdmin(admin.ModelAdmin):
 
 @admin.register(SmsTemplate)
 class SmsTemplateAdmin(admin.ModelAdmin):
+    form = SmsTemplateAdminForm
     list_display = ('template_type', 'is_enabled', 'content_preview', 'updated_at')
     list_filter = ('template_type', 'is_enabled', 'created_at', 'updated_at')
     search_fields = ('content',)
@@ -65,7 +122,7 @@ class SmsTemplateAdmin(admin.ModelAdmin):
         }),
         ('模板内容', {
             'fields': ('content',),
-            'description': '支持占位符：{任务标题}、{任务名称}、{审核不通过的理由}、{原因为} 等'
+            'description': f'支持占位符：{_format_placeholders(TEMPLATE_PLACEHOLDERS)}'
         }),
         ('时间信息', {
             'fields': ('created_at', 'updated_at'),
@@ -79,7 +136,8 @@ class SmsRecordAdmin(admin.ModelAdmin):
     list_display = ('phone', 'content_preview', 'template_type', 'status_badge', 'task', 'recipient', 'sent_at', 'resend_button', 'created_at')
     list_filter = ('status', 'template_type', 'created_at', 'sent_at')
     search_fields = ('phone', 'content', 'task__title', 'recipient__username')
-    readonly_fields = ('created_at', 'sent_at', 'response_data', 'error_message')
+    readonly_fields = ('created_at', 'sent_at', 'claimed_at', 'attempts', 'latency_ms', 'http_status',
+                       'response_data', 'error_message')
     # 移除 date_hierarchy 以避免时区相关问题，改用 list_filter 中的日期过滤
     # date_hierarchy = 'created_at'
     actions = ['resend_sms']
@@ -96,6 +154,7 @@ class SmsRecordAdmin(admin.ModelAdmin):
         """状态徽章"""
         colors = {
             'pending': 'orange',
+            'sending': 'blue',
             'success': 'green',
             'failed': 'red',
         }
@@ -115,7 +174,8 @@ class SmsRecordAdmin(admin.ModelAdmin):
             'fields': ('task', 'recipient')
         }),
         ('发送结果', {
-            'fields': ('sent_at', 'error_message', 'response_data'),
+            'fields': ('claimed_at', 'sent_at', 'attempts', 'latency_ms', 'http_status',
+                       'error_message', 'response_data'),
             'classes': ('collapse',)
         }),
         ('时间信息', {
@@ -139,6 +199,16 @@ class SmsRecordAdmin(admin.ModelAdmin):
         from django.urls import path
         urls = super().get_urls()
         custom_urls = [
+            path(
+                'resend-jobs/<str:job_id>/',
+                self.admin_site.admin_view(self.resend_job_view),
+                name='workflow_smsrecord_resend_job',
+            ),
+            path(
+                'resend-jobs/<str:job_id>/progress/',
+                self.admin_site.admin_view(self.resend_job_progress_view),
+                name='workflow_smsrecord_resend_job_progress',
+            ),
             path(
                 '<path:object_id>/resend/',
                 self.admin_site.admin_view(self.resend_sms_view),
@@ -162,22 +232,38 @@ class SmsRecordAdmin(admin.ModelAdmin):
         return HttpResponseRedirect(reverse('admin:workflow_smsrecord_changelist'))
     
     def resend_sms(self, request, queryset):
-        """批量重发短信"""
-        success_count = 0
-        fail_count = 0
-        for sms_record in queryset:
-            if self._resend_sms(sms_record):
-                success_count += 1
-            else:
-                fail_count += 1
-        
-        if success_count > 0:
-            self.message_user(request, f'成功重发 {success_count} 条短信', messages.SUCCESS)
-        if fail_count > 0:
-            self.message_user(request, f'重发失败 {fail_count} 条短信', messages.WARNING)
+        """批量重发短信（创建后台重发任务，由 sms_worker 按限速发送）"""
+        from .sms_resend import SmsResendJobService
+        job = SmsResendJobService.create_job(queryset, user=request.user)
+        if job['skipped']:
+            self.message_user(
+                request, f'{job["skipped"]} 条短信不是待发送或发送失败状态，已跳过', messages.WARNING
+            )
+        return HttpResponseRedirect(reverse('admin:workflow_smsrecord_resend_job', args=[job['id']]))
     
     resend_sms.short_description = '重发选中的短信'
     
+    def resend_job_view(self, request, job_id):
+        """批量重发进度页面"""
+        from .sms_resend import SmsResendJobService
+        progress = SmsResendJobService.get_progress(job_id)
+        if progress is None:
+            raise Http404('重发任务不存在或已过期')
+        return render(request, 'admin/workflow/smsrecord/resend_job.html', {
+            'title': '批量重发短信',
+            'opts': self.model._meta,
+            'progress': progress,
+            'progress_url': reverse('admin:workflow_smsrecord_resend_job_progress', args=[job_id]),
+        })
+    
+    def resend_job_progress_view(self, request, job_id):
+        """批量重发进度（JSON，供进度页面轮询）"""
+        from .sms_resend import SmsResendJobService
+        progress = SmsResendJobService.get_progress(job_id)
+        if progress is None:
+            return JsonResponse({'error': '重发任务不存在或已过期'}, status=404)
+        return JsonResponse(progress)
+    
     def _resend_sms(self, sms_record):
         """重发短信的内部方法"""
         try:
@@ -6,3 +6,6 @@ class WorkflowConfig(AppConfig):
     name = 'apps.workflow'
     verbose_name = '工作流管理'
 
+    def ready(self):
+        from .sms_cache import connect_signals
+        connect_signals()
@@ -0,0 +1,145 @@
+"""
+短信发送服务（发件箱）的管理命令
+
+工作流操作只在事务内写入待发送（pending）的短信记录，由本命令在后台发送：
+- 使用 SELECT ... FOR UPDATE SKIP LOCKED 领取待发送记录并标记为发送中，
+  多个进程同时运行时不会重复领取
+- 使用固定大小的线程池并发调用短信接口，并可限制每秒发送条数（避免批量重发时压垮短信接口）
+- 发送中超时未完成的记录（进程异常退出）会重新变为待发送
+
+使用方法:
+    python manage.py sms_worker
+    python manage.py sms_worker --concurrency 8 --batch-size 50
+    python manage.py sms_worker --rate-limit 5
+    python manage.py sms_worker --once
+"""
+import logging
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from apps.workflow.models import SmsRecord
+from apps.workflow.sms_dedup import SmsDedupService
+from apps.workflow.sms_service import SmsService
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = '发送待发送的短信（发件箱），支持多进程同时运行'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=getattr(settings, 'SMS_WORKER_CONCURRENCY', 4),
+            help='同时调用短信接口的线程数'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=getattr(settings, 'SMS_WORKER_BATCH_SIZE', 20),
+            help='每次领取的最大记录数'
+        )
+        parser.add_argument(
+            '--rate-limit',
+            type=float,
+            default=getattr(settings, 'SMS_WORKER_RATE_LIMIT', 0),
+            help='每秒最多发送的短信条数，0表示不限制'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=getattr(settings, 'SMS_WORKER_POLL_INTERVAL', 2),
+            help='没有待发送记录时的等待时间（秒）'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='发送完当前所有待发送记录后退出'
+        )
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        batch_size = max(1, options['batch_size'])
+        poll_interval = max(0.1, options['poll_interval'])
+        rate_limit = max(0, options['rate_limit'])
+        self.stopping = False
+
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'短信发送服务已启动（并发数: {concurrency}, 每批: {batch_size}, '
+            f'限速: {f"{rate_limit}条/秒" if rate_limit else "不限"}）'
+        ))
+
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='sms-worker') as executor:
+            while not self.stopping:
+                self.release_stale()
+                records = self.claim(batch_size)
+                if records:
+                    started = time.monotonic()
+                    results = list(executor.map(self.deliver, records))
+                    self.stdout.write(
+                        f'已发送 {len(results)} 条短信，成功 {results.count(True)} 条'
+                    )
+                    if rate_limit:
+                        # 本批发送得太快时等待，使平均速率不超过限速
+                        time.sleep(max(0, len(records) / rate_limit - (time.monotonic() - started)))
+                    continue
+                if options['once']:
+                    break
+                close_old_connections()
+                time.sleep(poll_interval)
+
+        self.stdout.write(self.style.SUCCESS('短信发送服务已停止'))
+
+    def stop(self, signum, frame):
+        """收到退出信号后，发送完当前批次再退出"""
+        self.stopping = True
+
+    def claim(self, batch_size):
+        """领取一批待发送记录并标记为发送中"""
+        with transaction.atomic():
+            records = list(
+                SmsRecord.objects.select_for_update(skip_locked=True)
+                .filter(status='pending')
+                .order_by('created_at')[:batch_size]
+            )
+            if records:
+                now = timezone.now()
+                SmsRecord.objects.filter(id__in=[record.id for record in records]).update(
+                    status='sending', claimed_at=now
+                )
+                for record in records:
+                    record.status = 'sending'
+                    record.claimed_at = now
+        return records
+
+    def release_stale(self):
+        """发送中超时的记录（领取后进程异常退出）重新变为待发送，并清理过期的去重键"""
+        stale_seconds = getattr(settings, 'SMS_WORKER_STALE_SECONDS', 300)
+        released = SmsRecord.objects.filter(
+            status='sending',
+            claimed_at__lt=timezone.now() - timedelta(seconds=stale_seconds)
+        ).update(status='pending', claimed_at=None)
+        if released:
+            logger.warning(f'{released} 条短信发送超时未完成，已重新加入待发送队列')
+        # 顺便清理数据库中已过期的去重键（未使用Redis时）
+        SmsDedupService.purge_expired()
+
+    @staticmethod
+    def deliver(sms_record):
+        """在线程池中发送一条记录（每个线程使用自己的数据库连接）"""
+        close_old_connections()
+        try:
+            return SmsService.deliver(sms_record)
+        except Exception as e:
+            logger.error(f'发送短信失败 (ID: {sms_record.id}): {e}', exc_info=True)
+            SmsRecord.objects.filter(id=sms_record.id).update(status='failed', error_message=str(e))
+            return False
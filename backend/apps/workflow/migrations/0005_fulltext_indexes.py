@@ -0,0 +1,39 @@
+# Generated manually for task full-text search over workflow log comments (MySQL FULLTEXT with ngram parser)
+
+from django.db import migrations
+
+
+FULLTEXT_INDEXES = [
+    ('workflow_logs', 'workflow_logs_comment_ft', ['comment']),
+]
+
+
+def create_fulltext_indexes(apps, schema_editor):
+    # 只有MySQL支持FULLTEXT ngram索引，其他数据库使用进程内倒排索引
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    qn = schema_editor.quote_name
+    for table, name, columns in FULLTEXT_INDEXES:
+        schema_editor.execute(
+            f'CREATE FULLTEXT INDEX {qn(name)} ON {qn(table)} '
+            f'({", ".join(qn(column) for column in columns)}) WITH PARSER ngram'
+        )
+
+
+def drop_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    qn = schema_editor.quote_name
+    for table, name, columns in FULLTEXT_INDEXES:
+        schema_editor.execute(f'DROP INDEX {qn(name)} ON {qn(table)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0004_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_indexes, drop_fulltext_indexes),
+    ]
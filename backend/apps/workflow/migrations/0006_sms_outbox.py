@@ -0,0 +1,23 @@
+# Generated by Django 4.2.11 on 2026-10-17 04:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0005_fulltext_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='smsrecord',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='领取时间'),
+        ),
+        migrations.AlterField(
+            model_name='smsrecord',
+            name='status',
+            field=models.CharField(choices=[('pending', '待发送'), ('sending', '发送中'), ('success', '发送成功'), ('failed', '发送失败')], default='pending', max_length=20, verbose_name='发送状态'),
+        ),
+    ]
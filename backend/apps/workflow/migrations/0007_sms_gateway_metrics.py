@@ -0,0 +1,28 @@
+# Generated by Django 4.2.11 on 2026-10-17 04:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0006_sms_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='smsrecord',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='请求次数'),
+        ),
+        migrations.AddField(
+            model_name='smsrecord',
+            name='http_status',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='HTTP状态码'),
+        ),
+        migrations.AddField(
+            model_name='smsrecord',
+            name='latency_ms',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='接口耗时(毫秒)'),
+        ),
+    ]
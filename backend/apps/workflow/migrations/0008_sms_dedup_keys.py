@@ -0,0 +1,26 @@
+# Generated by Django 4.2.11 on 2026-10-17 04:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0007_sms_gateway_metrics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SmsDedupKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=191, unique=True, verbose_name='去重键')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='过期时间')),
+            ],
+            options={
+                'verbose_name': '短信去重键',
+                'verbose_name_plural': '短信去重键',
+                'db_table': 'sms_dedup_keys',
+            },
+        ),
+    ]
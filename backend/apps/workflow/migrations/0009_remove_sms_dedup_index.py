@@ -0,0 +1,17 @@
+# Generated by Django 4.2.11 on 2026-10-17 05:24
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0008_sms_dedup_keys'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='smsrecord',
+            name='sms_dedup_idx',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-17 05:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0009_remove_sms_dedup_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='smsdedupkey',
+            name='token',
+            field=models.CharField(default='', max_length=32, verbose_name='占用标识'),
+        ),
+    ]
@@ -19,6 +19,10 @@ class WorkflowLog(models.Model):
         verbose_name = '工作流日志'
         verbose_name_plural = '工作流日志'
         ordering = ['-created_at']
+        indexes = [
+            # 按任务查询日志并按创建时间排序
+            models.Index(fields=['task', 'created_at'], name='wflog_task_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.task.title} - {self.action} ({self.created_at})"
@@ -51,6 +55,11 @@ class Notification(models.Model):
         verbose_name = '通知'
         verbose_name_plural = '通知'
         ordering = ['-created_at']
+        indexes = [
+            # 按接收人和已读状态查询，按创建时间排序
+            models.Index(fields=['user', 'is_read', 'created_at'], name='notif_user_read_created_idx'),
+            models.Index(fields=['user', 'created_at'], name='notif_user_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.title}"
@@ -80,11 +89,16 @@ class SmsConfig(models.Model):
         return f"{self.name} ({'启用' if self.is_enabled else '禁用'})"
     
     def get_api_params(self):
-        """获取解析后的接口参数"""
-        try:
-            return json.loads(self.api_params)
-        except (json.JSONDecodeError, TypeError):
-            return {}
+        """获取解析后的接口参数（解析结果保存在实例上，随实例一起缓存）"""
+        parsed = self.__dict__.get('_parsed_api_params')
+        if parsed is None or parsed[0] != self.api_params:
+            try:
+                params = json.loads(self.api_params)
+            except (json.JSONDecodeError, TypeError):
+                params = {}
+            parsed = (self.api_params, params)
+            self._parsed_api_params = parsed
+        return parsed[1]
 
 
 class SmsTemplate(models.Model):
@@ -118,6 +132,7 @@ class SmsRecord(models.Model):
     """短信发送记录模型"""
     STATUS_CHOICES = [
         ('pending', '待发送'),
+        ('sending', '发送中'),
         ('success', '发送成功'),
         ('failed', '发送失败'),
     ]
@@ -131,6 +146,10 @@ class SmsRecord(models.Model):
     error_message = models.TextField(blank=True, null=True, verbose_name='错误信息')
     response_data = models.TextField(blank=True, null=True, verbose_name='接口响应数据')
     sent_at = models.DateTimeField(null=True, blank=True, verbose_name='发送时间')
+    claimed_at = models.DateTimeField(null=True, blank=True, verbose_name='领取时间')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='请求次数')
+    latency_ms = models.PositiveIntegerField(null=True, blank=True, verbose_name='接口耗时(毫秒)')
+    http_status = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name='HTTP状态码')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     
     class Meta:
@@ -138,7 +157,25 @@ class SmsRecord(models.Model):
         verbose_name = '短信发送记录'
         verbose_name_plural = '短信发送记录'
         ordering = ['-created_at']
+        indexes = [
+            # 按发送状态查询（后台列表过滤、sms_worker 领取待发送记录）
+            models.Index(fields=['status', 'created_at'], name='sms_status_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.phone} - {self.status} ({self.created_at})"
 
+
+class SmsDedupKey(models.Model):
+    """短信防重复发送键（时间窗口去重表，事务内发送短信和未使用Redis时使用）"""
+    key = models.CharField(max_length=191, unique=True, verbose_name='去重键')
+    expires_at = models.DateTimeField(db_index=True, verbose_name='过期时间')
+    token = models.CharField(max_length=32, default='', verbose_name='占用标识')
+    
+    class Meta:
+        db_table = 'sms_dedup_keys'
+        verbose_name = '短信去重键'
+        verbose_name_plural = '短信去重键'
+    
+    def __str__(self):
+        return f"{self.key} ({self.expires_at})"
@@ -0,0 +1,176 @@
+"""
+通知推送通道（Server-Sent Events / 长轮询）
+
+通知创建后（事务提交后）发布到消息代理，已连接的客户端实时收到推送：
+- RedisNotificationBroker: 通过 Redis pub/sub 在多个进程、多台服务器之间分发
+- LocalNotificationBroker: 进程内分发，未配置 Redis 时使用（开发环境）
+
+推送接口是异步视图，需要通过 oms_backend/asgi.py 以 ASGI 方式部署，
+空闲连接只等待消息代理，不产生数据库查询。
+
+浏览器的 EventSource 不能设置请求头，也不应把访问令牌放在URL中（会写入 Nginx、Gunicorn 的访问日志），
+因此先通过已认证的接口换取连接票据，票据只能使用一次，有效期 NOTIFICATION_STREAM_TICKET_TTL 秒。
+"""
+import asyncio
+import json
+import logging
+import secrets
+import threading
+from collections import defaultdict
+from typing import Iterable, Optional
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.utils.encoders import JSONEncoder
+
+logger = logging.getLogger(__name__)
+
+
+def get_channel(user_id) -> str:
+    """用户的通知频道名"""
+    return f'notifications:user:{user_id}'
+
+
+class NotificationBroker:
+    """通知消息代理基类"""
+
+    def publish(self, user_id, message: str):
+        """发布消息（同步，在事务提交后调用）"""
+        raise NotImplementedError
+
+    async def listen(self, user_id, timeout: float):
+        """订阅用户频道，逐条产出消息
+
+        订阅成功后先产出一次 None，之后超过 timeout 秒没有消息时也产出 None（用于发送心跳）。
+        """
+        raise NotImplementedError
+        yield  # pragma: no cover
+
+
+class RedisNotificationBroker(NotificationBroker):
+    """基于 Redis pub/sub 的消息代理"""
+
+    def __init__(self, url: str):
+        import redis
+        self.url = url
+        self._client = redis.Redis.from_url(url)
+
+    def publish(self, user_id, message):
+        self._client.publish(get_channel(user_id), message)
+
+    async def listen(self, user_id, timeout):
+        import redis.asyncio as aioredis
+        client = aioredis.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(get_channel(user_id))
+            yield None
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+                if message is None:
+                    yield None
+                    continue
+                data = message.get('data')
+                yield data.decode('utf-8') if isinstance(data, bytes) else data
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+
+class LocalNotificationBroker(NotificationBroker):
+    """进程内消息代理（仅在单进程部署或开发环境中使用）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 用户ID -> {(事件循环, 队列)}
+        self._subscribers = defaultdict(set)
+
+    def publish(self, user_id, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, message)
+
+    async def listen(self, user_id, timeout):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers[user_id].add(subscriber)
+        try:
+            yield None
+            while True:
+                try:
+                    yield await asyncio.wait_for(subscriber[1].get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                self._subscribers[user_id].discard(subscriber)
+                if not self._subscribers[user_id]:
+                    del self._subscribers[user_id]
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker() -> NotificationBroker:
+    """获取消息代理（进程内单例）"""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                url = getattr(settings, 'NOTIFICATION_STREAM_REDIS_URL', '')
+                _broker = RedisNotificationBroker(url) if url else LocalNotificationBroker()
+    return _broker
+
+
+def serialize_notification(notification) -> str:
+    """序列化通知（与通知列表接口的格式一致）"""
+    from .serializers import NotificationSerializer
+    return json.dumps(NotificationSerializer(notification).data, cls=JSONEncoder, ensure_ascii=False)
+
+
+def publish_notifications(notifications: Iterable):
+    """推送通知给在线用户（推送失败不影响业务流程）"""
+    broker = get_broker()
+    for notification in notifications:
+        try:
+            broker.publish(notification.user_id, serialize_notification(notification))
+        except Exception as e:
+            logger.warning(f'推送通知失败（通知ID: {notification.id}）: {e}')
+
+
+def format_sse(data: Optional[str], event_id=None, event: Optional[str] = None) -> str:
+    """格式化一条 SSE 消息；data 为 None 时输出心跳注释"""
+    if data is None:
+        return ': heartbeat\n\n'
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event:
+        lines.append(f'event: {event}')
+    for line in data.splitlines() or ['']:
+        lines.append(f'data: {line}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def _ticket_key(ticket: str) -> str:
+    return f'notifications:stream_ticket:{ticket}'
+
+
+def issue_stream_ticket(user) -> str:
+    """为用户生成推送连接票据"""
+    ticket = secrets.token_urlsafe(32)
+    cache.set(_ticket_key(ticket), user.id, timeout=settings.NOTIFICATION_STREAM_TICKET_TTL)
+    return ticket
+
+
+async def consume_stream_ticket(ticket: str) -> Optional[int]:
+    """使用票据，返回用户ID；票据无效、过期或已使用时返回None"""
+    if not ticket:
+        return None
+    key = _ticket_key(ticket)
+    user_id = await cache.aget(key)
+    # 只有成功删除票据的请求有效，同一票据同时使用时只有一个请求通过
+    if user_id is None or not await cache.adelete(key):
+        return None
+    return user_id
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from .models import WorkflowLog, Notification
-from apps.tasks.serializers import TaskSerializer
+from apps.tasks.serializers import TaskSerializer, TaskBriefSerializer
 from apps.accounts.serializers import UserSerializer
 
 
@@ -18,7 +18,7 @@ class WorkflowLogSerializer(serializers.ModelSerializer):
 
 class NotificationSerializer(serializers.ModelSerializer):
     """通知序列化器"""
-    task = TaskSerializer(read_only=True)
+    task = TaskBriefSerializer(read_only=True)
     notification_type_display = serializers.CharField(source='get_notification_type_display', read_only=True)
     
     class Meta:
@@ -0,0 +1,117 @@
+"""
+短信配置和短信模板的缓存
+
+两级缓存：
+- 进程内 LRU 缓存（带过期时间），命中时不访问 Redis 和数据库
+- Redis 缓存（django-redis），多个进程共享，进程内缓存过期后从这里加载
+
+SmsConfig、SmsTemplate 保存或删除时（post_save/post_delete 信号）清空本进程的缓存，
+并递增 Redis 中的版本号使共享缓存失效；其他进程的进程内缓存最多在
+SMS_SETTINGS_LOCAL_CACHE_TTL 秒后过期。
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+logger = logging.getLogger(__name__)
+
+# 缓存“不存在”的结果（未配置或已禁用），避免每次都查询数据库
+_MISSING = '__missing__'
+
+
+class SmsSettingsCache:
+    """进程内 LRU + Redis 两级缓存"""
+
+    VERSION_KEY = 'sms_settings:version'
+
+    def __init__(self, maxsize: int = 64):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._local = OrderedDict()
+
+    @staticmethod
+    def get_local_ttl() -> float:
+        return getattr(settings, 'SMS_SETTINGS_LOCAL_CACHE_TTL', 30)
+
+    @staticmethod
+    def get_redis_timeout() -> int:
+        return getattr(settings, 'SMS_SETTINGS_CACHE_TIMEOUT', 3600)
+
+    def get(self, key: str, loader):
+        """读取缓存，两级都未命中时调用 loader 从数据库加载"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None and entry[0] > now:
+                self._local.move_to_end(key)
+                return None if entry[1] is _MISSING else entry[1]
+
+        value = self._get_shared(key)
+        if value is None:
+            value = loader()
+            if value is None:
+                value = _MISSING
+            self._set_shared(key, value)
+
+        with self._lock:
+            self._local[key] = (now + self.get_local_ttl(), value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+        return None if value is _MISSING else value
+
+    def clear_local(self):
+        """清空本进程的缓存"""
+        with self._lock:
+            self._local.clear()
+
+    def invalidate(self):
+        """清空本进程缓存并使共享缓存失效"""
+        self.clear_local()
+        try:
+            cache.incr(self.VERSION_KEY)
+        except ValueError:
+            cache.set(self.VERSION_KEY, 2, timeout=None)
+        except Exception as e:
+            logger.warning(f'清除短信配置缓存失败: {e}')
+
+    def _shared_key(self, key: str) -> str:
+        version = cache.get(self.VERSION_KEY)
+        if version is None:
+            cache.add(self.VERSION_KEY, 1, timeout=None)
+            version = cache.get(self.VERSION_KEY, 1)
+        return f'sms_settings:{version}:{key}'
+
+    def _get_shared(self, key: str):
+        try:
+            return cache.get(self._shared_key(key))
+        except Exception as e:
+            logger.warning(f'读取短信配置缓存失败: {e}')
+            return None
+
+    def _set_shared(self, key: str, value):
+        try:
+            cache.set(self._shared_key(key), value, timeout=self.get_redis_timeout())
+        except Exception as e:
+            logger.warning(f'写入短信配置缓存失败: {e}')
+
+
+sms_settings_cache = SmsSettingsCache()
+
+
+def invalidate_sms_settings(**kwargs):
+    """SmsConfig、SmsTemplate 变更后清除缓存（事务提交后执行）"""
+    transaction.on_commit(sms_settings_cache.invalidate)
+
+
+def connect_signals():
+    """连接短信配置和模板的变更信号"""
+    from .models import SmsConfig, SmsTemplate
+    for model in (SmsConfig, SmsTemplate):
+        post_save.connect(invalidate_sms_settings, sender=model, dispatch_uid=f'sms_cache_save_{model.__name__}')
+        post_delete.connect(invalidate_sms_settings, sender=model, dispatch_uid=f'sms_cache_delete_{model.__name__}')
@@ -0,0 +1,153 @@
+"""
+短信防重复发送（滑动时间窗口）
+
+相同的短信（手机号 + 模板类型 + 任务 + 接收人）在时间窗口内只允许发送一次。
+去重不再查询短信记录表，而是原子地占用一个去重键，并发的多个进程中只有一个能成功：
+- Redis: SET key 1 NX PX 窗口毫秒数，键过期即窗口结束；多个键通过 pipeline 一次往返占用
+- 在数据库事务中调用时（如工作流操作把短信写入发件箱），使用 sms_dedup_keys 表的唯一索引，
+  去重键与短信记录、业务数据一起提交或回滚；Redis 中的键不会随事务回滚，
+  操作失败后重试时短信会在整个时间窗口内被误判为重复
+- 未使用 Redis 缓存或 Redis 不可用时，同样使用 sms_dedup_keys 表
+
+使用数据库时，无论一次占用多少个键都只执行三条语句：
+重新占用已过期的键（UPDATE）、批量写入新键（忽略已存在的键）、按本次占用的标识查回成功的键。
+
+发送失败时释放去重键，允许立即重新发送（与原来只统计成功、待发送记录的规则一致）。
+"""
+import logging
+import uuid
+from datetime import timedelta
+from typing import Iterable, Optional, Set
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import SmsDedupKey
+
+logger = logging.getLogger(__name__)
+
+
+class SmsDedupService:
+    """短信防重复发送服务类"""
+
+    KEY_PREFIX = 'sms_dedup:'
+
+    @staticmethod
+    def get_window_seconds() -> int:
+        """获取去重时间窗口（秒）"""
+        return getattr(settings, 'SMS_DEDUP_WINDOW_SECONDS', 300)
+
+    @staticmethod
+    def build_key(
+        phone: str,
+        template_type: Optional[str] = None,
+        task_id: Optional[int] = None,
+        recipient_id: Optional[int] = None
+    ) -> str:
+        """构建去重键
+
+        有关联任务和模板类型时按 手机号+模板类型+任务+接收人 去重，否则按手机号去重。
+        """
+        phone = phone.strip()
+        if task_id and template_type:
+            return f'{phone}:{template_type}:{task_id}:{recipient_id or ""}'
+        return phone
+
+    @staticmethod
+    def _get_redis():
+        """获取 Redis 连接，缓存后端不是 django-redis 时返回None"""
+        try:
+            from django_redis import get_redis_connection
+            return get_redis_connection('default')
+        except (ImportError, NotImplementedError):
+            return None
+
+    @classmethod
+    def acquire(
+        cls,
+        phone: str,
+        template_type: Optional[str] = None,
+        task_id: Optional[int] = None,
+        recipient_id: Optional[int] = None
+    ) -> bool:
+        """占用去重键
+
+        Returns:
+            True表示可以发送，False表示时间窗口内已发送过相同短信
+        """
+        key = cls.build_key(phone, template_type, task_id, recipient_id)
+        acquired = key in cls.acquire_many([key])
+        if not acquired:
+            logger.warning(
+                f'[重复发送检查] 手机号: {phone}, 任务ID: {task_id}, 模板类型: {template_type}, '
+                f'在最近{cls.get_window_seconds() // 60}分钟内已发送过相同短信，跳过发送'
+            )
+        return acquired
+
+    @classmethod
+    def acquire_many(cls, keys: Iterable[str]) -> Set[str]:
+        """一次往返占用多个去重键（由 build_key 构建）
+
+        Returns:
+            占用成功（可以发送）的键
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return set()
+        window = cls.get_window_seconds()
+
+        redis = None if transaction.get_connection().in_atomic_block else cls._get_redis()
+        if redis is not None:
+            try:
+                pipeline = redis.pipeline(transaction=False)
+                for key in keys:
+                    pipeline.set(cls.KEY_PREFIX + key, 1, nx=True, px=window * 1000)
+                return {key for key, acquired in zip(keys, pipeline.execute()) if acquired}
+            except Exception as e:
+                logger.warning(f'Redis防重复发送检查失败，改用数据库: {e}')
+        return cls._acquire_db(keys, window)
+
+    @classmethod
+    def release(
+        cls,
+        phone: str,
+        template_type: Optional[str] = None,
+        task_id: Optional[int] = None,
+        recipient_id: Optional[int] = None
+    ):
+        """释放去重键（发送失败后调用）
+
+        占用时可能使用了 Redis 或数据库（取决于是否在事务中），两处都删除。
+        """
+        key = cls.build_key(phone, template_type, task_id, recipient_id)
+        redis = cls._get_redis()
+        if redis is not None:
+            try:
+                redis.delete(cls.KEY_PREFIX + key)
+            except Exception as e:
+                logger.warning(f'Redis释放短信去重键失败: {e}')
+        SmsDedupKey.objects.filter(key=key).delete()
+
+    @staticmethod
+    def _acquire_db(keys, window: int) -> Set[str]:
+        """使用数据库唯一索引占用去重键（固定三条语句）
+
+        每次占用生成一个标识写入 token，并发时同一个键只有一个进程的标识能写入，
+        最后按标识查回本次占用成功的键。
+        """
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=window)
+        token = uuid.uuid4().hex
+        # 已过期的键：条件更新重新占用，并发时只有一个进程能更新成功
+        SmsDedupKey.objects.filter(key__in=keys, expires_at__lte=now).update(expires_at=expires_at, token=token)
+        # 不存在的键：批量写入，已存在（未过期或刚被其他进程占用）的键被忽略
+        SmsDedupKey.objects.bulk_create(
+            [SmsDedupKey(key=key, expires_at=expires_at, token=token) for key in keys],
+            ignore_conflicts=True
+        )
+        return set(SmsDedupKey.objects.filter(key__in=keys, token=token).values_list('key', flat=True))
+
+    @staticmethod
+    def purge_expired() -> int:
+        """删除已过期的数据库去重键"""
+        deleted, _ = SmsDedupKey.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
@@ -0,0 +1,97 @@
+"""
+短信接口HTTP客户端
+
+进程内复用同一个 requests.Session，连接池保持长连接，避免每条短信都重新建立TCP/TLS连接；
+请求超时、连接失败或接口返回5xx时按指数退避重试。
+"""
+import logging
+import threading
+import time
+from typing import Optional
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SmsGatewayResult:
+    """一次短信接口调用的结果（包含重试次数和耗时）"""
+
+    def __init__(self, response: Optional[requests.Response] = None,
+                 error: Optional[requests.exceptions.RequestException] = None,
+                 attempts: int = 0, latency_ms: int = 0):
+        self.response = response
+        self.error = error
+        self.attempts = attempts
+        self.latency_ms = latency_ms
+
+    @property
+    def status_code(self) -> Optional[int]:
+        return self.response.status_code if self.response is not None else None
+
+
+class SmsGatewayClient:
+    """短信接口客户端（线程安全，可在 sms_worker 的线程池中共用）"""
+
+    RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+    def __init__(self, pool_size: int = 10, connect_timeout: float = 3, read_timeout: float = 10,
+                 max_retries: int = 2, backoff: float = 0.5):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max(0, max_retries)
+        self.backoff = backoff
+        self.session = requests.Session()
+        # 重试由 post() 自己处理，以便记录重试次数
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def post(self, url: str, **kwargs) -> SmsGatewayResult:
+        """发送POST请求，失败时按 backoff * 2^n 秒退避重试"""
+        kwargs.setdefault('timeout', self.timeout)
+        started = time.monotonic()
+        attempts = 0
+        while True:
+            attempts += 1
+            response, error = None, None
+            try:
+                response = self.session.post(url, **kwargs)
+                retryable = response.status_code in self.RETRY_STATUS_CODES
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                error = e
+                retryable = True
+            except requests.exceptions.RequestException as e:
+                error = e
+                retryable = False
+
+            if not retryable or attempts > self.max_retries:
+                break
+            delay = self.backoff * (2 ** (attempts - 1))
+            logger.warning(
+                f'短信接口第{attempts}次请求失败（{error or f"HTTP {response.status_code}"}），{delay}秒后重试'
+            )
+            time.sleep(delay)
+
+        latency_ms = int((time.monotonic() - started) * 1000)
+        return SmsGatewayResult(response=response, error=error, attempts=attempts, latency_ms=latency_ms)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_gateway_client() -> SmsGatewayClient:
+    """获取短信接口客户端（进程内单例）"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = SmsGatewayClient(
+                    pool_size=getattr(settings, 'SMS_GATEWAY_POOL_SIZE', 10),
+                    connect_timeout=getattr(settings, 'SMS_GATEWAY_CONNECT_TIMEOUT', 3),
+                    read_timeout=getattr(settings, 'SMS_GATEWAY_READ_TIMEOUT', 10),
+                    max_retries=getattr(settings, 'SMS_GATEWAY_MAX_RETRIES', 2),
+                    backoff=getattr(settings, 'SMS_GATEWAY_RETRY_BACKOFF', 0.5),
+                )
+    return _client
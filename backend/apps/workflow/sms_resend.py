@@ -0,0 +1,109 @@
+"""
+短信批量重发任务
+
+后台批量重发不在请求中逐条调用短信接口，而是把选中的记录重新置为待发送，
+由 sms_worker 按配置的并发数和速率发送；重发任务的信息保存在缓存中，
+后台页面轮询 get_progress() 查看进度和最终结果。
+"""
+import logging
+import uuid
+from typing import Any, Dict, Optional
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+from .models import SmsRecord
+
+logger = logging.getLogger(__name__)
+
+
+class SmsResendJobService:
+    """短信批量重发任务服务类"""
+
+    CACHE_KEY_PREFIX = 'sms_resend_job:'
+    # 重发任务信息的保存时间（秒）
+    JOB_TIMEOUT = 24 * 3600
+    # 可以重发的状态（与列表中的重发按钮一致）
+    RESENDABLE_STATUSES = ('failed', 'pending')
+
+    @classmethod
+    def create_job(cls, queryset, user=None) -> Dict[str, Any]:
+        """创建重发任务：将可重发的记录重新置为待发送
+
+        Args:
+            queryset: 选中的短信记录
+            user: 操作人
+
+        Returns:
+            重发任务信息
+        """
+        selected = queryset.count()
+        record_ids = list(
+            queryset.filter(status__in=cls.RESENDABLE_STATUSES).values_list('id', flat=True)
+        )
+        records = SmsRecord.objects.filter(id__in=record_ids)
+
+        # 手机号为空的记录无法重发，直接标记为失败
+        records.filter(phone='').update(status='failed', error_message='手机号为空')
+        records.exclude(phone='').update(
+            status='pending',
+            claimed_at=None,
+            error_message=None,
+            response_data=None,
+            sent_at=None,
+            attempts=0,
+            latency_ms=None,
+            http_status=None,
+        )
+
+        job = {
+            'id': uuid.uuid4().hex,
+            'record_ids': record_ids,
+            'total': len(record_ids),
+            'skipped': selected - len(record_ids),
+            'created_by': user.username if user else None,
+            'created_at': timezone.now().isoformat(),
+        }
+        cache.set(cls.CACHE_KEY_PREFIX + job['id'], job, timeout=cls.JOB_TIMEOUT)
+        logger.info(f'创建短信重发任务 {job["id"]}: 重发 {job["total"]} 条，跳过 {job["skipped"]} 条')
+        return job
+
+    @classmethod
+    def get_job(cls, job_id: str) -> Optional[Dict[str, Any]]:
+        """获取重发任务信息（不存在或已过期时返回None）"""
+        return cache.get(cls.CACHE_KEY_PREFIX + job_id)
+
+    @classmethod
+    def get_progress(cls, job_id: str) -> Optional[Dict[str, Any]]:
+        """统计重发任务的进度
+
+        Returns:
+            total、skipped、pending（待发送+发送中）、success、failed、finished、percent；
+            任务不存在时返回None
+        """
+        job = cls.get_job(job_id)
+        if job is None:
+            return None
+
+        counts = dict(
+            SmsRecord.objects.filter(id__in=job['record_ids'])
+            .order_by()
+            .values_list('status')
+            .annotate(count=Count('id'))
+        )
+        pending = counts.get('pending', 0) + counts.get('sending', 0)
+        total = job['total']
+        # 重发期间被删除的记录视为已处理
+        done = total - pending
+
+        return {
+            'id': job['id'],
+            'total': total,
+            'skipped': job['skipped'],
+            'pending': pending,
+            'success': counts.get('success', 0),
+            'failed': counts.get('failed', 0),
+            'finished': pending == 0,
+            'percent': 100 if total == 0 else int(done * 100 / total),
+            'created_by': job['created_by'],
+            'created_at': job['created_at'],
+        }
@@ -4,16 +4,21 @@
 import requests
 import json
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlencode, quote
 from typing import Optional, Dict, Any
 from django.utils import timezone
 from django.conf import settings
-from django.db import transaction
-from django.db.models import Q
-from datetime import timedelta
+from django.db import connection
 from .models import SmsConfig, SmsTemplate, SmsRecord
+from .sms_cache import sms_settings_cache
+from .sms_dedup import SmsDedupService
+from .sms_gateway import get_gateway_client
+from .sms_template import compile_template
 from apps.tasks.models import Task
 from apps.accounts.models import User
+from oms_backend.metrics import SMS_SEND_DURATION
 
 logger = logging.getLogger(__name__)
 
@@ -23,21 +28,27 @@ class SmsService:
     
     @staticmethod
     def get_config() -> Optional[SmsConfig]:
-        """获取启用的短信配置"""
+        """获取启用的短信配置（优先从缓存读取）"""
         try:
-            return SmsConfig.objects.filter(is_enabled=True).first()
+            return sms_settings_cache.get(
+                'config',
+                lambda: SmsConfig.objects.filter(is_enabled=True).first()
+            )
         except Exception as e:
             logger.error(f'获取短信配置失败: {e}')
             return None
     
     @staticmethod
     def get_template(template_type: str) -> Optional[SmsTemplate]:
-        """获取启用的短信模板"""
+        """获取启用的短信模板（优先从缓存读取）"""
         try:
-            return SmsTemplate.objects.filter(
-                template_type=template_type,
-                is_enabled=True
-            ).first()
+            return sms_settings_cache.get(
+                f'template:{template_type}',
+                lambda: SmsTemplate.objects.filter(
+                    template_type=template_type,
+                    is_enabled=True
+                ).first()
+            )
         except Exception as e:
             logger.error(f'获取短信模板失败: {e}')
             return None
@@ -53,59 +64,7 @@ class SmsService:
         Returns:
             格式化后的内容
         """
-        content = template_content
-        for key, value in context.items():
-            placeholder = f'{{{key}}}'
-            content = content.replace(placeholder, str(value) if value else '')
-        return content
-    
-    @staticmethod
-    def _check_duplicate_sms(
-        phone: str,
-        template_type: Optional[str] = None,
-        task: Optional[Task] = None,
-        recipient: Optional[User] = None,
-        time_window_minutes: int = 5
-    ) -> bool:
-        """检查是否在短时间内重复发送相同的短信
-        
-        Args:
-            phone: 手机号
-            template_type: 模板类型
-            task: 关联的任务
-            recipient: 接收人
-            time_window_minutes: 时间窗口（分钟），在这个时间内的相同短信视为重复
-            
-        Returns:
-            True表示是重复发送，False表示不是重复
-        """
-        # 构建查询条件
-        time_threshold = timezone.now() - timedelta(minutes=time_window_minutes)
-        
-        query = Q(phone=phone.strip(), created_at__gte=time_threshold)
-        
-        # 如果有关联任务和模板类型，检查是否有相同的任务+模板类型组合
-        if task and template_type:
-            query &= Q(task=task, template_type=template_type)
-            if recipient:
-                query &= Q(recipient=recipient)
-        
-        # 检查是否有成功或待发送的记录
-        existing = SmsRecord.objects.filter(
-            query,
-            status__in=['success', 'pending']
-        ).exists()
-        
-        if existing:
-            logger.warning(
-                f'[重复发送检查] 手机号: {phone}, '
-                f'任务ID: {task.id if task else None}, '
-                f'模板类型: {template_type}, '
-                f'在最近{time_window_minutes}分钟内已发送过相同短信，跳过发送'
-            )
-            return True
-        
-        return False
+        return compile_template(template_content).render(context)
     
     @staticmethod
     def send_sms(
@@ -113,7 +72,8 @@ class SmsService:
         content: str,
         template_type: Optional[str] = None,
         task: Optional[Task] = None,
-        recipient: Optional[User] = None
+        recipient: Optional[User] = None,
+        send_now: bool = True
     ) -> bool:
         """发送短信
         
@@ -123,9 +83,10 @@ class SmsService:
             template_type: 模板类型
             task: 关联的任务
             recipient: 接收人
+            send_now: 是否立即发送；为False时只写入待发送记录（发件箱），由 sms_worker 发送
             
         Returns:
-            是否发送成功
+            是否发送成功（send_now为False时表示是否已写入待发送记录）
         """
         # 验证手机号
         phone = phone.strip() if phone else ''
@@ -133,10 +94,23 @@ class SmsService:
             logger.warning(f'手机号为空，无法发送短信')
             return False
         
-        # 防止重复发送：检查是否在短时间内已经发送过相同的短信
-        if SmsService._check_duplicate_sms(phone, template_type, task, recipient):
+        # 防止重复发送：原子地占用去重键，时间窗口内相同的短信只有一条能通过
+        dedup_args = (phone, template_type, task.id if task else None, recipient.id if recipient else None)
+        if not SmsDedupService.acquire(*dedup_args):
             return False
         
+        if not send_now:
+            # 写入发件箱，与业务数据在同一个事务中提交
+            SmsRecord.objects.create(
+                phone=phone,
+                content=content,
+                template_type=template_type,
+                task=task,
+                recipient=recipient,
+                status='pending'
+            )
+            return True
+        
         # 获取短信配置
         sms_config = SmsService.get_config()
         if not sms_config:
@@ -152,37 +126,75 @@ class SmsService:
                 status='failed',
                 error_message=error_msg
             )
+            SmsDedupService.release(*dedup_args)
             return False
         
-        # 创建发送记录（使用事务确保原子性）
-        with transaction.atomic():
-            # 再次检查是否有其他进程已经创建了相同的记录（双重检查）
-            if SmsService._check_duplicate_sms(phone, template_type, task, recipient, time_window_minutes=1):
-                return False
+        # 创建发送记录，直接标记为发送中，避免被 sms_worker 重复领取
+        sms_record = SmsRecord.objects.create(
+            phone=phone,
+            content=content,
+            template_type=template_type,
+            task=task,
+            recipient=recipient,
+            status='sending',
+            claimed_at=timezone.now()
+        )
+        
+        return SmsService.deliver(sms_record, sms_config)
+    
+    @staticmethod
+    def deliver(sms_record: SmsRecord, sms_config: Optional[SmsConfig] = None, log_prefix: str = '短信发送') -> bool:
+        """调用短信接口发送一条已创建的记录，并更新记录状态；发送失败时释放去重键
+        
+        Args:
+            sms_record: 短信记录（状态应为发送中）
+            sms_config: 短信配置，为None时重新获取
+            log_prefix: 日志前缀
             
-            sms_record = SmsRecord.objects.create(
-                phone=phone,
-                content=content,
-                template_type=template_type,
-                task=task,
-                recipient=recipient,
-                status='pending'
+        Returns:
+            是否发送成功
+        """
+        start = time.perf_counter()
+        success = SmsService._deliver(sms_record, sms_config, log_prefix)
+        # 运行指标：有接口耗时时使用接口耗时，否则（未配置、请求异常）使用整体耗时
+        if success:
+            outcome = 'success'
+        elif sms_record.http_status is None:
+            outcome = 'error'
+        else:
+            outcome = 'failed'
+        latency = sms_record.latency_ms / 1000 if sms_record.latency_ms is not None else time.perf_counter() - start
+        SMS_SEND_DURATION.observe(latency, outcome=outcome)
+        if not success:
+            SmsDedupService.release(
+                sms_record.phone, sms_record.template_type, sms_record.task_id, sms_record.recipient_id
             )
+        return success
+    
+    @staticmethod
+    def _deliver(sms_record: SmsRecord, sms_config: Optional[SmsConfig], log_prefix: str) -> bool:
+        """调用短信接口并更新记录状态"""
+        if sms_config is None:
+            sms_config = SmsService.get_config()
+        if not sms_config:
+            error_msg = '未配置短信接口或配置已禁用'
+            logger.warning(error_msg)
+            sms_record.status = 'failed'
+            sms_record.error_message = error_msg
+            sms_record.save()
+            return False
+        
+        phone = sms_record.phone.strip()
+        content = sms_record.content
         
         try:
             # 构建请求参数（POST请求，但参数通过URL查询字符串传递）
-            api_params = sms_config.get_api_params().copy()
-            
-            # 构建查询参数字典
-            query_params = {}
-            for key, value in api_params.items():
-                if isinstance(value, str):
-                    # 替换占位符
-                    formatted_value = value.replace('{phone}', phone)
-                    formatted_value = formatted_value.replace('{content}', content)
-                    query_params[key] = formatted_value
-                else:
-                    query_params[key] = str(value)
+            # 构建查询参数字典（参数值中的占位符使用编译后的模板一次替换）
+            param_context = {'phone': phone, 'content': content}
+            query_params = {
+                key: compile_template(value).render(param_context) if isinstance(value, str) else str(value)
+                for key, value in sms_config.get_api_params().items()
+            }
             
             # 如果没有配置参数，使用默认参数名和固定值
             if not query_params:
@@ -201,18 +213,23 @@ class SmsService:
             
             # 记录请求信息到日志
             logger.info(
-                f'[短信发送请求] 手机号: {phone}, '
+                f'[{log_prefix}请求] 记录ID: {sms_record.id}, 手机号: {phone}, '
                 f'请求方式: POST, '
                 f'完整URL: {full_url}, '
                 f'查询参数: {json.dumps(query_params, ensure_ascii=False)}'
             )
             
-            # 发送HTTP POST请求（参数在URL中，不是JSON body）
-            response = requests.post(
+            # 发送HTTP POST请求（参数在URL中，不是JSON body），复用连接池并在失败时重试
+            result = get_gateway_client().post(
                 full_url,
-                timeout=10,
                 headers={'Content-Type': 'application/json'}
             )
+            sms_record.attempts = result.attempts
+            sms_record.latency_ms = result.latency_ms
+            sms_record.http_status = result.status_code
+            if result.error is not None:
+                raise result.error
+            response = result.response
             
             # 记录响应
             response_data = None
@@ -225,7 +242,7 @@ class SmsService:
             
             # 记录响应信息到日志
             logger.info(
-                f'[短信发送响应] 记录ID: {sms_record.id}, 手机号: {phone}, '
+                f'[{log_prefix}响应] 记录ID: {sms_record.id}, 手机号: {phone}, '
                 f'HTTP状态码: {response.status_code}, '
                 f'响应内容: {sms_record.response_data}'
             )
@@ -237,7 +254,7 @@ class SmsService:
                 sms_record.status = 'failed'
                 sms_record.error_message = error_msg
                 sms_record.save()
-                logger.error(f'[短信发送失败] 记录ID: {sms_record.id}, 手机号: {phone}, 原因: {error_msg}')
+                logger.error(f'[{log_prefix}失败] 记录ID: {sms_record.id}, 手机号: {phone}, 原因: {error_msg}')
                 return False
             
             # 2. 检查响应体内容
@@ -250,7 +267,7 @@ class SmsService:
                     sms_record.status = 'success'
                     sms_record.sent_at = timezone.now()
                     sms_record.save()
-                    logger.info(f'[短信发送成功] 记录ID: {sms_record.id}, 手机号: {phone}, code: {code}')
+                    logger.info(f'[{log_prefix}成功] 记录ID: {sms_record.id}, 手机号: {phone}, code: {code}')
                     return True
                 else:
                     # 发送失败，记录错误信息
@@ -258,7 +275,7 @@ class SmsService:
                     sms_record.status = 'failed'
                     sms_record.error_message = error_msg
                     sms_record.save()
-                    logger.error(f'[短信发送失败] 记录ID: {sms_record.id}, 手机号: {phone}, 原因: {error_msg}')
+                    logger.error(f'[{log_prefix}失败] 记录ID: {sms_record.id}, 手机号: {phone}, 原因: {error_msg}')
                     return False
             else:
                 # 响应体不是JSON格式，尝试从文本中判断
@@ -267,31 +284,31 @@ class SmsService:
                 sms_record.sent_at = timezone.now()
                 sms_record.save()
                 logger.warning(
-                    f'[短信发送警告] 记录ID: {sms_record.id}, 手机号: {phone}, '
+                    f'[{log_prefix}警告] 记录ID: {sms_record.id}, 手机号: {phone}, '
                     f'HTTP状态码200但响应体不是JSON格式，已标记为成功，请人工检查'
                 )
                 return True
                 
         except requests.exceptions.Timeout:
-            error_msg = '短信接口请求超时'
+            error_msg = f'短信接口请求超时（已尝试{sms_record.attempts}次）'
             sms_record.status = 'failed'
             sms_record.error_message = error_msg
             sms_record.save()
-            logger.error(f'短信发送失败: {phone}, {error_msg}')
+            logger.error(f'[{log_prefix}失败] 记录ID: {sms_record.id}, 手机号: {phone}, {error_msg}')
             return False
         except requests.exceptions.RequestException as e:
-            error_msg = f'短信接口请求异常: {str(e)}'
+            error_msg = f'短信接口请求异常（已尝试{sms_record.attempts}次）: {str(e)}'
             sms_record.status = 'failed'
             sms_record.error_message = error_msg
             sms_record.save()
-            logger.error(f'短信发送失败: {phone}, {error_msg}')
+            logger.error(f'[{log_prefix}失败] 记录ID: {sms_record.id}, 手机号: {phone}, {error_msg}')
             return False
         except Exception as e:
             error_msg = f'发送短信时发生未知错误: {str(e)}'
             sms_record.status = 'failed'
             sms_record.error_message = error_msg
             sms_record.save()
-            logger.error(f'短信发送失败: {phone}, {error_msg}')
+            logger.error(f'[{log_prefix}失败] 记录ID: {sms_record.id}, 手机号: {phone}, {error_msg}')
             return False
     
     @staticmethod
@@ -299,7 +316,8 @@ class SmsService:
         template_type: str,
         task: Task,
         recipient: Optional[User] = None,
-        extra_context: Optional[Dict[str, Any]] = None
+        extra_context: Optional[Dict[str, Any]] = None,
+        send_now: bool = True
     ) -> bool:
         """发送任务相关短信
         
@@ -308,6 +326,7 @@ class SmsService:
             task: 任务对象
             recipient: 接收人（如果为None，则根据模板类型自动确定）
             extra_context: 额外的上下文变量
+            send_now: 是否立即发送，为False时写入发件箱由 sms_worker 发送
             
         Returns:
             是否发送成功
@@ -401,7 +420,8 @@ class SmsService:
             content=content,
             template_type=template_type,
             task=task,
-            recipient=recipient
+            recipient=recipient,
+            send_now=send_now
         )
     
     @staticmethod
@@ -429,136 +449,161 @@ class SmsService:
             return None
     
     @staticmethod
-    def send_task_submitted_sms(task: Task) -> bool:
+    def send_task_submitted_sms(task: Task, send_now: bool = True) -> bool:
         """发送任务提交短信给所有管理方"""
-        from apps.accounts.models import User
-        
-        template = SmsService.get_template('task_submitted')
+        return SmsService._send_role_sms(task, 'task_submitted', 'admin', '管理方', send_now=send_now)
+    
+    @staticmethod
+    def send_task_reviewed_sms(task: Task, send_now: bool = True) -> bool:
+        """发送任务审核通过短信给所有项目经理"""
+        return SmsService._send_role_sms(task, 'task_reviewed', 'manager', '项目经理', send_now=send_now)
+    
+    @staticmethod
+    def _send_role_sms(task: Task, template_type: str, role: str, role_label: str, send_now: bool = True) -> bool:
+        """给某个角色的所有用户发送任务短信"""
+        template_label = dict(SmsTemplate.TEMPLATE_TYPE_CHOICES).get(template_type, template_type)
+        template = SmsService.get_template(template_type)
         if not template:
-            logger.warning(f'未找到启用的任务提交短信模板 (任务ID: {task.id})')
+            logger.warning(f'未找到启用的{template_label}短信模板 (任务ID: {task.id})')
             # 创建失败记录
             SmsRecord.objects.create(
                 phone='',
                 content='',
-                template_type='task_submitted',
+                template_type=template_type,
                 task=task,
                 status='failed',
-                error_message='未找到启用的任务提交短信模板'
+                error_message=f'未找到启用的{template_label}短信模板'
             )
             return False
         
-        # 获取所有管理方（包括没有手机号的，用于记录）
-        all_admins = User.objects.filter(role='admin', is_active=True)
-        admins_with_phone = all_admins.filter(phone__isnull=False).exclude(phone='')
-        
-        if admins_with_phone.count() == 0:
-            # 没有可发送的管理方用户，创建失败记录
-            error_msg = '没有找到可发送短信的管理方用户（管理方用户未设置手机号）'
-            logger.warning(f'{error_msg} (任务ID: {task.id})')
-            
-            # 为每个管理方用户创建一条失败记录
-            context = {
-                '任务标题': task.title,
-                '任务名称': task.title,
-            }
-            content = SmsService.format_template_content(template.content, context)
-            
-            for admin in all_admins:
-                SmsRecord.objects.create(
-                    phone=admin.phone or '',
-                    content=content,
-                    template_type='task_submitted',
-                    task=task,
-                    recipient=admin,
-                    status='failed',
-                    error_message=f'管理方用户 {admin.username} 未设置手机号'
-                )
-            return False
-        
-        success_count = 0
         context = {
             '任务标题': task.title,
             '任务名称': task.title,
         }
         content = SmsService.format_template_content(template.content, context)
         
-        for admin in admins_with_phone:
-            if SmsService.send_sms(
-                phone=admin.phone,
-                content=content,
-                template_type='task_submitted',
-                task=task,
-                recipient=admin
-            ):
-                success_count += 1
+        # 一次查询取出该角色的所有用户（包括没有手机号的，用于记录）
+        all_users = list(User.objects.filter(role=role, is_active=True))
+        users_with_phone = [user for user in all_users if user.phone and user.phone.strip()]
         
-        return success_count > 0
-    
-    @staticmethod
-    def send_task_reviewed_sms(task: Task) -> bool:
-        """发送任务审核通过短信给所有项目经理"""
-        from apps.accounts.models import User
-        
-        template = SmsService.get_template('task_reviewed')
-        if not template:
-            logger.warning(f'未找到启用的任务审核通过短信模板 (任务ID: {task.id})')
-            # 创建失败记录
-            SmsRecord.objects.create(
-                phone='',
-                content='',
-                template_type='task_reviewed',
-                task=task,
-                status='failed',
-                error_message='未找到启用的任务审核通过短信模板'
+        if not users_with_phone:
+            # 没有可发送的用户，为每个用户创建一条失败记录
+            logger.warning(
+                f'没有找到可发送短信的{role_label}（{role_label}未设置手机号） (任务ID: {task.id})'
             )
-            return False
-        
-        # 获取所有项目经理（包括没有手机号的，用于记录）
-        all_managers = User.objects.filter(role='manager', is_active=True)
-        managers_with_phone = all_managers.filter(phone__isnull=False).exclude(phone='')
-        
-        if managers_with_phone.count() == 0:
-            # 没有可发送的项目经理，创建失败记录
-            error_msg = '没有找到可发送短信的项目经理（项目经理未设置手机号）'
-            logger.warning(f'{error_msg} (任务ID: {task.id})')
-            
-            # 为每个项目经理创建一条失败记录
-            context = {
-                '任务标题': task.title,
-                '任务名称': task.title,
-            }
-            content = SmsService.format_template_content(template.content, context)
-            
-            for manager in all_managers:
-                SmsRecord.objects.create(
-                    phone=manager.phone or '',
+            SmsRecord.objects.bulk_create([
+                SmsRecord(
+                    phone=user.phone or '',
                     content=content,
-                    template_type='task_reviewed',
+                    template_type=template_type,
                     task=task,
-                    recipient=manager,
+                    recipient=user,
                     status='failed',
-                    error_message=f'项目经理 {manager.username} 未设置手机号'
+                    error_message=f'{role_label} {user.username} 未设置手机号'
                 )
+                for user in all_users
+            ])
             return False
         
-        success_count = 0
-        context = {
-            '任务标题': task.title,
-            '任务名称': task.title,
+        result = SmsService.send_batch_sms(users_with_phone, content, template_type, task, send_now=send_now)
+        return (result['success'] if send_now else result['queued']) > 0
+    
+    @staticmethod
+    def send_batch_sms(
+        recipients,
+        content: str,
+        template_type: str,
+        task: Task,
+        send_now: bool = True
+    ) -> Dict[str, int]:
+        """给多个接收人发送同一条任务短信
+        
+        所有接收人的重复发送检查一次完成（SmsDedupService.acquire_many），短信记录批量写入；
+        立即发送时使用有上限的线程池并发调用短信接口。
+        
+        Args:
+            recipients: 接收人列表（需已设置手机号）
+            content: 短信内容
+            template_type: 模板类型
+            task: 关联的任务
+            send_now: 是否立即发送，为False时写入发件箱由 sms_worker 发送
+            
+        Returns:
+            汇总结果：queued（写入的记录数）、skipped（重复跳过数）、success、failed
+        """
+        result = {'queued': 0, 'skipped': 0, 'success': 0, 'failed': 0}
+        recipients = {(user.phone.strip(), user.id): user for user in recipients}
+        if not recipients:
+            return result
+        
+        # 一次占用所有接收人的去重键（不查询短信记录表），查询次数与接收人数无关
+        keys = {
+            (phone, user_id): SmsDedupService.build_key(phone, template_type, task.id, user_id)
+            for phone, user_id in recipients
         }
-        content = SmsService.format_template_content(template.content, context)
+        acquired = SmsDedupService.acquire_many(keys.values())
+        targets = {target: user for target, user in recipients.items() if keys[target] in acquired}
+        result['skipped'] = len(recipients) - len(targets)
+        if result['skipped']:
+            logger.warning(
+                f'[重复发送检查] 任务ID: {task.id}, 模板类型: {template_type}, '
+                f'{result["skipped"]} 个接收人在时间窗口内已发送过相同短信，跳过发送'
+            )
+        if not targets:
+            return result
         
-        for manager in managers_with_phone:
-            if SmsService.send_sms(
-                phone=manager.phone,
+        # 立即发送的记录直接标记为发送中，避免被 sms_worker 重复领取
+        claimed_at = timezone.now() if send_now else None
+        records = [
+            SmsRecord(
+                phone=phone,
                 content=content,
-                template_type='task_reviewed',
+                template_type=template_type,
                 task=task,
-                recipient=manager
-            ):
-                success_count += 1
+                recipient=user,
+                status='sending' if send_now else 'pending',
+                claimed_at=claimed_at
+            )
+            for (phone, _), user in targets.items()
+        ]
+        SmsRecord.objects.bulk_create(records)
+        result['queued'] = len(records)
         
-        return success_count > 0
+        if not send_now:
+            return result
+        
+        # MySQL 的 bulk_create 不回填主键，按领取时间重新取出本批记录
+        records = list(SmsRecord.objects.filter(
+            task=task,
+            template_type=template_type,
+            status='sending',
+            claimed_at=claimed_at,
+            recipient_id__in=[user.id for user in targets.values()]
+        ))
+        sms_config = SmsService.get_config()
+        if connection.in_atomic_block:
+            # 事务内新写入的记录对其他线程的数据库连接不可见，只能在当前线程逐条发送
+            outcomes = [SmsService.deliver(record, sms_config) for record in records]
+        else:
+            max_workers = min(len(records), getattr(settings, 'SMS_WORKER_CONCURRENCY', 4))
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sms-batch') as executor:
+                outcomes = list(executor.map(
+                    lambda record: SmsService._deliver_in_thread(record, sms_config), records
+                ))
+        result['success'] = outcomes.count(True)
+        result['failed'] = len(outcomes) - result['success']
+        return result
+    
+    @staticmethod
+    def _deliver_in_thread(sms_record: SmsRecord, sms_config: Optional[SmsConfig]) -> bool:
+        """在线程池中发送一条记录，结束后关闭该线程的数据库连接"""
+        try:
+            return SmsService.deliver(sms_record, sms_config)
+        except Exception as e:
+            logger.error(f'发送短信失败 (ID: {sms_record.id}): {e}', exc_info=True)
+            return False
+        finally:
+            connection.close()
     
     @staticmethod
     def resend_sms(sms_record) -> bool:
@@ -578,147 +623,15 @@ class SmsService:
             sms_record.save()
             return False
         
-        # 重置状态
-        sms_record.status = 'pending'
+        # 重置状态（直接标记为发送中，避免被 sms_worker 重复领取）
+        sms_record.status = 'sending'
+        sms_record.claimed_at = timezone.now()
         sms_record.error_message = None
         sms_record.response_data = None
         sms_record.sent_at = None
+        sms_record.attempts = 0
+        sms_record.latency_ms = None
+        sms_record.http_status = None
         sms_record.save()
         
-        # 获取短信配置
-        sms_config = SmsService.get_config()
-        if not sms_config:
-            error_msg = '未配置短信接口或配置已禁用'
-            logger.warning(error_msg)
-            sms_record.status = 'failed'
-            sms_record.error_message = error_msg
-            sms_record.save()
-            return False
-        
-        try:
-            # 构建请求参数（POST请求，但参数通过URL查询字符串传递）
-            api_params = sms_config.get_api_params().copy()
-            phone = sms_record.phone.strip()
-            content = sms_record.content
-            
-            # 构建查询参数字典
-            query_params = {}
-            for key, value in api_params.items():
-                if isinstance(value, str):
-                    # 替换占位符
-                    formatted_value = value.replace('{phone}', phone)
-                    formatted_value = formatted_value.replace('{content}', content)
-                    query_params[key] = formatted_value
-                else:
-                    query_params[key] = str(value)
-            
-            # 如果没有配置参数，使用默认参数名和固定值
-            if not query_params:
-                query_params = {
-                    'phoneNum': phone,
-                    'mesConent': content,
-                    'regionCode': '371000000000',
-                    'source': 'oms'
-                }
-            
-            # 构建完整的URL（POST请求，但参数在URL查询字符串中）
-            base_url = sms_config.api_url.rstrip('?&')
-            # 检查URL中是否已有查询参数
-            separator = '&' if '?' in base_url else '?'
-            full_url = f"{base_url}{separator}{urlencode(query_params)}"
-            
-            # 记录请求信息到日志
-            logger.info(
-                f'[短信重发请求] 记录ID: {sms_record.id}, 手机号: {phone}, '
-                f'请求方式: POST, '
-                f'完整URL: {full_url}, '
-                f'查询参数: {json.dumps(query_params, ensure_ascii=False)}'
-            )
-            
-            # 发送HTTP POST请求（参数在URL中，不是JSON body）
-            response = requests.post(
-                full_url,
-                timeout=10,
-                headers={'Content-Type': 'application/json'}
-            )
-            
-            # 记录响应
-            response_data = None
-            try:
-                response_data = response.json()
-                sms_record.response_data = json.dumps(response_data, ensure_ascii=False)
-            except:
-                response_text = response.text[:1000]  # 限制长度
-                sms_record.response_data = response_text
-            
-            # 记录响应信息到日志
-            logger.info(
-                f'[短信重发响应] 记录ID: {sms_record.id}, 手机号: {phone}, '
-                f'HTTP状态码: {response.status_code}, '
-                f'响应内容: {sms_record.response_data}'
-            )
-            
-            # 判断是否成功
-            # 1. HTTP状态码必须是200
-            if response.status_code != 200:
-                error_msg = f'短信接口返回错误HTTP状态码: {response.status_code}'
-                sms_record.status = 'failed'
-                sms_record.error_message = error_msg
-                sms_record.save()
-                logger.error(f'[短信重发失败] 记录ID: {sms_record.id}, 手机号: {phone}, 原因: {error_msg}')
-                return False
-            
-            # 2. 检查响应体内容
-            if response_data:
-                # 检查 code 字段，正常应该是 "200"（根据图片中的响应格式）
-                code = response_data.get('code', '')
-                
-                if code == '200':
-                    # 发送成功
-                    sms_record.status = 'success'
-                    sms_record.sent_at = timezone.now()
-                    sms_record.save()
-                    logger.info(f'[短信重发成功] 记录ID: {sms_record.id}, 手机号: {phone}, code: {code}')
-                    return True
-                else:
-                    # 发送失败，记录错误信息
-                    error_msg = f'短信接口返回失败: code={code}'
-                    sms_record.status = 'failed'
-                    sms_record.error_message = error_msg
-                    sms_record.save()
-                    logger.error(f'[短信重发失败] 记录ID: {sms_record.id}, 手机号: {phone}, 原因: {error_msg}')
-                    return False
-            else:
-                # 响应体不是JSON格式，尝试从文本中判断
-                # 如果HTTP状态码是200但没有JSON响应，认为可能成功，但记录警告
-                sms_record.status = 'success'
-                sms_record.sent_at = timezone.now()
-                sms_record.save()
-                logger.warning(
-                    f'[短信重发警告] 记录ID: {sms_record.id}, 手机号: {phone}, '
-                    f'HTTP状态码200但响应体不是JSON格式，已标记为成功，请人工检查'
-                )
-                return True
-                
-        except requests.exceptions.Timeout:
-            error_msg = '短信接口请求超时'
-            sms_record.status = 'failed'
-            sms_record.error_message = error_msg
-            sms_record.save()
-            logger.error(f'短信重发失败: {sms_record.phone} (ID: {sms_record.id}), {error_msg}')
-            return False
-        except requests.exceptions.RequestException as e:
-            error_msg = f'短信接口请求异常: {str(e)}'
-            sms_record.status = 'failed'
-            sms_record.error_message = error_msg
-            sms_record.save()
-            logger.error(f'短信重发失败: {sms_record.phone} (ID: {sms_record.id}), {error_msg}')
-            return False
-        except Exception as e:
-            error_msg = f'重发短信时发生未知错误: {str(e)}'
-            sms_record.status = 'failed'
-            sms_record.error_message = error_msg
-            sms_record.save()
-            logger.error(f'短信重发失败: {sms_record.phone} (ID: {sms_record.id}), {error_msg}')
-            return False
-
+        return SmsService.deliver(sms_record, log_prefix='短信重发')
@@ -0,0 +1,64 @@
+"""
+短信模板编译和渲染
+
+模板（SmsTemplate.content 或 SmsConfig.api_params 中的参数值）只解析一次，
+编译为“文本片段 + 占位符位置”的列表，渲染时一次拼接完成，不再对每个变量做一遍字符串替换。
+未知的占位符按原样输出，并可在后台保存模板时提示。
+"""
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Tuple
+
+PLACEHOLDER_PATTERN = re.compile(r'\{([^{}]+)\}')
+
+# 任务短信模板支持的占位符（与 SmsService 构建的上下文一致）
+TEMPLATE_PLACEHOLDERS = ('任务标题', '任务名称', '审核不通过的理由', '原因为', '修改意见')
+
+# 短信接口参数模板支持的占位符
+API_PARAM_PLACEHOLDERS = ('phone', 'content')
+
+
+class CompiledTemplate:
+    """编译后的模板
+
+    parts 为模板按占位符切分后的片段（占位符位置保存原文），
+    slots 记录每个占位符在 parts 中的位置，渲染时只填充这些位置后拼接。
+    """
+    __slots__ = ('source', 'parts', 'slots', 'placeholders')
+
+    def __init__(self, source: str):
+        self.source = source
+        self.parts: List[str] = []
+        self.slots: List[Tuple[int, str]] = []
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(source):
+            if match.start() > position:
+                self.parts.append(source[position:match.start()])
+            self.slots.append((len(self.parts), match.group(1)))
+            self.parts.append(match.group(0))
+            position = match.end()
+        if position < len(source):
+            self.parts.append(source[position:])
+        self.placeholders = tuple(dict.fromkeys(name for _, name in self.slots))
+
+    def render(self, context: Dict[str, Any]) -> str:
+        """渲染模板，上下文中没有的占位符按原样输出，值为空时输出空字符串"""
+        if not self.slots:
+            return self.source
+        parts = self.parts.copy()
+        for index, name in self.slots:
+            if name in context:
+                value = context[name]
+                parts[index] = str(value) if value else ''
+        return ''.join(parts)
+
+    def unknown_placeholders(self, known: Iterable[str]) -> List[str]:
+        """返回不在 known 中的占位符"""
+        known = set(known)
+        return [name for name in self.placeholders if name not in known]
+
+
+@lru_cache(maxsize=256)
+def compile_template(source: str) -> CompiledTemplate:
+    """编译模板（按模板内容缓存编译结果）"""
+    return CompiledTemplate(source or '')
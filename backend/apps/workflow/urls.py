@@ -1,12 +1,15 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import WorkflowLogViewSet, NotificationViewSet
+from .views import WorkflowLogViewSet, NotificationViewSet, notification_stream, notification_poll
 
 router = DefaultRouter()
 router.register(r'logs', WorkflowLogViewSet, basename='workflow-log')
 router.register(r'notifications', NotificationViewSet, basename='notification')
 
 urlpatterns = [
+    # 推送接口需注册在路由之前，避免被通知详情路由匹配
+    path('notifications/stream/', notification_stream, name='notification-stream'),
+    path('notifications/poll/', notification_poll, name='notification-poll'),
     path('', include(router.urls)),
 ]
 
@@ -1,15 +1,28 @@
+import asyncio
+import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from .models import WorkflowLog, Notification
 from .serializers import WorkflowLogSerializer, NotificationSerializer
+from .notification_stream import get_broker, format_sse, issue_stream_ticket, consume_stream_ticket
+from apps.tasks.pagination import KeysetPageNumberPagination
 
 
 class WorkflowLogViewSet(viewsets.ReadOnlyModelViewSet):
     """工作流日志视图集"""
     serializer_class = WorkflowLogSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPageNumberPagination
     
     def get_queryset(self):
         task_id = self.request.query_params.get('task_id')
@@ -22,16 +35,36 @@ class NotificationViewSet(viewsets.ModelViewSet):
     """通知视图集"""
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPageNumberPagination
     
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user).select_related('task')
+        queryset = Notification.objects.filter(user=self.request.user)
+        
+        # 已读状态过滤
+        is_read = self.request.query_params.get('is_read')
+        if is_read in ('true', '1'):
+            queryset = queryset.filter(is_read=True)
+        elif is_read in ('false', '0'):
+            queryset = queryset.filter(is_read=False)
+        
+        # 只加载通知中显示的任务字段
+        return queryset.select_related('task').only(
+            'id', 'user_id', 'notification_type', 'title', 'content', 'is_read', 'created_at',
+            'task__id', 'task__title', 'task__status'
+        )
+    
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        """获取未读通知数量"""
+        count = Notification.objects.filter(user=request.user, is_read=False).count()
+        return Response({'unread_count': count})
     
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
         """标记通知已读"""
         notification = self.get_object()
         notification.is_read = True
-        notification.save()
+        notification.save(update_fields=['is_read'])
         return Response({'message': '已标记为已读'})
     
     @action(detail=False, methods=['post'])
@@ -39,4 +72,155 @@ class NotificationViewSet(viewsets.ModelViewSet):
         """标记所有通知已读"""
         Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
         return Response({'message': '已标记所有通知为已读'})
+    
+    @action(detail=False, methods=['post'])
+    def stream_ticket(self, request):
+        """获取通知推送的连接票据（EventSource 不能携带 Authorization 头，用票据代替访问令牌）"""
+        return Response({
+            'ticket': issue_stream_ticket(request.user),
+            'expires_in': settings.NOTIFICATION_STREAM_TICKET_TTL,
+        })
+
+
+
+async def _authenticate_stream(request):
+    """认证推送请求：Authorization 头中的访问令牌，或 ticket 参数中的一次性连接票据
+
+    不接受URL中的访问令牌，避免令牌写入访问日志。
+    """
+    header = request.headers.get('Authorization', '')
+    if not header.startswith('Bearer '):
+        user_id = await consume_stream_ticket(request.GET.get('ticket'))
+        if user_id is None:
+            return None
+        user = await get_user_model().objects.filter(pk=user_id).afirst()
+        return user if user is not None and user.is_active else None
+    raw_token = header[len('Bearer '):]
+    
+    authentication = JWTAuthentication()
+    try:
+        validated_token = authentication.get_validated_token(raw_token)
+        user = await sync_to_async(authentication.get_user)(validated_token)
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+    return user if user.is_active else None
+
+
+def _get_notifications_since(user, since_id, limit=50):
+    """获取指定ID之后的通知（用于断线重连后补发）"""
+    notifications = Notification.objects.filter(user=user, id__gt=since_id).select_related('task').order_by('id')[:limit]
+    return NotificationSerializer(notifications, many=True).data
+
+
+def _requires_asgi(request):
+    """未以 ASGI 方式部署时返回 503 响应
+    
+    WSGI 下异步视图返回的流式响应会被完整缓冲后才发送，并在整个连接期间占用一个 worker，
+    此时直接拒绝，客户端改用普通轮询。
+    """
+    if isinstance(request, ASGIRequest):
+        return None
+    return JsonResponse({'error': '通知推送需要以ASGI方式部署'}, status=503,
+                        json_dumps_params={'ensure_ascii': False})
+
 
+def _parse_since(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+async def notification_stream(request):
+    """通知推送（Server-Sent Events）
+    
+    事件ID为通知ID，断线重连时浏览器通过 Last-Event-ID 头（或 since 参数）补发错过的通知。
+    连接在 NOTIFICATION_STREAM_TIMEOUT 秒后由服务端关闭，客户端获取新票据后重新连接。
+    """
+    unavailable = _requires_asgi(request)
+    if unavailable is not None:
+        return unavailable
+    user = await _authenticate_stream(request)
+    if user is None:
+        return JsonResponse({'error': '身份认证信息未提供或已过期'}, status=401,
+                            json_dumps_params={'ensure_ascii': False})
+    
+    since_id = _parse_since(request.headers.get('Last-Event-ID') or request.GET.get('since'))
+    heartbeat = getattr(settings, 'NOTIFICATION_STREAM_HEARTBEAT', 15)
+    timeout = getattr(settings, 'NOTIFICATION_STREAM_TIMEOUT', 300)
+    
+    async def events():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        last_id = since_id or 0
+        yield 'retry: 3000\n\n'
+        
+        listener = get_broker().listen(user.id, heartbeat)
+        try:
+            # 订阅成功后再补发错过的通知，避免订阅前创建的通知丢失
+            await listener.__anext__()
+            if since_id is not None:
+                for item in await sync_to_async(_get_notifications_since)(user, since_id):
+                    last_id = max(last_id, item['id'])
+                    yield format_sse(json.dumps(item, ensure_ascii=False, default=str), event_id=item['id'])
+            
+            async for message in listener:
+                if message is None:
+                    yield format_sse(None)
+                else:
+                    notification_id = json.loads(message).get('id')
+                    if notification_id is not None and notification_id <= last_id:
+                        continue
+                    last_id = notification_id or last_id
+                    yield format_sse(message, event_id=notification_id)
+                if loop.time() >= deadline:
+                    break
+        finally:
+            await listener.aclose()
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # 关闭Nginx对该响应的缓冲
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def notification_poll(request):
+    """通知长轮询
+    
+    返回 since 之后的新通知；没有新通知时最多等待 timeout 秒。
+    不带 since 参数时立即返回当前最新的通知ID，作为后续轮询的起点。
+    """
+    unavailable = _requires_asgi(request)
+    if unavailable is not None:
+        return unavailable
+    user = await _authenticate_stream(request)
+    if user is None:
+        return JsonResponse({'error': '身份认证信息未提供或已过期'}, status=401,
+                            json_dumps_params={'ensure_ascii': False})
+    
+    since_id = _parse_since(request.GET.get('since'))
+    if since_id is None:
+        latest = await sync_to_async(
+            lambda: Notification.objects.filter(user=user).order_by('-id').values_list('id', flat=True).first()
+        )()
+        return JsonResponse({'results': [], 'since': latest or 0})
+    
+    max_timeout = getattr(settings, 'NOTIFICATION_STREAM_HEARTBEAT', 15) * 2
+    wait = min(_parse_since(request.GET.get('timeout')) or max_timeout, max_timeout)
+    
+    results = []
+    listener = get_broker().listen(user.id, wait)
+    try:
+        await listener.__anext__()
+        results = list(await sync_to_async(_get_notifications_since)(user, since_id))
+        if not results:
+            message = await listener.__anext__()
+            if message is not None:
+                results = [json.loads(message)]
+    finally:
+        await listener.aclose()
+    
+    next_since = max([since_id] + [item['id'] for item in results])
+    return JsonResponse({'results': results, 'since': next_since},
+                        json_dumps_params={'ensure_ascii': False, 'default': str})
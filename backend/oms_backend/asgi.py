@@ -1,5 +1,9 @@
 """
 ASGI config for oms_backend project.
+
+通知推送接口（/api/workflow/notifications/stream/、/api/workflow/notifications/poll/）
+是异步视图，需要以ASGI方式部署才能在不占用工作线程的情况下保持长连接，例如：
+    gunicorn oms_backend.asgi:application -k uvicorn.workers.UvicornWorker
 """
 import os
 
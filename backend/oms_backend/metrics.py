@@ -0,0 +1,398 @@
+"""
+Prometheus 格式的运行指标
+
+各进程（gunicorn worker、sms_worker）在内存中累计计数器和直方图，记录指标不访问数据库和 Redis；
+后台线程每隔 METRICS_FLUSH_INTERVAL 秒把本进程的累计值写入 Redis（oms:metrics:workers 哈希），
+/metrics 接口汇总所有进程的值后输出。未使用 Redis 缓存时只输出当前进程的指标。
+已退出的进程（超过 METRICS_WORKER_TTL 秒未更新）的计数器和直方图累加到 oms:metrics:retired 后删除，
+worker 重启后汇总值不会减小（否则 Prometheus 会视为计数器重置，rate()、increase() 出现虚假的尖峰）。
+短信待发送数量等状态类指标在抓取时查询数据库。
+"""
+import atexit
+import hmac
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, Http404
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in labels]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric:
+    """指标基类：按标签值保存累计值"""
+    type = ''
+
+    def __init__(self, registry, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def snapshot(self) -> Dict[str, object]:
+        """当前累计值，标签值序列化为JSON字符串作为键"""
+        with self._lock:
+            return {json.dumps(key, ensure_ascii=False): self._copy(value) for key, value in self._values.items()}
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+    def merge(self, target: Dict[str, object], values: Dict[str, object]):
+        """将一个进程的累计值合并到 target"""
+        raise NotImplementedError
+
+    def render(self, merged: Dict[str, object]) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """计数器"""
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        self.registry.check_process()
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def merge(self, target, values):
+        for key, value in values.items():
+            target[key] = target.get(key, 0) + value
+
+    def render(self, merged):
+        return [
+            f'{self.name}{_format_labels(zip(self.labelnames, json.loads(key)))} {_format_value(value)}'
+            for key, value in sorted(merged.items())
+        ]
+
+
+class Histogram(Metric):
+    """直方图：值为 [各区间计数..., 总和, 次数]"""
+    type = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        self.registry.check_process()
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # 最后一个区间为 +Inf
+                entry = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            entry[index] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    @staticmethod
+    def _copy(value):
+        return list(value)
+
+    def merge(self, target, values):
+        for key, value in values.items():
+            if key not in target:
+                target[key] = list(value)
+            elif len(target[key]) == len(value):
+                target[key] = [a + b for a, b in zip(target[key], value)]
+
+    def render(self, merged):
+        lines = []
+        for key, value in sorted(merged.items()):
+            labels = list(zip(self.labelnames, json.loads(key)))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), value[:-2]):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_format_labels(labels + [("le", _format_value(bound))])} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {_format_value(value[-2])}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {value[-1]}')
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表（进程内单例 registry）"""
+
+    REDIS_KEY = 'oms:metrics:workers'
+    # 已退出进程的累计值：字段为 指标名\t标签JSON（直方图再加 \t序号），值通过 HINCRBYFLOAT 累加
+    RETIRED_KEY = 'oms:metrics:retired'
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        # 抓取时调用的状态类指标：返回 [(名称, 说明, [(标签字典, 值)])]
+        self._collectors: List[Callable[[], List[Tuple[str, str, List[Tuple[Dict[str, str], float]]]]]] = []
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector):
+        self._collectors.append(collector)
+        return collector
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    @property
+    def worker_id(self) -> str:
+        return f'{socket.gethostname()}:{os.getpid()}'
+
+    def check_process(self):
+        """进程第一次记录指标时启动写入 Redis 的后台线程
+
+        gunicorn 预加载应用后 fork 出的 worker 会继承父进程的累计值，进程号变化时先清空。
+        """
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            if self._pid is not None:
+                for metric in self._metrics.values():
+                    metric.reset()
+            self._pid = pid
+            if _get_redis() is not None:
+                threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+                atexit.register(self.flush)
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def flush(self):
+        """把本进程的累计值写入 Redis"""
+        redis = _get_redis()
+        if redis is None:
+            return
+        try:
+            redis.hset(self.REDIS_KEY, self.worker_id, json.dumps({
+                'updated_at': time.time(),
+                'metrics': self.snapshot(),
+            }, ensure_ascii=False))
+        except Exception as e:
+            logger.warning(f'写入运行指标失败: {e}')
+
+    def _flush_loop(self):
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 10)
+        pid = os.getpid()
+        while os.getpid() == pid:
+            time.sleep(interval)
+            self.flush()
+
+    def collect_snapshots(self) -> List[Dict[str, Dict[str, object]]]:
+        """所有进程的累计值（本进程使用内存中的最新值）和已退出进程的累计值
+
+        长时间未更新的进程的累计值累加到已退出进程的累计值后删除。
+        """
+        snapshots = [self.snapshot()]
+        redis = _get_redis()
+        if redis is None:
+            return snapshots
+        try:
+            stored = redis.hgetall(self.REDIS_KEY)
+        except Exception as e:
+            logger.warning(f'读取运行指标失败，只输出当前进程的指标: {e}')
+            return snapshots
+
+        expire_before = time.time() - getattr(settings, 'METRICS_WORKER_TTL', 3600)
+        current = self.worker_id
+        for field, raw in stored.items():
+            field = field.decode() if isinstance(field, bytes) else field
+            if field == current:
+                continue
+            try:
+                data = json.loads(raw)
+            except ValueError:
+                continue
+            if data.get('updated_at', 0) < expire_before:
+                self._retire(redis, field, data.get('metrics', {}))
+                continue
+            snapshots.append(data.get('metrics', {}))
+        snapshots.append(self._retired_snapshot(redis))
+        return snapshots
+
+    def _retire(self, redis, field, metrics):
+        """把已退出进程的累计值累加到 RETIRED_KEY 后删除（只有删除成功的抓取请求累加，不会重复计入）"""
+        if not redis.hdel(self.REDIS_KEY, field):
+            return
+        pipe = redis.pipeline()
+        for name, values in metrics.items():
+            for key, value in values.items():
+                if isinstance(value, list):
+                    for index, item in enumerate(value):
+                        pipe.hincrbyfloat(self.RETIRED_KEY, f'{name}\t{key}\t{index}', item)
+                else:
+                    pipe.hincrbyfloat(self.RETIRED_KEY, f'{name}\t{key}', value)
+        pipe.execute()
+
+    def _retired_snapshot(self, redis) -> Dict[str, Dict[str, object]]:
+        """已退出进程的累计值，格式与 snapshot() 相同"""
+        snapshot: Dict[str, Dict[str, object]] = {}
+        for field, raw in redis.hgetall(self.RETIRED_KEY).items():
+            field = field.decode() if isinstance(field, bytes) else field
+            value = float(raw)
+            if value.is_integer():
+                value = int(value)
+            name, key, *index = field.split('\t')
+            values = snapshot.setdefault(name, {})
+            if not index:
+                values[key] = value
+                continue
+            entry = values.setdefault(key, [])
+            position = int(index[0])
+            entry.extend([0] * (position + 1 - len(entry)))
+            entry[position] = value
+        return snapshot
+
+    def render(self) -> str:
+        """输出 Prometheus 文本格式"""
+        merged: Dict[str, Dict[str, object]] = {name: {} for name in self._metrics}
+        for snapshot in self.collect_snapshots():
+            for name, values in snapshot.items():
+                if name in self._metrics:
+                    self._metrics[name].merge(merged[name], values)
+
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            lines.extend(metric.render(merged[name]))
+        for collector in self._collectors:
+            try:
+                gauges = collector()
+            except Exception as e:
+                logger.warning(f'采集运行指标失败: {e}')
+                continue
+            for name, documentation, samples in gauges:
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} gauge')
+                for labels, value in samples:
+                    lines.append(f'{name}{_format_labels(sorted(labels.items()))} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _get_redis():
+    """获取 Redis 连接，缓存后端不是 django-redis 时返回None"""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        return None
+
+
+registry = MetricsRegistry()
+
+WORKFLOW_TRANSITIONS = registry.counter(
+    'oms_workflow_transitions_total', '工作流操作次数（按操作和目标状态）', ('action', 'to_status')
+)
+TASK_STATUS_DURATION = registry.histogram(
+    'oms_task_status_duration_seconds', '任务离开某状态时在该状态停留的时间', ('status',),
+    buckets=(60, 300, 900, 3600, 4 * 3600, 8 * 3600, 24 * 3600, 3 * 86400, 7 * 86400, 30 * 86400)
+)
+SMS_SEND_DURATION = registry.histogram(
+    'oms_sms_send_duration_seconds', '短信接口调用耗时（按发送结果）', ('outcome',),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+HTTP_REQUEST_DURATION = registry.histogram(
+    'oms_http_request_duration_seconds', '接口请求耗时（按视图、操作和状态码类别）',
+    ('view', 'action', 'method', 'status')
+)
+
+
+def record_workflow_logs(logs, entered_at=None):
+    """记录工作流操作次数；entered_at 为任务进入原状态的时间时，同时记录在原状态停留的时间"""
+    for log in logs:
+        WORKFLOW_TRANSITIONS.inc(action=log.action, to_status=log.to_status)
+        if entered_at is not None and log.from_status and log.from_status != log.to_status:
+            TASK_STATUS_DURATION.observe(max((log.created_at - entered_at).total_seconds(), 0),
+                                         status=log.from_status)
+
+
+@registry.register_collector
+def collect_sms_backlog():
+    """短信发件箱积压：待发送、发送中的数量和最早的待发送记录等待时间"""
+    from django.db.models import Count, Min
+    from django.utils import timezone
+    from apps.workflow.models import SmsRecord
+
+    rows = {
+        row['status']: row
+        for row in SmsRecord.objects.filter(status__in=('pending', 'sending'))
+        .order_by().values('status').annotate(count=Count('id'), oldest=Min('created_at'))
+    }
+    oldest = rows.get('pending', {}).get('oldest')
+    return [
+        ('oms_sms_backlog', '短信发件箱中的记录数（按状态）',
+         [({'status': status}, rows.get(status, {}).get('count', 0)) for status in ('pending', 'sending')]),
+        ('oms_sms_oldest_pending_age_seconds', '最早的待发送短信已等待的时间',
+         [({}, (timezone.now() - oldest).total_seconds() if oldest else 0)]),
+    ]
+
+
+class RequestMetricsMixin:
+    """记录视图集各操作请求耗时的 Mixin"""
+
+    def dispatch(self, request, *args, **kwargs):
+        start = time.perf_counter()
+        response = super().dispatch(request, *args, **kwargs)
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - start,
+            view=self.__class__.__name__,
+            action=getattr(self, 'action', None) or '',
+            method=request.method,
+            status=f'{response.status_code // 100}xx',
+        )
+        return response
+
+
+def metrics_view(request):
+    """Prometheus 抓取接口
+
+    配置了 METRICS_TOKEN 时需要 Authorization: Bearer <METRICS_TOKEN>；
+    未配置时只在 DEBUG 模式下开放。
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        if not settings.DEBUG:
+            raise Http404
+    elif not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
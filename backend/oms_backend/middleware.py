@@ -0,0 +1,220 @@
+"""
+请求性能分析中间件
+
+开启 REQUEST_PROFILING_ENABLED 后，按 REQUEST_PROFILING_SAMPLE_RATE 抽样统计请求的
+SQL查询次数、数据库耗时、序列化耗时、渲染耗时和响应大小：
+- 序列化：视图中读取 serializer.data 的耗时（包括其中按关联字段延迟执行的查询，N+1 查询通常发生在这里），
+  通过包装 DRF 的 BaseSerializer.data 统计，嵌套的序列化器只统计最外层
+- 渲染：视图返回后 DRF 渲染器把数据编码为 JSON 的耗时
+- 通过 Server-Timing 响应头返回（浏览器开发者工具的 Timing 面板可以直接查看）
+- 超过慢请求阈值时，以 JSON 格式记录到 oms.performance 日志，
+  包含重复次数最多的SQL（参数替换为占位符后的指纹），便于定位 N+1 查询
+
+未开启时中间件不会加载，也不会包装 serializer.data；未被抽中的请求只多一次随机数判断。
+"""
+import contextvars
+import json
+import logging
+import random
+import re
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('oms.performance')
+
+# SQL指纹：去掉字面量和 IN 列表长度的差异
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def sql_fingerprint(sql: str) -> str:
+    """将SQL归一化为指纹，参数不同但结构相同的查询得到相同的指纹"""
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _PLACEHOLDER_LIST.sub('(?...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class QueryProfiler:
+    """记录请求执行的SQL查询次数和耗时（用作 connection.execute_wrapper）"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        # SQL（未归一化）-> [次数, 耗时]，记录慢请求日志时再计算指纹
+        self.statements = defaultdict(lambda: [0, 0.0])
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            stats = self.statements[sql]
+            stats[0] += 1
+            stats[1] += elapsed
+
+    def top_fingerprints(self, limit: int):
+        """重复次数最多的SQL指纹"""
+        grouped = defaultdict(lambda: [0, 0.0])
+        for sql, (count, duration) in self.statements.items():
+            stats = grouped[sql_fingerprint(sql)]
+            stats[0] += count
+            stats[1] += duration
+        ranked = sorted(grouped.items(), key=lambda item: (item[1][0], item[1][1]), reverse=True)
+        return [
+            {'sql': fingerprint[:500], 'count': count, 'duration_ms': round(duration * 1000, 2)}
+            for fingerprint, (count, duration) in ranked[:limit]
+        ]
+
+
+class RequestProfile:
+    """一个被抽中的请求的各阶段耗时"""
+
+    def __init__(self):
+        self.queries = QueryProfiler()
+        # 序列化耗时，以及其中执行的查询次数和数据库耗时
+        self.serialize = 0.0
+        self.serialize_queries = 0
+        self.serialize_db = 0.0
+        self.render_start = None
+        self.render_end = None
+        self._depth = 0
+
+    @property
+    def render(self) -> float:
+        if self.render_start is None or self.render_end is None:
+            return 0.0
+        return self.render_end - self.render_start
+
+    @contextmanager
+    def serializing(self):
+        """统计一次 serializer.data（嵌套调用只统计最外层）"""
+        self._depth += 1
+        start, count, duration = time.perf_counter(), self.queries.count, self.queries.duration
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                self.serialize += time.perf_counter() - start
+                self.serialize_queries += self.queries.count - count
+                self.serialize_db += self.queries.duration - duration
+
+
+# 当前请求的性能分析（未被抽中时为None）
+_current_profile = contextvars.ContextVar('request_profile', default=None)
+_original_serializer_data = None
+
+
+def install_serializer_timing():
+    """包装 BaseSerializer.data，被抽中的请求统计序列化耗时（Serializer、ListSerializer 的 data 都经过这里）"""
+    global _original_serializer_data
+    if _original_serializer_data is not None:
+        return
+    from rest_framework.serializers import BaseSerializer
+    _original_serializer_data = original = BaseSerializer.data
+
+    def data(self):
+        profile = _current_profile.get()
+        if profile is None:
+            return original.fget(self)
+        with profile.serializing():
+            return original.fget(self)
+
+    BaseSerializer.data = property(data, doc=original.__doc__)
+
+
+class RequestProfilingMiddleware:
+    """按抽样统计请求的数据库查询、序列化和渲染耗时、响应大小"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'REQUEST_PROFILING_SAMPLE_RATE', 0.1)
+        self.slow_ms = getattr(settings, 'REQUEST_PROFILING_SLOW_MS', 500)
+        self.slow_queries = getattr(settings, 'REQUEST_PROFILING_SLOW_QUERIES', 50)
+        self.top_sql = getattr(settings, 'REQUEST_PROFILING_TOP_SQL', 5)
+        self.server_timing = getattr(settings, 'REQUEST_PROFILING_SERVER_TIMING', True)
+        install_serializer_timing()
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        profiler = profile.queries
+        request._profiling = profile
+        token = _current_profile.set(profile)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profiler))
+                response = self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+        total = time.perf_counter() - start
+
+        if response.streaming:
+            size = int(response['Content-Length']) if response.has_header('Content-Length') else None
+        else:
+            size = len(response.content)
+
+        if self.server_timing:
+            # 序列化中的查询同时计入 db 和 serialize，app 为除去数据库、序列化和渲染的其余耗时
+            app = total - profiler.duration - (profile.serialize - profile.serialize_db) - profile.render
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={profiler.duration * 1000:.1f};desc="{profiler.count} queries"',
+                f'serialize;dur={profile.serialize * 1000:.1f};desc="{profile.serialize_queries} queries"',
+                f'render;dur={profile.render * 1000:.1f}',
+                f'app;dur={max(app, 0) * 1000:.1f}',
+                f'total;dur={total * 1000:.1f}',
+            ])
+
+        if total * 1000 >= self.slow_ms or profiler.count >= self.slow_queries:
+            self.log_slow_request(request, response, profile, total, size)
+        return response
+
+    def process_template_response(self, request, response):
+        """DRF 的 Response 在视图返回后才渲染为 JSON，记录渲染的开始和结束时间"""
+        profile = getattr(request, '_profiling', None)
+        if profile is not None:
+            profile.render_start = time.perf_counter()
+
+            def finished(rendered):
+                profile.render_end = time.perf_counter()
+                return rendered
+            response.add_post_render_callback(finished)
+        return response
+
+    def log_slow_request(self, request, response, profile, total, size):
+        profiler = profile.queries
+        match = getattr(request, 'resolver_match', None)
+        user = getattr(request, 'user', None)
+        entry = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'user_id': user.pk if user is not None and user.is_authenticated else None,
+            'total_ms': round(total * 1000, 2),
+            'db_ms': round(profiler.duration * 1000, 2),
+            'db_queries': profiler.count,
+            'serialize_ms': round(profile.serialize * 1000, 2),
+            'serialize_queries': profile.serialize_queries,
+            'render_ms': round(profile.render * 1000, 2),
+            'response_bytes': size,
+            'top_sql': profiler.top_fingerprints(self.top_sql),
+        }
+        logger.warning(f'慢请求 {json.dumps(entry, ensure_ascii=False)}', extra={'profile': entry})
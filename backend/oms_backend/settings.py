@@ -38,6 +38,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # 请求性能分析（REQUEST_PROFILING_ENABLED 开启后生效），放在最外层以统计完整的请求耗时
+    'oms_backend.middleware.RequestProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -94,6 +96,66 @@ CACHES = {
     }
 }
 
+# 通知推送（SSE/长轮询）使用的Redis地址，默认与缓存使用同一个Redis；置空时使用进程内分发（仅限单进程）
+NOTIFICATION_STREAM_REDIS_URL = config('NOTIFICATION_STREAM_REDIS_URL', default=CACHES['default']['LOCATION'])
+# 推送连接的心跳间隔和最长保持时间（秒），超时后客户端自动重连
+NOTIFICATION_STREAM_HEARTBEAT = config('NOTIFICATION_STREAM_HEARTBEAT', default=15, cast=int)
+NOTIFICATION_STREAM_TIMEOUT = config('NOTIFICATION_STREAM_TIMEOUT', default=300, cast=int)
+# 推送连接票据的有效期（秒），票据只能使用一次
+NOTIFICATION_STREAM_TICKET_TTL = config('NOTIFICATION_STREAM_TICKET_TTL', default=30, cast=int)
+
+# 短信接口客户端：连接池大小（应不小于 SMS_WORKER_CONCURRENCY）、连接/读取超时（秒），
+# 超时、连接失败或5xx时的重试次数和退避基数（秒，第n次重试等待 退避基数*2^(n-1)）
+SMS_GATEWAY_POOL_SIZE = config('SMS_GATEWAY_POOL_SIZE', default=10, cast=int)
+SMS_GATEWAY_CONNECT_TIMEOUT = config('SMS_GATEWAY_CONNECT_TIMEOUT', default=3, cast=float)
+SMS_GATEWAY_READ_TIMEOUT = config('SMS_GATEWAY_READ_TIMEOUT', default=10, cast=float)
+SMS_GATEWAY_MAX_RETRIES = config('SMS_GATEWAY_MAX_RETRIES', default=2, cast=int)
+SMS_GATEWAY_RETRY_BACKOFF = config('SMS_GATEWAY_RETRY_BACKOFF', default=0.5, cast=float)
+
+# 短信配置和模板的缓存时间（秒）：进程内缓存（其他进程修改配置后最多延迟这么久生效）和Redis缓存
+SMS_SETTINGS_LOCAL_CACHE_TTL = config('SMS_SETTINGS_LOCAL_CACHE_TTL', default=30, cast=int)
+SMS_SETTINGS_CACHE_TIMEOUT = config('SMS_SETTINGS_CACHE_TIMEOUT', default=3600, cast=int)
+
+# 短信防重复发送的时间窗口（秒）：窗口内相同的短信（手机号、模板、任务、接收人）只发送一次
+SMS_DEDUP_WINDOW_SECONDS = config('SMS_DEDUP_WINDOW_SECONDS', default=300, cast=int)
+
+# 短信发送服务（python manage.py sms_worker）：并发数、每次领取条数、空闲轮询间隔（秒），
+# 以及发送中记录超过多少秒未完成时重新发送
+SMS_WORKER_CONCURRENCY = config('SMS_WORKER_CONCURRENCY', default=4, cast=int)
+SMS_WORKER_BATCH_SIZE = config('SMS_WORKER_BATCH_SIZE', default=20, cast=int)
+SMS_WORKER_POLL_INTERVAL = config('SMS_WORKER_POLL_INTERVAL', default=2, cast=float)
+SMS_WORKER_STALE_SECONDS = config('SMS_WORKER_STALE_SECONDS', default=300, cast=int)
+# 每秒最多发送的短信条数（0表示不限制），后台批量重发大量短信时保护短信接口
+SMS_WORKER_RATE_LIMIT = config('SMS_WORKER_RATE_LIMIT', default=10, cast=float)
+
+# 任务统计缓存过期时间（秒），工作流操作后会主动失效
+TASK_STATS_CACHE_TIMEOUT = config('TASK_STATS_CACHE_TIMEOUT', default=300, cast=int)
+
+# 任务全文搜索后端：auto（MySQL使用FULLTEXT ngram索引，其他数据库使用进程内倒排索引）、
+# mysql、inverted_index，或自定义后端类的完整路径
+TASK_SEARCH_BACKEND = config('TASK_SEARCH_BACKEND', default='auto')
+TASK_SEARCH_MAX_RESULTS = config('TASK_SEARCH_MAX_RESULTS', default=1000, cast=int)
+
+# 统计每个接口请求的SQL查询次数（X-Query-Count 响应头），超出视图声明的预算时记录警告
+QUERY_BUDGET_CHECK = config('QUERY_BUDGET_CHECK', default=DEBUG, cast=bool)
+
+# 请求性能分析：按抽样比例统计SQL查询次数和耗时、序列化和渲染耗时、响应大小，
+# 通过 Server-Timing 响应头返回，慢请求（耗时或查询次数超过阈值）记录到 oms.performance 日志
+REQUEST_PROFILING_ENABLED = config('REQUEST_PROFILING_ENABLED', default=False, cast=bool)
+REQUEST_PROFILING_SAMPLE_RATE = config('REQUEST_PROFILING_SAMPLE_RATE', default=0.1, cast=float)
+REQUEST_PROFILING_SLOW_MS = config('REQUEST_PROFILING_SLOW_MS', default=500, cast=int)
+REQUEST_PROFILING_SLOW_QUERIES = config('REQUEST_PROFILING_SLOW_QUERIES', default=50, cast=int)
+# 慢请求日志中列出的重复次数最多的SQL数量
+REQUEST_PROFILING_TOP_SQL = config('REQUEST_PROFILING_TOP_SQL', default=5, cast=int)
+REQUEST_PROFILING_SERVER_TIMING = config('REQUEST_PROFILING_SERVER_TIMING', default=True, cast=bool)
+
+# 运行指标（/metrics，Prometheus 格式）：各进程的累计值每隔 METRICS_FLUSH_INTERVAL 秒写入 Redis 后汇总，
+# 超过 METRICS_WORKER_TTL 秒未更新的进程（已退出）的累计值并入已退出进程的汇总，计数器不会因 worker 重启而减小
+# 抓取需要 Authorization: Bearer <METRICS_TOKEN>；未配置时只在 DEBUG 模式下开放
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=10, cast=int)
+METRICS_WORKER_TTL = config('METRICS_WORKER_TTL', default=3600, cast=int)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -123,6 +185,24 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 # Media files - 附件存储路径配置
 # 使用OMS/docs/目录存储附件，按日期组织
 ATTACHMENT_ROOT = os.path.join(BASE_DIR.parent, 'docs')
+# 附件大小限制（字节）：单个文件、每个任务的附件总大小
+ATTACHMENT_MAX_FILE_SIZE = config('ATTACHMENT_MAX_FILE_SIZE', default=200 * 1024 * 1024, cast=int)
+ATTACHMENT_MAX_TASK_SIZE = config('ATTACHMENT_MAX_TASK_SIZE', default=1024 * 1024 * 1024, cast=int)
+# 断点续传：建议客户端每次上传的分块大小（字节）、未完成的上传会话保留的小时数
+ATTACHMENT_UPLOAD_CHUNK_SIZE = config('ATTACHMENT_UPLOAD_CHUNK_SIZE', default=1024 * 1024, cast=int)
+ATTACHMENT_UPLOAD_EXPIRE_HOURS = config('ATTACHMENT_UPLOAD_EXPIRE_HOURS', default=24, cast=int)
+# 附件下载方式：python（由 Gunicorn 发送，支持时使用 sendfile）、nginx（X-Accel-Redirect）、sendfile（X-Sendfile）
+ATTACHMENT_DOWNLOAD_MODE = config('ATTACHMENT_DOWNLOAD_MODE', default='python')
+# nginx 方式下附件目录对应的 Nginx 内部 location
+ATTACHMENT_ACCEL_REDIRECT_PREFIX = config('ATTACHMENT_ACCEL_REDIRECT_PREFIX', default='/protected-attachments/')
+# 图片附件的缩略图、预览图的最大边长（像素）和 JPEG 质量
+ATTACHMENT_THUMBNAIL_SIZE = config('ATTACHMENT_THUMBNAIL_SIZE', default=256, cast=int)
+ATTACHMENT_PREVIEW_SIZE = config('ATTACHMENT_PREVIEW_SIZE', default=1280, cast=int)
+ATTACHMENT_PREVIEW_QUALITY = config('ATTACHMENT_PREVIEW_QUALITY', default=82, cast=int)
+# 每个进程中生成缩略图的后台线程数
+ATTACHMENT_PREVIEW_WORKERS = config('ATTACHMENT_PREVIEW_WORKERS', default=2, cast=int)
+# 缩略图地址的有效周期（秒）：周期内地址不变，浏览器可以一直使用缓存
+ATTACHMENT_PREVIEW_URL_TTL = config('ATTACHMENT_PREVIEW_URL_TTL', default=7 * 24 * 3600, cast=int)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
@@ -6,6 +6,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from .metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -13,6 +14,8 @@ urlpatterns = [
     path('api/accounts/', include('apps.accounts.urls')),
     path('api/tasks/', include('apps.tasks.urls')),
     path('api/workflow/', include('apps.workflow.urls')),
+    # Prometheus 抓取接口
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
@@ -66,34 +66,25 @@ Page({
           title: '上传中...',
         })
 
-        const config = require('../../../utils/config')
-        const token = wx.getStorageSync('token')
-        
-        // 上传文件到服务器
-        const uploadRes = await wx.uploadFile({
-          url: `${config.apiBaseUrl}/tasks/tasks/${taskId}/upload_attachment/`,
-          filePath: tempFilePath,
-          name: 'file',
-          header: {
-            Authorization: `Bearer ${token}`,
-          },
-        })
-
-        wx.hideLoading()
-
-        if (uploadRes.statusCode === 200 || uploadRes.statusCode === 201) {
+        // 断点续传上传到服务器，网络中断时从已上传的位置继续
+        const { uploadAttachment } = require('../../../utils/upload')
+        const filename = tempFilePath.split('/').pop()
+        try {
+          await uploadAttachment(taskId, tempFilePath, filename)
+          wx.hideLoading()
           wx.showToast({
             title: '上传成功',
             icon: 'success',
           })
           // 重新加载任务详情
           this.loadTask(taskId)
-        } else {
-          const errorData = JSON.parse(uploadRes.data || '{}')
+        } catch (error) {
+          wx.hideLoading()
           wx.showToast({
-            title: errorData.error || '上传失败',
+            title: error.message || '上传失败',
             icon: 'none',
           })
+          console.error('上传附件失败:', error)
         }
       }
     } catch (error) {
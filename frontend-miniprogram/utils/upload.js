@@ -0,0 +1,121 @@
+// 附件断点续传：创建上传会话后按分块上传，网络中断后从服务器已接收的位置继续
+const config = require('./config')
+
+// 每个分块失败后的重试次数
+const MAX_RETRIES = 3
+
+function request(options) {
+  return new Promise((resolve, reject) => {
+    wx.request({
+      ...options,
+      success: resolve,
+      fail: reject,
+    })
+  })
+}
+
+function uploadError(response, defaultMessage) {
+  const error = new Error((response && response.data && response.data.error) || defaultMessage)
+  error.response = response
+  return error
+}
+
+// 同一文件上次未完成的上传会话ID保存在本地，重新上传时继续
+function sessionKey(taskId, filePath, fileSize) {
+  return `attachment_upload:${taskId}:${filePath}:${fileSize}`
+}
+
+/**
+ * 断点续传上传附件
+ * @param {number} taskId 任务ID
+ * @param {string} filePath 本地文件路径
+ * @param {string} filename 文件名
+ * @param {function} onProgress 进度回调，参数为 0~1
+ * @returns {Promise<object>} 创建的附件
+ */
+async function uploadAttachment(taskId, filePath, filename, onProgress) {
+  const fs = wx.getFileSystemManager()
+  const token = wx.getStorageSync('token')
+  const header = { Authorization: `Bearer ${token}` }
+  const baseUrl = `${config.apiBaseUrl}/tasks/tasks/${taskId}/attachment_uploads/`
+  const fileSize = fs.statSync(filePath).size
+  const key = sessionKey(taskId, filePath, fileSize)
+
+  // 查询上次的上传会话，已过期或不存在时重新创建
+  let state = null
+  const savedId = wx.getStorageSync(key)
+  if (savedId) {
+    const response = await request({ url: `${baseUrl}${savedId}/`, method: 'GET', header })
+    if (response.statusCode === 200) {
+      state = response.data
+    }
+  }
+  if (!state) {
+    const response = await request({
+      url: baseUrl,
+      method: 'POST',
+      header,
+      data: { filename, file_size: fileSize },
+    })
+    if (response.statusCode !== 201) {
+      throw uploadError(response, '创建上传失败')
+    }
+    state = response.data
+    wx.setStorageSync(key, state.upload_id)
+  }
+
+  let offset = state.offset
+  let retries = 0
+  while (true) {
+    const length = Math.min(state.chunk_size, fileSize - offset)
+    const data = fs.readFileSync(filePath, undefined, offset, length)
+    let response
+    try {
+      response = await request({
+        url: `${baseUrl}${state.upload_id}/`,
+        method: 'PUT',
+        header: {
+          ...header,
+          'Content-Type': 'application/octet-stream',
+          'Content-Range': `bytes ${offset}-${offset + length - 1}/${fileSize}`,
+        },
+        data,
+      })
+    } catch (error) {
+      // 网络错误：查询服务器已接收的位置后重试
+      if (++retries > MAX_RETRIES) {
+        throw error
+      }
+      const status = await request({ url: `${baseUrl}${state.upload_id}/`, method: 'GET', header })
+      if (status.statusCode !== 200) {
+        wx.removeStorageSync(key)
+        throw uploadError(status, '上传失败')
+      }
+      offset = status.data.offset
+      continue
+    }
+
+    if (response.statusCode === 201) {
+      wx.removeStorageSync(key)
+      onProgress && onProgress(1)
+      return response.data
+    }
+    if (response.statusCode === 200) {
+      offset = response.data.offset
+      retries = 0
+      onProgress && onProgress(offset / fileSize)
+    } else if (response.statusCode === 409 && ++retries <= MAX_RETRIES) {
+      // 位置不一致（上一个分块的响应丢失），从服务器给出的位置继续
+      offset = response.data.offset
+    } else {
+      if (response.statusCode < 500) {
+        wx.removeStorageSync(key)
+      }
+      throw uploadError(response, '上传失败')
+    }
+  }
+}
+
+module.exports = {
+  uploadAttachment,
+}
@@ -4,6 +4,9 @@ export const taskApi = {
   // 获取任务列表
   getTasks: (params) => api.get('/tasks/tasks/', { params }),
   
+  // 获取任务统计
+  getTaskStats: (params) => api.get('/tasks/tasks/stats/', { params }),
+  
   // 获取任务详情
   getTask: (id) => api.get(`/tasks/tasks/${id}/`),
   
@@ -5,12 +5,18 @@ export const workflowApi = {
   getWorkflowLogs: (params) => api.get('/workflow/logs/', { params }),
   
   // 获取通知列表
-  getNotifications: () => api.get('/workflow/notifications/'),
+  getNotifications: (params) => api.get('/workflow/notifications/', { params }),
+  
+  // 获取未读通知数量
+  getUnreadCount: () => api.get('/workflow/notifications/unread_count/'),
   
   // 标记通知已读
   markNotificationRead: (id) => api.post(`/workflow/notifications/${id}/mark_read/`),
   
   // 标记所有通知已读
   markAllNotificationsRead: () => api.post('/workflow/notifications/mark_all_read/'),
+  
+  // 获取通知推送的一次性连接票据
+  getStreamTicket: () => api.post('/workflow/notifications/stream_ticket/'),
 }
 
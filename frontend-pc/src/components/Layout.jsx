@@ -9,7 +9,7 @@ import {
   CheckOutlined,
 } from '@ant-design/icons'
 import { useAuthStore } from '../store/authStore'
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { workflowApi } from '../api/workflow'
 import { formatDateTime } from '../utils/format'
 
@@ -22,22 +22,109 @@ function Layout() {
   const [notifications, setNotifications] = useState([])
   const [unreadCount, setUnreadCount] = useState(0)
 
+  const unreadCountRef = useRef(null)
+
   useEffect(() => {
     loadNotifications()
-    const interval = setInterval(loadNotifications, 30000) // 每30秒刷新一次
-    return () => clearInterval(interval)
+
+    // 优先使用服务端推送（SSE）接收新通知；浏览器不支持或连接被拒绝时退回到轮询
+    // EventSource 不能携带 Authorization 头，每次连接前换取一次性票据（不把访问令牌放在URL中）
+    let eventSource = null
+    let pollTimer = null
+    let reconnectTimer = null
+    let lastEventId = null
+    let closed = false
+    const startPolling = () => {
+      if (!pollTimer) {
+        pollTimer = setInterval(checkUnreadCount, 30000) // 每30秒检查一次未读数量
+      }
+    }
+
+    const connect = async () => {
+      let ticket
+      try {
+        const response = await workflowApi.getStreamTicket()
+        ticket = response.data.ticket
+      } catch (error) {
+        startPolling()
+        return
+      }
+      if (closed) return
+
+      const baseURL = import.meta.env.VITE_API_BASE_URL || '/api'
+      const params = new URLSearchParams({ ticket })
+      if (lastEventId) params.set('since', lastEventId)
+      let opened = false
+      eventSource = new EventSource(`${baseURL}/workflow/notifications/stream/?${params}`)
+      eventSource.onopen = () => {
+        opened = true
+      }
+      eventSource.onmessage = (event) => {
+        if (event.lastEventId) lastEventId = event.lastEventId
+        try {
+          const notif = JSON.parse(event.data)
+          setNotifications(prev => (prev.some(n => n.id === notif.id) ? prev : [notif, ...prev]))
+          if (!notif.is_read) {
+            unreadCountRef.current = (unreadCountRef.current || 0) + 1
+            setUnreadCount(unreadCountRef.current)
+          }
+        } catch (error) {
+          console.error('解析推送通知失败:', error)
+        }
+      }
+      eventSource.onerror = () => {
+        // 票据只能使用一次，浏览器的自动重连会被拒绝：关闭连接，换取新票据后重新连接
+        eventSource.close()
+        eventSource = null
+        if (opened) {
+          reconnectTimer = setTimeout(connect, 3000)
+        } else {
+          // 连接被拒绝（未启用推送或认证失败）时改为轮询
+          startPolling()
+        }
+      }
+    }
+
+    if (window.EventSource && useAuthStore.getState().token) {
+      connect()
+    } else {
+      startPolling()
+    }
+
+    return () => {
+      closed = true
+      if (eventSource) eventSource.close()
+      if (reconnectTimer) clearTimeout(reconnectTimer)
+      if (pollTimer) clearInterval(pollTimer)
+    }
   }, [])
 
   const loadNotifications = async () => {
     try {
-      const response = await workflowApi.getNotifications()
-      setNotifications(response.data.results || response.data)
-      setUnreadCount(response.data.results?.filter(n => !n.is_read).length || 0)
+      const response = await workflowApi.getNotifications({ is_read: false })
+      const list = response.data.results || response.data
+      const count = response.data.count ?? list.length
+      setNotifications(list)
+      setUnreadCount(count)
+      unreadCountRef.current = count
     } catch (error) {
       console.error('加载通知失败:', error)
     }
   }
 
+  // 轮询只查询未读数量，数量变化时才重新加载通知列表
+  const checkUnreadCount = async () => {
+    try {
+      const response = await workflowApi.getUnreadCount()
+      const count = response.data.unread_count || 0
+      if (count !== unreadCountRef.current) {
+        loadNotifications()
+      }
+    } catch (error) {
+      console.error('加载未读通知数量失败:', error)
+    }
+  }
+
   const menuItems = [
     {
       key: '/',
@@ -32,7 +32,7 @@ const priorityMap = {
 function Dashboard() {
   const { user } = useAuthStore()
   const displayName = user?.full_name || user?.first_name || user?.last_name || user?.username || '用户'
-  const [tasks, setTasks] = useState([])
+  const [taskStats, setTaskStats] = useState(null)
   const [loading, setLoading] = useState(false)
   const [stats, setStats] = useState({
     total: 0,
@@ -48,59 +48,44 @@ function Dashboard() {
   const loadStats = async () => {
     setLoading(true)
     try {
-      const response = await taskApi.getTasks({ page_size: 1000 })
-      const result = response.data
-      const taskList = result.results || result || []
-
-      if (!Array.isArray(taskList)) {
-        console.error('任务数据格式错误:', taskList)
-        setTasks([])
-        setStats({ total: 0, completed: 0, pending: 0 })
-        return
-      }
-
-      setTasks(taskList)
+      // 统计数据由后端分组计算，不再拉取全部任务在前端计数
+      const response = await taskApi.getTaskStats()
+      const result = response.data || {}
+      setTaskStats(result)
       setStats({
-        total: taskList.length,
-        completed: taskList.filter(t => t && (t.status === 'confirmed' || t.status === 'closed')).length,
-        pending: taskList.filter(t => t && ['pending_review', 'reviewed', 'assigned', 'in_progress'].includes(t.status)).length,
+        total: result.total || 0,
+        completed: result.completed || 0,
+        pending: result.pending || 0,
       })
     } catch (error) {
       console.error('加载统计失败:', error)
-      setTasks([])
+      setTaskStats(null)
       setStats({ total: 0, completed: 0, pending: 0 })
     } finally {
       setLoading(false)
     }
   }
 
-  const buildPieData = (key, map) => {
-    const counter = tasks.reduce((acc, task) => {
-      const value = task?.[key]
-      if (!value) return acc
-      const label = map[value] || value
-      acc[label] = (acc[label] || 0) + 1
-      return acc
-    }, {})
-    return Object.entries(counter).map(([type, value]) => ({ type, value }))
+  const buildPieData = (items, key, map) => {
+    if (!Array.isArray(items)) return []
+    return items
+      .filter(item => item && item[key])
+      .map(item => ({ type: map[item[key]] || item.label || item[key], value: item.count }))
   }
 
-  const statusData = useMemo(() => buildPieData('status', statusMap), [tasks])
-  const typeData = useMemo(() => buildPieData('task_type', typeMap), [tasks])
-  const priorityData = useMemo(() => buildPieData('priority', priorityMap), [tasks])
+  const statusData = useMemo(() => buildPieData(taskStats?.by_status, 'status', statusMap), [taskStats])
+  const typeData = useMemo(() => buildPieData(taskStats?.by_task_type, 'task_type', typeMap), [taskStats])
+  const priorityData = useMemo(() => buildPieData(taskStats?.by_priority, 'priority', priorityMap), [taskStats])
 
   const dateData = useMemo(() => {
-    const counter = {}
-    tasks.forEach(task => {
-      if (!task?.created_at) return
-      const date = dayjs(task.created_at).format('YYYY-MM-DD')
-      counter[date] = (counter[date] || 0) + 1
-    })
-    return Object.entries(counter)
-      .map(([date, value]) => ({ date, value }))
+    const items = taskStats?.by_date
+    if (!Array.isArray(items)) return []
+    return items
+      .filter(item => item && item.date)
+      .map(item => ({ date: item.date, value: item.count }))
       .sort((a, b) => dayjs(a.date).valueOf() - dayjs(b.date).valueOf())
       .slice(-10) // 最近10天
-  }, [tasks])
+  }, [taskStats])
 
 const renderChart = (title, chart, hasData) => (
   <Card
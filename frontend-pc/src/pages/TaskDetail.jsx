@@ -1,4 +1,4 @@
-import { Card, Descriptions, Tag, Button, Space, Form, Input, message, Timeline, Modal, Select, List, Popconfirm, Upload } from 'antd'
+import { Card, Descriptions, Tag, Button, Space, Form, Input, message, Timeline, Modal, Select, List, Popconfirm, Upload, Image } from 'antd'
 import { DownloadOutlined, DeleteOutlined, PaperClipOutlined, EditOutlined, UploadOutlined } from '@ant-design/icons'
 import { useParams, useNavigate, useLocation } from 'react-router-dom'
 import { useEffect, useState } from 'react'
@@ -456,7 +456,19 @@ function TaskDetail() {
                     ].filter(Boolean)}
                   >
                     <Space>
-                      <PaperClipOutlined />
+                      {/* 图片附件显示缩略图，点击查看预览图（不下载原图） */}
+                      {attachment.thumbnail_url ? (
+                        <Image
+                          src={attachment.thumbnail_url}
+                          preview={{ src: attachment.preview_url }}
+                          width={48}
+                          height={48}
+                          loading="lazy"
+                          style={{ objectFit: 'cover', borderRadius: 4 }}
+                        />
+                      ) : (
+                        <PaperClipOutlined />
+                      )}
                       <span>{attachment.original_filename}</span>
                       <span style={{ color: '#999', fontSize: 12 }}>
                         {attachment.file_size_display}
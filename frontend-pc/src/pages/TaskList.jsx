@@ -22,7 +22,7 @@ function TaskList() {
     return {
       status: searchParams.get('status') || '',
       task_type: searchParams.get('task_type') || '',
-      title: searchParams.get('title') || '',
+      search: searchParams.get('search') || '',
       priority: searchParams.get('priority') || '',
       created_date: searchParams.get('created_date') || '',
     }
@@ -295,19 +295,19 @@ function TaskList() {
             />
           </Space>
           <Space direction="vertical" size="small" style={{ marginBottom: 0 }}>
-            <span style={{ fontSize: 12, color: '#666' }}>标题关键字</span>
+            <span style={{ fontSize: 12, color: '#666' }}>关键字</span>
             <Space.Compact style={{ width: 200 }}>
               <Input
-                placeholder="请输入标题关键字"
+                placeholder="搜索标题、描述、评论"
                 allowClear
-                value={filters.title}
+                value={filters.search}
                 onChange={(e) => {
-                  const newFilters = { ...filters, title: e.target.value }
+                  const newFilters = { ...filters, search: e.target.value }
                   setFilters(newFilters)
                 }}
                 onPressEnter={(e) => {
                   const value = e.target.value
-                  const newFilters = { ...filters, title: value }
+                  const newFilters = { ...filters, search: value }
                   setFilters(newFilters)
                   setPagination(prev => ({ ...prev, current: 1 }))
                 }}
@@ -315,7 +315,7 @@ function TaskList() {
               <Button 
                 type="primary"
                 onClick={() => {
-                  const newFilters = { ...filters, title: filters.title }
+                  const newFilters = { ...filters, search: filters.search }
                   setFilters(newFilters)
                   setPagination(prev => ({ ...prev, current: 1 }))
                 }}